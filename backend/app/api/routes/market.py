@@ -1,5 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.services.market_data import MarketDataService
+from app.services.market_data import MarketDataService, NIFTY_HEATMAP_STOCKS
+from app.services.cache import TTLCache
+from app.services.market_hours import cache_ttl
+from app.services.result_cache import result_cache
+from app.services.prefetcher import prefetcher
 from datetime import datetime
 import asyncio
 import pytz
@@ -14,6 +18,9 @@ _INDICES_TTL = 180  # 3 minutes
 _financials_cache = {}
 _FINANCIALS_TTL = 3600  # 1 hour
 
+_SCREENER_TTL = 300  # 5 minutes
+_screener_cache = TTLCache(maxsize=64, ttl=_SCREENER_TTL)  # keyed by (indicators, period) from the query
+
 router = APIRouter()
 
 @router.get("/historical/{symbol}")
@@ -21,7 +28,7 @@ async def get_market_data(symbol: str, period: str = "1y", interval: str = "1d")
     try:
         df = await MarketDataService.get_historical_data(symbol, period, interval)
         market_status = MarketDataService.get_market_status(df)
-        df_with_indicators = MarketDataService.calculate_indicators(df)
+        df_with_indicators = MarketDataService.calculate_indicators(df, symbol, interval)
         data_json = df_with_indicators.reset_index().to_dict(orient="records")
         return {
             "symbol": symbol.upper(),
@@ -52,6 +59,14 @@ async def get_multi_quotes(symbols: list[str]):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/diagnostics")
+async def get_diagnostics():
+    return {
+        **MarketDataService.get_diagnostics(),
+        "prefetcher": prefetcher.stats(),
+        "backtest_results": result_cache.stats(),
+    }
+
 @router.get("/search/{query}")
 async def search_symbols(query: str):
     try:
@@ -89,110 +104,115 @@ async def get_financials(symbol: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch financials: {str(e)}")
 
+async def refresh_heatmap():
+    symbols = [s["symbol"] for s in NIFTY_HEATMAP_STOCKS]
+    quotes = await MarketDataService.get_multi_quotes(symbols)
+    quote_map = {q["symbol"]: q for q in quotes}
+    result = []
+    for stock in NIFTY_HEATMAP_STOCKS:
+        q = quote_map.get(stock["symbol"].upper(), {})
+        result.append({
+            "symbol": stock["symbol"].replace(".NS", ""),
+            "name": stock["name"],
+            "sector": stock["sector"],
+            "weight": stock["weight"],
+            "price": q.get("price", 0),
+            "change_pct": q.get("change_pct", 0),
+            "change": q.get("change", 0),
+            "volume": q.get("volume", 0),
+        })
+    _heatmap_cache["data"] = result
+    _heatmap_cache["ts"] = time.time()
+    return result
+
 @router.get("/heatmap")
 async def get_heatmap_data():
-    from app.services.market_data import NIFTY_HEATMAP_STOCKS
-    if _heatmap_cache["data"] and (time.time() - _heatmap_cache["ts"]) < _HEATMAP_TTL:
+    # Normally kept warm by the background prefetcher; rebuilt inline only on a cold start
+    if _heatmap_cache["data"] and (time.time() - _heatmap_cache["ts"]) < cache_ttl("NSE", _HEATMAP_TTL):
         return _heatmap_cache["data"]
     try:
-        symbols = [s["symbol"] for s in NIFTY_HEATMAP_STOCKS]
-        quotes = await MarketDataService.get_multi_quotes(symbols)
-        quote_map = {q["symbol"]: q for q in quotes}
-        result = []
-        for stock in NIFTY_HEATMAP_STOCKS:
-            q = quote_map.get(stock["symbol"].upper(), {})
-            result.append({
-                "symbol": stock["symbol"].replace(".NS", ""),
-                "name": stock["name"],
-                "sector": stock["sector"],
-                "weight": stock["weight"],
-                "price": q.get("price", 0),
-                "change_pct": q.get("change_pct", 0),
-                "change": q.get("change", 0),
-                "volume": q.get("volume", 0),
-            })
-        _heatmap_cache["data"] = result
-        _heatmap_cache["ts"] = time.time()
-        return result
+        return await refresh_heatmap()
     except Exception as e:
         if _heatmap_cache["data"]:
             return _heatmap_cache["data"]
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/indices")
-async def get_all_indices():
-    if _indices_cache["data"] and (time.time() - _indices_cache["ts"]) < _INDICES_TTL:
-        return _indices_cache["data"]
+_INDICES = [
+    {"symbol": "^NSEI", "name": "NIFTY 50", "category": "Broad Market",
+     "constituents": ["RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS"]},
+    {"symbol": "^NSEBANK", "name": "NIFTY BANK", "category": "Sectoral",
+     "constituents": ["HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "KOTAKBANK.NS", "AXISBANK.NS"]},
+    {"symbol": "^BSESN", "name": "SENSEX", "category": "Broad Market",
+     "constituents": ["RELIANCE.BO", "TCS.BO", "HDFCBANK.BO", "INFY.BO", "ICICIBANK.BO"]},
+    {"symbol": "^CNXIT", "name": "NIFTY IT", "category": "Sectoral",
+     "constituents": ["TCS.NS", "INFY.NS", "HCLTECH.NS", "WIPRO.NS", "TECHM.NS"]},
+    {"symbol": "^CNXPHARMA", "name": "NIFTY PHARMA", "category": "Sectoral",
+     "constituents": ["SUNPHARMA.NS", "DRREDDY.NS", "CIPLA.NS", "DIVISLAB.NS", "APOLLOHOSP.NS"]},
+    {"symbol": "^CNXAUTO", "name": "NIFTY AUTO", "category": "Sectoral",
+     "constituents": ["TATAMOTORS.NS", "MARUTI.NS", "M&M.NS", "BAJAJ-AUTO.NS", "HEROMOTOCO.NS"]},
+    {"symbol": "^CNXFMCG", "name": "NIFTY FMCG", "category": "Sectoral",
+     "constituents": ["HINDUNILVR.NS", "ITC.NS", "NESTLEIND.NS", "BRITANNIA.NS", "GODREJCP.NS"]},
+    {"symbol": "^CNXMETAL", "name": "NIFTY METAL", "category": "Sectoral",
+     "constituents": ["TATASTEEL.NS", "JSWSTEEL.NS", "HINDALCO.NS", "COALINDIA.NS", "VEDL.NS"]},
+    {"symbol": "^CNXENERGY", "name": "NIFTY ENERGY", "category": "Sectoral",
+     "constituents": ["RELIANCE.NS", "ONGC.NS", "NTPC.NS", "POWERGRID.NS", "BPCL.NS"]},
+    {"symbol": "^CNXREALTY", "name": "NIFTY REALTY", "category": "Sectoral",
+     "constituents": ["DLF.NS", "GODREJPROP.NS", "OBEROIRLTY.NS", "PHOENIXLTD.NS", "PRESTIGE.NS"]},
+    {"symbol": "^CNXINFRA", "name": "NIFTY INFRA", "category": "Thematic",
+     "constituents": ["LT.NS", "ADANIPORTS.NS", "ULTRACEMCO.NS", "GRASIM.NS", "POWERGRID.NS"]},
+    {"symbol": "^CNXPSUBANK", "name": "NIFTY PSU BANK", "category": "Sectoral",
+     "constituents": ["SBIN.NS", "PNB.NS", "BANKBARODA.NS", "CANBK.NS", "UNIONBANK.NS"]},
+    {"symbol": "^CNXFIN", "name": "NIFTY FIN SERVICES", "category": "Sectoral",
+     "constituents": ["HDFCBANK.NS", "ICICIBANK.NS", "BAJFINANCE.NS", "KOTAKBANK.NS", "SBIN.NS"]},
+    {"symbol": "^NSEMDCP50", "name": "NIFTY MIDCAP 50", "category": "Broad Market",
+     "constituents": ["MPHASIS.NS", "PERSISTENT.NS", "COFORGE.NS", "VOLTAS.NS", "JUBLFOOD.NS"]},
+]
 
-    INDICES = [
-        {"symbol": "^NSEI", "name": "NIFTY 50", "category": "Broad Market",
-         "constituents": ["RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "INFY.NS", "ICICIBANK.NS"]},
-        {"symbol": "^NSEBANK", "name": "NIFTY BANK", "category": "Sectoral",
-         "constituents": ["HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "KOTAKBANK.NS", "AXISBANK.NS"]},
-        {"symbol": "^BSESN", "name": "SENSEX", "category": "Broad Market",
-         "constituents": ["RELIANCE.BO", "TCS.BO", "HDFCBANK.BO", "INFY.BO", "ICICIBANK.BO"]},
-        {"symbol": "^CNXIT", "name": "NIFTY IT", "category": "Sectoral",
-         "constituents": ["TCS.NS", "INFY.NS", "HCLTECH.NS", "WIPRO.NS", "TECHM.NS"]},
-        {"symbol": "^CNXPHARMA", "name": "NIFTY PHARMA", "category": "Sectoral",
-         "constituents": ["SUNPHARMA.NS", "DRREDDY.NS", "CIPLA.NS", "DIVISLAB.NS", "APOLLOHOSP.NS"]},
-        {"symbol": "^CNXAUTO", "name": "NIFTY AUTO", "category": "Sectoral",
-         "constituents": ["TATAMOTORS.NS", "MARUTI.NS", "M&M.NS", "BAJAJ-AUTO.NS", "HEROMOTOCO.NS"]},
-        {"symbol": "^CNXFMCG", "name": "NIFTY FMCG", "category": "Sectoral",
-         "constituents": ["HINDUNILVR.NS", "ITC.NS", "NESTLEIND.NS", "BRITANNIA.NS", "GODREJCP.NS"]},
-        {"symbol": "^CNXMETAL", "name": "NIFTY METAL", "category": "Sectoral",
-         "constituents": ["TATASTEEL.NS", "JSWSTEEL.NS", "HINDALCO.NS", "COALINDIA.NS", "VEDL.NS"]},
-        {"symbol": "^CNXENERGY", "name": "NIFTY ENERGY", "category": "Sectoral",
-         "constituents": ["RELIANCE.NS", "ONGC.NS", "NTPC.NS", "POWERGRID.NS", "BPCL.NS"]},
-        {"symbol": "^CNXREALTY", "name": "NIFTY REALTY", "category": "Sectoral",
-         "constituents": ["DLF.NS", "GODREJPROP.NS", "OBEROIRLTY.NS", "PHOENIXLTD.NS", "PRESTIGE.NS"]},
-        {"symbol": "^CNXINFRA", "name": "NIFTY INFRA", "category": "Thematic",
-         "constituents": ["LT.NS", "ADANIPORTS.NS", "ULTRACEMCO.NS", "GRASIM.NS", "POWERGRID.NS"]},
-        {"symbol": "^CNXPSUBANK", "name": "NIFTY PSU BANK", "category": "Sectoral",
-         "constituents": ["SBIN.NS", "PNB.NS", "BANKBARODA.NS", "CANBK.NS", "UNIONBANK.NS"]},
-        {"symbol": "^CNXFIN", "name": "NIFTY FIN SERVICES", "category": "Sectoral",
-         "constituents": ["HDFCBANK.NS", "ICICIBANK.NS", "BAJFINANCE.NS", "KOTAKBANK.NS", "SBIN.NS"]},
-        {"symbol": "^NSEMDCP50", "name": "NIFTY MIDCAP 50", "category": "Broad Market",
-         "constituents": ["MPHASIS.NS", "PERSISTENT.NS", "COFORGE.NS", "VOLTAS.NS", "JUBLFOOD.NS"]},
-    ]
+async def refresh_indices():
+    all_index_symbols = [idx["symbol"] for idx in _INDICES]
+    idx_quotes = await MarketDataService.get_multi_quotes(all_index_symbols)
+    idx_quote_map = {q["symbol"]: q for q in idx_quotes}
 
-    try:
-        all_index_symbols = [idx["symbol"] for idx in INDICES]
-        idx_quotes = await MarketDataService.get_multi_quotes(all_index_symbols)
-        idx_quote_map = {q["symbol"]: q for q in idx_quotes}
-
-        all_constituents = list(set(
-            sym for idx in INDICES for sym in idx["constituents"]
-        ))
-        constituent_quotes = await MarketDataService.get_multi_quotes(all_constituents)
-        constituent_map = {q["symbol"]: q for q in constituent_quotes}
-
-        result_list = []
-        for idx in INDICES:
-            iq = idx_quote_map.get(idx["symbol"].upper().replace("^", "^"), {})
-            if not iq:
-                iq = idx_quote_map.get(idx["symbol"], {})
-            top = []
-            for sym in idx["constituents"]:
-                sq = constituent_map.get(sym.upper(), {})
-                if not sq:
-                    sq = constituent_map.get(sym, {})
-                top.append({
-                    "symbol": sq.get("symbol", sym).replace(".NS", ""),
-                    "price": sq.get("price", 0),
-                    "change_pct": sq.get("change_pct", 0),
-                })
-            result_list.append({
-                "symbol": idx["symbol"], "name": idx["name"], "category": idx["category"],
-                "price": iq.get("price", 0), "change": iq.get("change", 0),
-                "change_pct": iq.get("change_pct", 0), "prev_close": iq.get("prev_close", 0),
-                "open": iq.get("open", 0), "high": iq.get("high", 0),
-                "low": iq.get("low", 0), "volume": iq.get("volume", 0),
-                "top_stocks": top,
+    all_constituents = list(set(
+        sym for idx in _INDICES for sym in idx["constituents"]
+    ))
+    constituent_quotes = await MarketDataService.get_multi_quotes(all_constituents)
+    constituent_map = {q["symbol"]: q for q in constituent_quotes}
+
+    result_list = []
+    for idx in _INDICES:
+        iq = idx_quote_map.get(idx["symbol"].upper().replace("^", "^"), {})
+        if not iq:
+            iq = idx_quote_map.get(idx["symbol"], {})
+        top = []
+        for sym in idx["constituents"]:
+            sq = constituent_map.get(sym.upper(), {})
+            if not sq:
+                sq = constituent_map.get(sym, {})
+            top.append({
+                "symbol": sq.get("symbol", sym).replace(".NS", ""),
+                "price": sq.get("price", 0),
+                "change_pct": sq.get("change_pct", 0),
             })
+        result_list.append({
+            "symbol": idx["symbol"], "name": idx["name"], "category": idx["category"],
+            "price": iq.get("price", 0), "change": iq.get("change", 0),
+            "change_pct": iq.get("change_pct", 0), "prev_close": iq.get("prev_close", 0),
+            "open": iq.get("open", 0), "high": iq.get("high", 0),
+            "low": iq.get("low", 0), "volume": iq.get("volume", 0),
+            "top_stocks": top,
+        })
 
-        _indices_cache["data"] = result_list
-        _indices_cache["ts"] = time.time()
-        return result_list
+    _indices_cache["data"] = result_list
+    _indices_cache["ts"] = time.time()
+    return result_list
+
+@router.get("/indices")
+async def get_all_indices():
+    if _indices_cache["data"] and (time.time() - _indices_cache["ts"]) < cache_ttl("NSE", _INDICES_TTL):
+        return _indices_cache["data"]
+    try:
+        return await refresh_indices()
     except Exception as e:
         if _indices_cache["data"]:
             return _indices_cache["data"]
@@ -232,4 +252,22 @@ async def get_stock_detail(symbol: str):
         detail = await MarketDataService.get_stock_detail(symbol)
         return detail
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch stock detail: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock detail: {str(e)}")
+
+@router.get("/screener")
+async def get_screener(indicators: str = "RSI,SMA_50,ROC", sort: str = "period_return", period: str = "1y",
+                      limit: int = Query(50, ge=1, le=500)):
+    columns = [c.strip() for c in indicators.split(",") if c.strip()]
+    key = (tuple(columns), period)
+    rows, _ = _screener_cache.get(key)
+    if rows is None:
+        try:
+            rows = await MarketDataService.screen(NIFTY_HEATMAP_STOCKS, columns, period)
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to run screener: {str(e)}")
+        _screener_cache.set(key, rows, ttl=cache_ttl("NSE", _SCREENER_TTL))
+    if rows and sort not in rows[0]:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    return MarketDataService.rank_screen(rows, sort)[:limit]
@@ -1,8 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.services.strategy_engine import StrategyEngine
 from app.services.backtest_service import BacktestService
+from app.services.market_data import MarketDataService
+from app.schemas.strategy import SweepRequest
+from app.services.backtest_core import FeeModel
+from app.services.charges import calculator_for
+from app.services.streaming_backtest import (
+    SMACrossoverStrategy, StreamingBacktest, stream_backtest, DAILY_INTERVALS,
+)
 
 router = APIRouter()
 
@@ -17,13 +25,111 @@ async def run_strategy(symbol: str, quantity: float = 1.0, db: AsyncSession = De
         raise HTTPException(status_code=500, detail=f"Strategy execution failed: {str(e)}")
 
 @router.get("/backtest/{symbol}")
-async def backtest_strategy(symbol: str):
+async def backtest_strategy(symbol: str, include_charges: bool = True):
     try:
-        result = await BacktestService.backtest_sma_strategy(symbol)
+        result = await BacktestService.backtest_sma_strategy(symbol, include_charges=include_charges)
         
         if "error" in result:
              raise HTTPException(status_code=400, detail=result["error"])
              
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
+
+@router.post("/sweep")
+async def sweep_strategy(req: SweepRequest):
+    """Backtest a grid of SMA windows x capitals x symbols in parallel, ranked by return."""
+    try:
+        return await BacktestService.sweep_sma_strategy(
+            req.symbols, req.fast_windows, req.slow_windows, req.capitals,
+            period=req.period, interval=req.interval, top=req.top, include_charges=req.include_charges,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sweep failed: {str(e)}")
+
+@router.get("/portfolio-backtest")
+async def backtest_portfolio(
+    market: str = "NSE",
+    symbols: str | None = None,
+    capital: float = 100000,
+    fast: int = 20,
+    slow: int = 50,
+    max_positions: int = 10,
+    period: str = "1y",
+    include_charges: bool = True,
+):
+    """SMA crossover across a basket with shared capital. ``symbols`` is a comma-separated
+    list; without it the market's whole heatmap universe is used.
+    """
+    try:
+        basket = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+        return await BacktestService.backtest_portfolio(
+            basket, market=market, initial_capital=capital, fast=fast, slow=slow,
+            max_positions=max_positions, period=period, include_charges=include_charges,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Portfolio backtest failed: {str(e)}")
+
+
+@router.get("/walk-forward/{symbol}")
+async def walk_forward(
+    symbol: str,
+    fast: str = "5,10,20",
+    slow: str = "50,100,200",
+    in_sample: int = 252,
+    out_of_sample: int = 63,
+    capital: float = 10000,
+    period: str = "5y",
+    include_charges: bool = True,
+):
+    """Walk-forward SMA crossover: optimise windows on each in-sample fold, test out of sample."""
+    try:
+        fast_windows = [int(w) for w in fast.split(",") if w.strip()]
+        slow_windows = [int(w) for w in slow.split(",") if w.strip()]
+        return await BacktestService.walk_forward(
+            symbol, fast_windows, slow_windows, in_sample=in_sample, out_of_sample=out_of_sample,
+            initial_capital=capital, period=period, include_charges=include_charges,
+        )
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Walk-forward failed: {str(e)}")
+
+
+
+@router.get("/backtest-stream/{symbol}")
+async def backtest_stream(
+    symbol: str,
+    interval: str = "5m",
+    period: str = "60d",
+    fast: int = 20,
+    slow: int = 50,
+    capital: float = 10000,
+    equity_every: int = 1,
+    include_charges: bool = True,
+):
+    """Event-driven SMA crossover streamed as NDJSON: one line per trade, an equity point
+    every ``equity_every`` bars and a closing summary line. Suited to long 1m/5m windows.
+    """
+    try:
+        strategy = SMACrossoverStrategy(fast, slow)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    try:
+        chunks = await MarketDataService.stream_history(symbol, period=period, interval=interval)
+    except ValueError as ve:
+        raise HTTPException(status_code=404, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Backtest failed: {str(e)}")
+    engine = StreamingBacktest(
+        strategy, capital, fee=FeeModel(calculator_for(symbol)) if include_charges else None,
+        equity_every=equity_every, daily=interval in DAILY_INTERVALS,
+    )
+    return StreamingResponse(
+        stream_backtest(engine, chunks),
+        media_type="application/x-ndjson",
+    )
\ No newline at end of file
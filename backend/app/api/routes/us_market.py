@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from app.services.market_data import MarketDataService, US_STOCKS, US_HEATMAP_STOCKS
+from app.services.cache import TTLCache
+from app.services.market_hours import cache_ttl
 from datetime import datetime
 import asyncio
 import pytz
@@ -11,32 +13,39 @@ _US_HEATMAP_TTL = 300  # 5 minutes
 _us_indices_cache = {"data": None, "ts": 0}
 _US_INDICES_TTL = 180  # 3 minutes
 
+_US_SCREENER_TTL = 300  # 5 minutes
+_us_screener_cache = TTLCache(maxsize=64, ttl=_US_SCREENER_TTL)  # keyed by (indicators, period) from the query
+
 router = APIRouter()
 
+async def refresh_us_heatmap():
+    symbols = [s["symbol"] for s in US_HEATMAP_STOCKS]
+    quotes = await MarketDataService.get_multi_quotes(symbols)
+    quote_map = {q["symbol"]: q for q in quotes}
+    result = []
+    for stock in US_HEATMAP_STOCKS:
+        q = quote_map.get(stock["symbol"].upper(), {})
+        result.append({
+            "symbol": stock["symbol"],
+            "name": stock["name"],
+            "sector": stock["sector"],
+            "weight": stock["weight"],
+            "price": q.get("price", 0),
+            "change_pct": q.get("change_pct", 0),
+            "change": q.get("change", 0),
+            "volume": q.get("volume", 0),
+        })
+    _us_heatmap_cache["data"] = result
+    _us_heatmap_cache["ts"] = time.time()
+    return result
+
 @router.get("/heatmap")
 async def get_us_heatmap_data():
-    if _us_heatmap_cache["data"] and (time.time() - _us_heatmap_cache["ts"]) < _US_HEATMAP_TTL:
+    # Normally kept warm by the background prefetcher; rebuilt inline only on a cold start
+    if _us_heatmap_cache["data"] and (time.time() - _us_heatmap_cache["ts"]) < cache_ttl("NYSE", _US_HEATMAP_TTL):
         return _us_heatmap_cache["data"]
     try:
-        symbols = [s["symbol"] for s in US_HEATMAP_STOCKS]
-        quotes = await MarketDataService.get_multi_quotes(symbols)
-        quote_map = {q["symbol"]: q for q in quotes}
-        result = []
-        for stock in US_HEATMAP_STOCKS:
-            q = quote_map.get(stock["symbol"].upper(), {})
-            result.append({
-                "symbol": stock["symbol"],
-                "name": stock["name"],
-                "sector": stock["sector"],
-                "weight": stock["weight"],
-                "price": q.get("price", 0),
-                "change_pct": q.get("change_pct", 0),
-                "change": q.get("change", 0),
-                "volume": q.get("volume", 0),
-            })
-        _us_heatmap_cache["data"] = result
-        _us_heatmap_cache["ts"] = time.time()
-        return result
+        return await refresh_us_heatmap()
     except Exception as e:
         if _us_heatmap_cache["data"]:
             return _us_heatmap_cache["data"]
@@ -47,7 +56,7 @@ async def get_us_market_data(symbol: str, period: str = "1y", interval: str = "1
     try:
         df = await MarketDataService.get_historical_data(symbol, period, interval)
         market_status = MarketDataService.get_market_status(df)
-        df_with_indicators = MarketDataService.calculate_indicators(df)
+        df_with_indicators = MarketDataService.calculate_indicators(df, symbol, interval)
         data_json = df_with_indicators.reset_index().to_dict(orient="records")
         return {
             "symbol": symbol.upper(),
@@ -96,66 +105,68 @@ async def get_us_financials(symbol: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch financials: {str(e)}")
 
+_US_INDICES = [
+    {"symbol": "^GSPC", "name": "S&P 500", "category": "Broad Market",
+     "constituents": ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA"]},
+    {"symbol": "^DJI", "name": "Dow Jones Industrial", "category": "Broad Market",
+     "constituents": ["AAPL", "MSFT", "JPM", "V", "UNH"]},
+    {"symbol": "^IXIC", "name": "NASDAQ Composite", "category": "Broad Market",
+     "constituents": ["AAPL", "MSFT", "AMZN", "GOOGL", "META"]},
+    {"symbol": "^RUT", "name": "Russell 2000", "category": "Small Cap",
+     "constituents": ["SOFI", "PLTR", "HOOD", "RIVN", "LCID"]},
+    {"symbol": "^VIX", "name": "CBOE Volatility (VIX)", "category": "Volatility",
+     "constituents": []},
+    {"symbol": "^SOX", "name": "PHLX Semiconductor", "category": "Sectoral",
+     "constituents": ["NVDA", "AMD", "INTC", "AVGO", "QCOM"]},
+]
+
+async def refresh_us_indices():
+    all_index_symbols = [idx["symbol"] for idx in _US_INDICES]
+    idx_quotes = await MarketDataService.get_multi_quotes(all_index_symbols)
+    idx_quote_map = {q["symbol"]: q for q in idx_quotes}
+
+    all_constituents = list(set(
+        sym for idx in _US_INDICES for sym in idx["constituents"]
+    ))
+    constituent_quotes = []
+    if all_constituents:
+        constituent_quotes = await MarketDataService.get_multi_quotes(all_constituents)
+    constituent_map = {q["symbol"]: q for q in constituent_quotes}
+
+    result_list = []
+    for idx in _US_INDICES:
+        iq = idx_quote_map.get(idx["symbol"].upper(), {})
+        if not iq:
+            iq = idx_quote_map.get(idx["symbol"], {})
+        top = []
+        for sym in idx["constituents"]:
+            sq = constituent_map.get(sym.upper(), {})
+            if not sq:
+                sq = constituent_map.get(sym, {})
+            top.append({
+                "symbol": sq.get("symbol", sym),
+                "price": sq.get("price", 0),
+                "change_pct": sq.get("change_pct", 0),
+            })
+        result_list.append({
+            "symbol": idx["symbol"], "name": idx["name"], "category": idx["category"],
+            "price": iq.get("price", 0), "change": iq.get("change", 0),
+            "change_pct": iq.get("change_pct", 0), "prev_close": iq.get("prev_close", 0),
+            "open": iq.get("open", 0), "high": iq.get("high", 0),
+            "low": iq.get("low", 0), "volume": iq.get("volume", 0),
+            "top_stocks": top,
+        })
+
+    _us_indices_cache["data"] = result_list
+    _us_indices_cache["ts"] = time.time()
+    return result_list
+
 @router.get("/indices")
 async def get_us_indices():
-    if _us_indices_cache["data"] and (time.time() - _us_indices_cache["ts"]) < _US_INDICES_TTL:
+    if _us_indices_cache["data"] and (time.time() - _us_indices_cache["ts"]) < cache_ttl("NYSE", _US_INDICES_TTL):
         return _us_indices_cache["data"]
-
-    US_INDICES = [
-        {"symbol": "^GSPC", "name": "S&P 500", "category": "Broad Market",
-         "constituents": ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA"]},
-        {"symbol": "^DJI", "name": "Dow Jones Industrial", "category": "Broad Market",
-         "constituents": ["AAPL", "MSFT", "JPM", "V", "UNH"]},
-        {"symbol": "^IXIC", "name": "NASDAQ Composite", "category": "Broad Market",
-         "constituents": ["AAPL", "MSFT", "AMZN", "GOOGL", "META"]},
-        {"symbol": "^RUT", "name": "Russell 2000", "category": "Small Cap",
-         "constituents": ["SOFI", "PLTR", "HOOD", "RIVN", "LCID"]},
-        {"symbol": "^VIX", "name": "CBOE Volatility (VIX)", "category": "Volatility",
-         "constituents": []},
-        {"symbol": "^SOX", "name": "PHLX Semiconductor", "category": "Sectoral",
-         "constituents": ["NVDA", "AMD", "INTC", "AVGO", "QCOM"]},
-    ]
-
     try:
-        all_index_symbols = [idx["symbol"] for idx in US_INDICES]
-        idx_quotes = await MarketDataService.get_multi_quotes(all_index_symbols)
-        idx_quote_map = {q["symbol"]: q for q in idx_quotes}
-
-        all_constituents = list(set(
-            sym for idx in US_INDICES for sym in idx["constituents"]
-        ))
-        constituent_quotes = []
-        if all_constituents:
-            constituent_quotes = await MarketDataService.get_multi_quotes(all_constituents)
-        constituent_map = {q["symbol"]: q for q in constituent_quotes}
-
-        result_list = []
-        for idx in US_INDICES:
-            iq = idx_quote_map.get(idx["symbol"].upper(), {})
-            if not iq:
-                iq = idx_quote_map.get(idx["symbol"], {})
-            top = []
-            for sym in idx["constituents"]:
-                sq = constituent_map.get(sym.upper(), {})
-                if not sq:
-                    sq = constituent_map.get(sym, {})
-                top.append({
-                    "symbol": sq.get("symbol", sym),
-                    "price": sq.get("price", 0),
-                    "change_pct": sq.get("change_pct", 0),
-                })
-            result_list.append({
-                "symbol": idx["symbol"], "name": idx["name"], "category": idx["category"],
-                "price": iq.get("price", 0), "change": iq.get("change", 0),
-                "change_pct": iq.get("change_pct", 0), "prev_close": iq.get("prev_close", 0),
-                "open": iq.get("open", 0), "high": iq.get("high", 0),
-                "low": iq.get("low", 0), "volume": iq.get("volume", 0),
-                "top_stocks": top,
-            })
-
-        _us_indices_cache["data"] = result_list
-        _us_indices_cache["ts"] = time.time()
-        return result_list
+        return await refresh_us_indices()
     except Exception as e:
         if _us_indices_cache["data"]:
             return _us_indices_cache["data"]
@@ -208,3 +219,20 @@ async def get_us_market_status():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/screener")
+async def get_us_screener(indicators: str = "RSI,SMA_50,ROC", sort: str = "period_return", period: str = "1y",
+                         limit: int = Query(50, ge=1, le=500)):
+    columns = [c.strip() for c in indicators.split(",") if c.strip()]
+    key = (tuple(columns), period)
+    rows, _ = _us_screener_cache.get(key)
+    if rows is None:
+        try:
+            rows = await MarketDataService.screen(US_HEATMAP_STOCKS, columns, period)
+        except ValueError as ve:
+            raise HTTPException(status_code=400, detail=str(ve))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to run screener: {str(e)}")
+        _us_screener_cache.set(key, rows, ttl=cache_ttl("NYSE", _US_SCREENER_TTL))
+    if rows and sort not in rows[0]:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort}")
+    return MarketDataService.rank_screen(rows, sort)[:limit]
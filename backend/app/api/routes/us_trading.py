@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.services.us_trading_service import USTradingService
+from app.services.trade_history import MAX_PAGE_SIZE
 from app.services.charges import USChargesCalculator
-from app.schemas.trading import TradeCreate, PortfolioResponse, TradeResponse
+from app.schemas.trading import TradeBatch, TradeCreate, PortfolioResponse, TradeResponse
 
 router = APIRouter()
 
@@ -22,13 +24,40 @@ async def execute_us_trade(trade: TradeCreate, db: AsyncSession = Depends(get_db
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Trade execution failed: {str(e)}")
 
+@router.post("/execute/batch", status_code=201)
+async def execute_us_batch(batch: TradeBatch, db: AsyncSession = Depends(get_db)):
+    try:
+        return await USTradingService.execute_batch(db, batch.orders)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch execution failed: {str(e)}")
+
 @router.get("/portfolio", response_model=list[PortfolioResponse])
 async def get_us_portfolio(db: AsyncSession = Depends(get_db)):
     return await USTradingService.get_portfolio(db)
 
 @router.get("/history")
-async def get_us_history(db: AsyncSession = Depends(get_db)):
-    trades = await USTradingService.get_recent_trades(db)
+async def get_us_history(
+    response: Response,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+    symbol: str = None,
+    strategy: str = None,
+    side: str = Query(None, pattern="^(BUY|SELL)$"),
+    start: datetime = None,
+    end: datetime = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Trades newest first. When there are more, the ``X-Next-Cursor`` header holds the
+    ``cursor`` that fetches the next page.
+    """
+    try:
+        trades, next_cursor = await USTradingService.get_trade_history(db, limit, cursor, symbol, strategy, side, start, end)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
         {
             "id": t.id,
@@ -48,6 +77,10 @@ async def get_us_history(db: AsyncSession = Depends(get_db)):
 async def get_us_account(db: AsyncSession = Depends(get_db)):
     return await USTradingService.get_account_info(db)
 
+@router.get("/diagnostics")
+async def get_us_diagnostics():
+    return USTradingService.get_diagnostics()
+
 @router.post("/exit/{symbol}")
 async def exit_us_position(symbol: str, price: float, quantity: float = None, db: AsyncSession = Depends(get_db)):
     try:
@@ -61,8 +94,8 @@ async def exit_us_position(symbol: str, price: float, quantity: float = None, db
         raise HTTPException(status_code=400, detail=str(ve))
 
 @router.post("/reset")
-async def reset_us_account(db: AsyncSession = Depends(get_db)):
-    return await USTradingService.reset_account(db)
+async def reset_us_account(archive: bool = False, db: AsyncSession = Depends(get_db)):
+    return await USTradingService.reset_account(db, archive)
 
 @router.get("/charges/estimate")
 async def estimate_us_charges(side: str, product_type: str, price: float, quantity: float):
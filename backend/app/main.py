@@ -18,6 +18,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.on_event("startup")
@@ -41,6 +42,31 @@ async def startup():
         except Exception:
             pass
 
+        for table in ("paper_account", "us_paper_account"):
+            try:
+                await conn.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0"
+                ))
+            except Exception:
+                pass
+
+    # Keep the heatmap / index boards warm so reads are always served from memory
+    from app.services.prefetcher import prefetcher
+    prefetcher.register("nse_heatmap", "NSE", market.refresh_heatmap, open_interval=60)
+    prefetcher.register("nse_indices", "NSE", market.refresh_indices, open_interval=60)
+    prefetcher.register("us_heatmap", "NYSE", us_market.refresh_us_heatmap, open_interval=60)
+    prefetcher.register("us_indices", "NYSE", us_market.refresh_us_indices, open_interval=60)
+    prefetcher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    from app.services.prefetcher import prefetcher
+    await prefetcher.stop()
+    from app.services.http_pool import http_pool
+    http_pool.close()
+    from app.services.executors import shutdown_pools
+    shutdown_pools()
+
 app.include_router(market.router, prefix="/api/v1/market", tags=["Market Data"])
 app.include_router(trading.router, prefix="/api/v1/trade", tags=["Paper Trading"])
 app.include_router(strategy.router, prefix="/api/v1/strategy", tags=["Automated Strategies"])
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from datetime import datetime
 from app.db.database import Base
 
 class Trade(Base):
     __tablename__ = "trades"
+    __table_args__ = (
+        # Keyset pages of the history, newest first, optionally by symbol or strategy
+        Index("ix_trades_timestamp_id", "timestamp", "id"),
+        Index("ix_trades_symbol_timestamp_id", "symbol", "timestamp", "id"),
+        Index("ix_trades_strategy_name_timestamp_id", "strategy_name", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String, index=True, nullable=False)
@@ -31,4 +37,21 @@ class PaperAccount(Base):
     balance = Column(Float, default=100000.0)
     initial_balance = Column(Float, default=100000.0)
     total_charges_paid = Column(Float, default=0.0)
-    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TradeArchive(Base):
+    """Trade rows moved out of the live table by an archiving reset, one batch per ``archived_at``."""
+    __tablename__ = "trade_archive"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    trade_id = Column(Integer, nullable=False)
+    symbol = Column(String, index=True, nullable=False)
+    side = Column(String, nullable=False)
+    product_type = Column(String, default="DELIVERY")
+    price = Column(Float, nullable=False)
+    quantity = Column(Float, nullable=False)
+    timestamp = Column(DateTime)
+    strategy_name = Column(String)
+    charges = Column(Float, default=0.0)
+    archived_at = Column(DateTime, index=True, nullable=False)
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+class SweepRequest(BaseModel):
+    symbols: list[str] = Field(..., min_length=1, max_length=200, example=["TCS.NS", "INFY.NS"])
+    fast_windows: list[int] = Field(..., min_length=1, example=[5, 10, 20])
+    slow_windows: list[int] = Field(..., min_length=1, example=[50, 100, 200])
+    capitals: list[float] = Field(default=[10000], min_length=1, example=[10000, 100000])
+    period: str = Field("1y", example="2y")
+    interval: str = Field("1d", example="1d")
+    top: int = Field(50, gt=0, le=5000, example=50)
+    include_charges: bool = Field(True, example=True)
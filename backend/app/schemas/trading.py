@@ -9,6 +9,9 @@ class TradeCreate(BaseModel):
     price: float = Field(..., gt=0, example=150.25)
     strategy_name: str = Field(default="Manual", example="SMA_Crossover")
 
+class TradeBatch(BaseModel):
+    orders: list[TradeCreate] = Field(..., min_length=1, max_length=500)
+
 class PortfolioResponse(BaseModel):
     symbol: str
     average_price: float
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import time
+from typing import NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.ledger import LedgerModels, _account_row
+
+# ---------------------------------------------------------------------------
+# In-process account and position cache
+#
+# One snapshot per market: the account row and every open position. Reads are
+# served from it. Writes in this process go through to it after their commit,
+# using the values the write statement returned, so a worker always sees its
+# own trades immediately.
+#
+# Other workers' writes are caught through the account's ``version`` column,
+# which every ledger write increments. A snapshot is trusted for
+# ACCOUNT_CACHE_REVALIDATE seconds. After that, the next read checks the
+# version with one single-row query and reloads only if it has moved.
+# ---------------------------------------------------------------------------
+
+ACCOUNT_CACHE_REVALIDATE = float(os.environ.get("ACCOUNT_CACHE_REVALIDATE", "2"))
+
+
+class Position(NamedTuple):
+    symbol: str
+    average_price: float
+    total_quantity: float
+
+
+class AccountSnapshot(NamedTuple):
+    version: int
+    balance: float
+    initial_balance: float
+    total_charges_paid: float
+    positions: dict  # symbol -> Position
+
+
+class AccountCache:
+    def __init__(self, models: LedgerModels, revalidate: float = ACCOUNT_CACHE_REVALIDATE):
+        self.models = models
+        self.revalidate = revalidate
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._generation = 0  # bumped on every change, so an overlapping load cannot install an older state
+        self._lock = asyncio.Lock()
+        self._stats = {"hits": 0, "revalidations": 0, "loads": 0, "write_throughs": 0, "invalidations": 0}
+
+    async def get(self, db: AsyncSession) -> AccountSnapshot | None:
+        """The current snapshot, or None if there is no account yet."""
+        if self._fresh():
+            self._stats["hits"] += 1
+            return self._snapshot
+        async with self._lock:
+            if self._fresh():
+                self._stats["hits"] += 1
+                return self._snapshot
+            account = self.models.account
+            snapshot = self._snapshot
+            if snapshot is not None:
+                version = await db.scalar(select(account.version).where(_account_row(account)))
+                await db.commit()
+                if version == snapshot.version:
+                    self._stats["revalidations"] += 1
+                    self._checked_at = time.monotonic()
+                    return snapshot
+            return await self._load(db)
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._checked_at < self.revalidate
+
+    async def _load(self, db: AsyncSession) -> AccountSnapshot | None:
+        account, portfolio, _ = self.models
+        generation = self._generation
+        # FOR SHARE holds writers off the account row until both reads are done, so the
+        # positions always match the version read with them.
+        row = (await db.execute(select(account).where(_account_row(account)).with_for_update(read=True))).scalars().first()
+        if row is None:
+            await db.commit()
+            return None
+        positions = (await db.execute(select(portfolio))).scalars().all()
+        snapshot = AccountSnapshot(
+            version=row.version,
+            balance=row.balance,
+            initial_balance=row.initial_balance,
+            total_charges_paid=row.total_charges_paid,
+            positions={p.symbol: Position(p.symbol, p.average_price, p.total_quantity) for p in positions},
+        )
+        await db.commit()
+        self._stats["loads"] += 1
+        if generation == self._generation:
+            self._snapshot, self._checked_at = snapshot, time.monotonic()
+        return snapshot
+
+    def write_through(self, version: int, balance: float, total_charges_paid: float, positions: dict) -> None:
+        """Apply a committed write. ``positions`` maps each symbol it touched to its new
+        (average_price, total_quantity), or to None once closed. Applied only on top of
+        the version just before it; after any gap the snapshot is dropped instead.
+        """
+        snapshot = self._snapshot
+        self._generation += 1
+        if snapshot is None or snapshot.version != version - 1:
+            self._drop()
+            return
+        held = dict(snapshot.positions)
+        for symbol, position in positions.items():
+            if position is None:
+                held.pop(symbol, None)
+            else:
+                held[symbol] = Position(symbol, *position)
+        self._snapshot = snapshot._replace(
+            version=version, balance=balance, total_charges_paid=total_charges_paid, positions=held,
+        )
+        self._stats["write_throughs"] += 1
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._drop()
+
+    def _drop(self):
+        if self._snapshot is not None:
+            self._stats["invalidations"] += 1
+        self._snapshot = None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            "version": snapshot.version if snapshot is not None else None,
+            "positions": len(snapshot.positions) if snapshot is not None else 0,
+        }
@@ -0,0 +1,407 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+from app.services.indicators import rolling_mean
+
+# ---------------------------------------------------------------------------
+# Backtest kernels
+#
+# Pure NumPy, with no app or network imports, so process-pool workers can import
+# this module cheaply. Prices for a sweep are handed to workers through one
+# shared-memory block instead of being pickled into every task.
+# ---------------------------------------------------------------------------
+
+
+def crossover_signals(fast: np.ndarray, slow: np.ndarray, start: int) -> tuple[np.ndarray, np.ndarray]:
+    """BUY where ``fast`` crosses above ``slow`` and SELL where it crosses below, for bars
+    ``start`` onwards. NaN averages never signal; a bar that qualifies as BUY is not a SELL.
+    """
+    prev_fast, prev_slow = fast[start - 1:-1], slow[start - 1:-1]
+    cur_fast, cur_slow = fast[start:], slow[start:]
+    buy = (prev_fast <= prev_slow) & (cur_fast > cur_slow)
+    sell = (prev_fast >= prev_slow) & (cur_fast < cur_slow) & ~buy
+    return buy, sell
+
+
+class FeeModel:
+    """Charges for simulated fills, priced through the calculator's vectorised
+    ``total_batch`` so a backtest deducts exactly what paper trading would.
+    Picklable for process pools.
+    """
+
+    def __init__(self, calculator, product_type: str = "DELIVERY"):
+        self.calculator = calculator
+        self.product_type = product_type
+
+    def batch(self, side: str, price: float, quantity) -> np.ndarray:
+        """Total charges for ``side`` fills at ``price``, one per element of ``quantity``."""
+        return self.calculator.total_batch(side, self.product_type, price, quantity)
+
+    def __call__(self, side: str, price: float, quantity: int) -> float:
+        return float(self.batch(side, price, quantity)[0])
+
+
+_FIT_WINDOW = 64  # quantities priced at once below the cash-only maximum
+
+
+def affordable_shares(budget: float, price: float, fee: FeeModel) -> tuple[int, float]:
+    """Most whole shares whose cost plus charges fits in ``budget``, and those charges.
+
+    Charges never fall as the quantity grows, so the answer is the largest fitting one
+    among the quantities just below ``budget // price``, priced in one batch. Only when
+    none of those fit is a second batch priced, reaching down to the quantity whose cost
+    fits beside the charges of the largest one.
+    """
+    top = int(budget // price)
+    if top <= 0:
+        return 0, 0.0
+    quantities = np.arange(max(top - _FIT_WINDOW, 0), top + 1)
+    charges = fee.batch("BUY", price, quantities)
+    fits = np.flatnonzero(quantities * price + charges <= budget)
+    if not len(fits) and quantities[0] > 0:
+        lo = max(int((budget - charges[-1]) // price), 0)
+        quantities = np.arange(lo, quantities[0])
+        charges = fee.batch("BUY", price, quantities)
+        fits = np.flatnonzero(quantities * price + charges <= budget)
+    if not len(fits) or quantities[fits[-1]] == 0:
+        return 0, 0.0
+    return int(quantities[fits[-1]]), float(charges[fits[-1]])
+
+
+def simulate_sma_crossover(close: np.ndarray, fast: np.ndarray, slow: np.ndarray,
+                           initial_capital: float, start: int = 50, fee: FeeModel | None = None):
+    """All-in / all-out SMA crossover over bars ``start``..end.
+
+    Signals are found with array comparisons; only the bars that signal are walked in
+    Python to apply the cash and position rules. Between fills cash and shares are
+    constant, so the equity curve is filled in one segment at a time. With a ``fee``
+    model, buys are sized so cost plus charges fit the cash and every fill pays its charges.
+    Returns (fills, equity, capital, position); each fill is (bar, side, price, shares, value, charges)
+    and ``equity`` holds the unrounded portfolio value for bars ``start``..end.
+    """
+    n = len(close)
+    buy, sell = crossover_signals(fast, slow, start)
+    capital = initial_capital
+    position = 0
+    fills = []
+    cash = np.empty(n - start, dtype=np.float64)
+    shares = np.empty(n - start, dtype=np.float64)
+    seg_start = 0
+
+    for j in np.flatnonzero(buy | sell):
+        price = close[start + j]
+        if buy[j] and capital >= price:
+            shares_to_buy = int(capital // price)
+            charge = 0.0
+            if fee is not None:
+                shares_to_buy, charge = affordable_shares(capital, price, fee)
+                if not shares_to_buy:
+                    continue
+            cost = shares_to_buy * price
+            cash[seg_start:j], shares[seg_start:j] = capital, position
+            capital -= cost + charge
+            position += shares_to_buy
+            fills.append((start + j, "BUY", price, shares_to_buy, cost, charge))
+            seg_start = j
+        elif sell[j] and position > 0:
+            revenue = position * price
+            charge = fee("SELL", price, position) if fee is not None else 0.0
+            cash[seg_start:j], shares[seg_start:j] = capital, position
+            capital += revenue - charge
+            fills.append((start + j, "SELL", price, position, revenue, charge))
+            position = 0
+            seg_start = j
+    cash[seg_start:], shares[seg_start:] = capital, position
+
+    equity = cash + shares * close[start:]
+    return fills, equity, capital, position
+
+
+def affordable_shares_batch(budgets: np.ndarray, prices: np.ndarray, fee: FeeModel) -> tuple[np.ndarray, np.ndarray]:
+    """``affordable_shares`` for many (budget, price) pairs: one batch prices the window
+    below each pair's cash-only maximum. The rare pair with no fit in its window falls
+    back to ``affordable_shares``.
+    """
+    window = (budgets // prices)[:, None] - np.arange(_FIT_WINDOW, -1, -1)
+    charges = fee.batch("BUY", prices[:, None], window).reshape(window.shape)
+    fits = (window > 0) & (window * prices[:, None] + charges <= budgets[:, None])
+    last = _FIT_WINDOW - np.argmax(fits[:, ::-1], axis=1)
+    rows = np.arange(len(window))
+    quantities = np.where(fits[rows, last], window[rows, last], 0.0)
+    paid = np.where(fits[rows, last], charges[rows, last], 0.0)
+    for i in np.flatnonzero(~fits.any(axis=1) & (window[:, 0] > 0)):
+        quantities[i], paid[i] = affordable_shares(float(budgets[i]), float(prices[i]), fee)
+    return quantities, paid
+
+
+def simulate_sma_runs(close: np.ndarray, runs: list, fee: FeeModel | None = None) -> list:
+    """Many ``simulate_sma_crossover`` runs over the same closes, advanced in lockstep.
+
+    ``runs`` holds (fast, slow, start, initial_capital) per run. Round k takes every
+    run's k-th signal bar, so each round's buys and sells are charged in one batch
+    call instead of one call per fill. Returns (fills, capital, position) per run,
+    equal to what ``simulate_sma_crossover`` returns for it; ``equity_curve`` rebuilds
+    a run's equity from its fills.
+    """
+    bars, buys, sells = [], [], []
+    for fast, slow, start, _ in runs:
+        buy, sell = crossover_signals(fast, slow, start)
+        j = np.flatnonzero(buy | sell)
+        bars.append(start + j)
+        buys.append(buy[j])
+        sells.append(sell[j])
+    counts = np.array([len(b) for b in bars], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    bars = np.concatenate(bars) if bars else np.empty(0, dtype=np.int64)
+    buys = np.concatenate(buys) if buys else np.empty(0, dtype=bool)
+    sells = np.concatenate(sells) if sells else np.empty(0, dtype=bool)
+
+    capital = np.array([run[3] for run in runs], dtype=np.float64)
+    position = np.zeros(len(runs))
+    fills = [[] for _ in runs]
+    for k in range(int(counts.max()) if len(counts) else 0):
+        active = np.flatnonzero(counts > k)
+        event = offsets[active] + k
+        price = close[bars[event]]
+        buying = buys[event] & (capital[active] >= price)
+        selling = ~buying & sells[event] & (position[active] > 0)
+
+        if buying.any():
+            rows, at, p = active[buying], bars[event][buying], price[buying]
+            if fee is not None:
+                qty, charge = affordable_shares_batch(capital[rows], p, fee)
+            else:
+                qty, charge = capital[rows] // p, np.zeros(len(rows))
+            filled = qty > 0
+            rows, at, p, qty, charge = rows[filled], at[filled], p[filled], qty[filled], charge[filled]
+            cost = qty * p
+            capital[rows] -= cost + charge
+            position[rows] += qty
+            for r, bar, fill in zip(rows.tolist(), at.tolist(), zip(p.tolist(), qty.tolist(), cost.tolist(), charge.tolist())):
+                fills[r].append((bar, "BUY", fill[0], int(fill[1]), fill[2], fill[3]))
+
+        if selling.any():
+            rows, at, p = active[selling], bars[event][selling], price[selling]
+            qty = position[rows]
+            revenue = qty * p
+            charge = fee.batch("SELL", p, qty) if fee is not None else np.zeros(len(rows))
+            capital[rows] += revenue - charge
+            position[rows] = 0
+            for r, bar, fill in zip(rows.tolist(), at.tolist(), zip(p.tolist(), qty.tolist(), revenue.tolist(), charge.tolist())):
+                fills[r].append((bar, "SELL", fill[0], int(fill[1]), fill[2], fill[3]))
+
+    return [(fills[r], float(capital[r]), int(position[r])) for r in range(len(runs))]
+
+
+def equity_curve(close: np.ndarray, start: int, initial_capital: float, fills: list) -> np.ndarray:
+    """Unrounded portfolio value for bars ``start``..end of a run with these ``fills``."""
+    n = len(close)
+    cash = np.empty(n - start, dtype=np.float64)
+    shares = np.empty(n - start, dtype=np.float64)
+    capital, position, seg_start = initial_capital, 0, 0
+    for bar, side, _, quantity, value, charge in fills:
+        j = bar - start
+        cash[seg_start:j], shares[seg_start:j] = capital, position
+        if side == "BUY":
+            capital -= value + charge
+            position += quantity
+        else:
+            capital += value - charge
+            position = 0
+        seg_start = j
+    cash[seg_start:], shares[seg_start:] = capital, position
+    return cash + shares * close[start:]
+
+
+def max_drawdown_pct(equity: np.ndarray) -> float:
+    """Largest peak-to-trough fall of ``equity``, as a positive percentage."""
+    if len(equity) == 0:
+        return 0.0
+    peak = np.fmax.accumulate(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = 1 - equity / peak
+    worst = np.nanmax(drawdown) if not np.isnan(drawdown).all() else 0.0
+    return float(max(worst, 0.0) * 100)
+
+
+def evaluate_sma_grid(shm_name: str, offset: int, length: int, symbol: str,
+                      pairs: list, capitals: list, fee: FeeModel | None = None) -> list:
+    """Process-pool task: run every (fast, slow) pair x capital for one symbol.
+
+    The symbol's closes are read in place from the shared-memory block ``shm_name``
+    (float64, ``length`` values starting at element ``offset``). Each moving average
+    is computed once and reused across the pairs and capitals that need it, and all the
+    runs are simulated in lockstep so their fills are charged in batches. Trading
+    starts on the first bar where the slow average has a previous value to cross from.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        close = np.ndarray((length,), dtype=np.float64, buffer=shm.buf, offset=offset * 8).copy()
+    finally:
+        shm.close()
+
+    smas = {}
+    for window in {w for pair in pairs for w in pair}:
+        smas[window] = rolling_mean(close, window)
+
+    combos = [(fast, slow, c) for fast, slow in pairs if max(fast, slow) < length for c in capitals]
+    results = simulate_sma_runs(
+        close, [(smas[fast], smas[slow], max(fast, slow), c) for fast, slow, c in combos], fee)
+
+    rows = []
+    for (fast, slow, initial_capital), (fills, capital, position) in zip(combos, results):
+        equity = equity_curve(close, max(fast, slow), initial_capital, fills)
+        final_value = capital + position * close[-1]
+        rows.append({
+            "symbol": symbol,
+            "fast": fast,
+            "slow": slow,
+            "initial_capital": initial_capital,
+            "final_value": round(float(final_value), 2),
+            "total_return_pct": round(float((final_value - initial_capital) / initial_capital * 100), 2),
+            "max_drawdown_pct": round(max_drawdown_pct(equity), 2),
+            "total_trades": len(fills),
+            "total_charges": round(sum(f[5] for f in fills), 2),
+        })
+    return rows
+
+
+def sma_crossover_signals(close: np.ndarray, fast: int, slow: int):
+    """Full-length BUY/SELL masks and signal strength (fast / slow - 1) for one symbol."""
+    fast_sma, slow_sma = rolling_mean(close, fast), rolling_mean(close, slow)
+    buy = np.zeros(len(close), dtype=bool)
+    sell = np.zeros(len(close), dtype=bool)
+    if len(close) > slow:
+        buy[slow:], sell[slow:] = crossover_signals(fast_sma, slow_sma, slow)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = fast_sma / slow_sma - 1
+    return buy, sell, strength
+
+
+def forward_fill(x: np.ndarray) -> np.ndarray:
+    """Carry the last non-NaN value of every column of a (time x symbol) array forward."""
+    valid = ~np.isnan(x)
+    rows = np.where(valid, np.arange(len(x))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = x[rows, np.arange(x.shape[1])]
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def simulate_portfolio(close: np.ndarray, buy: np.ndarray, sell: np.ndarray, strength: np.ndarray,
+                       initial_capital: float, max_positions: int, fees: list | None = None):
+    """SMA crossover across a (time x symbol) basket sharing one cash balance.
+
+    At every bar with a signal, exits are filled first, then entries in order of signal
+    strength. Each entry is sized to an equal slot of current equity
+    (equity / ``max_positions``), capped by the cash left, in whole shares; a symbol is
+    held at most once. With ``fees`` (one FeeModel per column) every fill pays its charges
+    and entries are sized so cost plus charges fit the slot. Cash and share changes are recorded per bar and accumulated
+    afterwards, so the equity curve comes out of a single cumulative sum.
+    Returns (fills, equity, cash, shares); each fill is (bar, column, side, price, shares, value, charges).
+    """
+    n_bars, n_symbols = close.shape
+    marks = np.nan_to_num(forward_fill(close))
+    cash_delta = np.zeros(n_bars)
+    share_delta = np.zeros((n_bars, n_symbols))
+    cash = float(initial_capital)
+    shares = np.zeros(n_symbols)
+    fills = []
+
+    for t in np.flatnonzero((buy | sell).any(axis=1)):
+        for k in np.flatnonzero(sell[t] & (shares > 0)):
+            price = close[t, k]
+            revenue = shares[k] * price
+            charge = fees[k]("SELL", price, int(shares[k])) if fees is not None else 0.0
+            cash += revenue - charge
+            cash_delta[t] += revenue - charge
+            share_delta[t, k] -= shares[k]
+            fills.append((t, k, "SELL", price, int(shares[k]), revenue, charge))
+            shares[k] = 0
+
+        candidates = np.flatnonzero(buy[t] & (shares == 0))
+        if not len(candidates):
+            continue
+        slot = (cash + shares @ marks[t]) / max_positions
+        held = int(np.count_nonzero(shares))
+        for k in candidates[np.argsort(-strength[t, candidates], kind="stable")]:
+            if held >= max_positions:
+                break
+            price = close[t, k]
+            if fees is not None:
+                qty, charge = affordable_shares(min(slot, cash), price, fees[k])
+            else:
+                qty, charge = int(min(slot, cash) // price), 0.0
+            if qty <= 0:
+                continue
+            cost = qty * price
+            cash -= cost + charge
+            cash_delta[t] -= cost + charge
+            share_delta[t, k] += qty
+            shares[k] = qty
+            held += 1
+            fills.append((t, k, "BUY", price, qty, cost, charge))
+
+    holdings = np.cumsum(share_delta, axis=0)
+    equity = initial_capital + np.cumsum(cash_delta) + (holdings * marks).sum(axis=1)
+    return fills, equity, cash, shares
+
+
+def _window_return(close, fast_sma, slow_sma, lo, hi, first_bar, initial_capital, fee=None):
+    """Crossover backtest on bars [lo, hi) using full-series averages (so the window
+    needs no warm-up of its own); ``first_bar`` is the first bar whose slow average has
+    a previous value. Returns (return %, equity, fills) or None if the window is too short.
+    """
+    start = max(1, first_bar - lo)
+    if start >= hi - lo:
+        return None
+    fills, equity, capital, position = simulate_sma_crossover(
+        close[lo:hi], fast_sma[lo:hi], slow_sma[lo:hi], initial_capital, start=start, fee=fee)
+    final_value = capital + position * close[hi - 1]
+    return (final_value - initial_capital) / initial_capital * 100, equity, fills
+
+
+def evaluate_walk_forward_fold(shm_name: str, shape: tuple, windows: list, pairs: list,
+                               bounds: tuple, initial_capital: float, fee: FeeModel | None = None) -> dict:
+    """Process-pool task for one walk-forward fold.
+
+    The shared-memory block holds a (1 + len(windows), T) float64 array: closes in row 0,
+    then the full-series SMA for each window. Every pair is backtested on the in-sample
+    bars [is_start, is_end); the best one by return is then run on [is_end, oos_end).
+    """
+    is_start, is_end, oos_end = bounds
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)[:, is_start:oos_end].copy()
+    finally:
+        shm.close()
+    close = data[0]
+    sma = {w: data[1 + i] for i, w in enumerate(windows)}
+    is_end, oos_end = is_end - is_start, oos_end - is_start
+
+    # In-sample: every pair at once, in lockstep (see simulate_sma_runs)
+    candidates = [(fast, slow, max(1, slow - is_start)) for fast, slow in pairs]
+    candidates = [c for c in candidates if c[2] < is_end]
+    results = simulate_sma_runs(
+        close[:is_end], [(sma[fast][:is_end], sma[slow][:is_end], start, initial_capital)
+                         for fast, slow, start in candidates], fee)
+    best = None
+    for (fast, slow, _), (_, capital, position) in zip(candidates, results):
+        in_sample = (capital + position * close[is_end - 1] - initial_capital) / initial_capital * 100
+        if best is None or in_sample > best[0]:
+            best = (in_sample, fast, slow)
+    if best is None:
+        return {"in_sample_return_pct": None}
+
+    in_sample_return, fast, slow = best
+    oos = _window_return(close, sma[fast], sma[slow], is_end, oos_end, slow - is_start, initial_capital, fee)
+    oos_return, equity, fills = oos if oos is not None else (0.0, np.empty(0), [])
+    return {
+        "fast": fast,
+        "slow": slow,
+        "in_sample_return_pct": round(float(in_sample_return), 2),
+        "out_of_sample_return_pct": round(float(oos_return), 2),
+        "out_of_sample_drawdown_pct": round(max_drawdown_pct(equity), 2),
+        "out_of_sample_trades": len(fills),
+        "out_of_sample_charges": round(sum(f[5] for f in fills), 2),
+    }
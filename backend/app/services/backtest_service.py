@@ -1,77 +1,405 @@
+import asyncio
+import math
+import time
+import numpy as np
 import pandas as pd
-from app.services.market_data import MarketDataService
+from multiprocessing import shared_memory
+from app.services.market_data import MarketDataService, NIFTY_HEATMAP_STOCKS, US_HEATMAP_STOCKS
+from app.services.backtest_core import (
+    simulate_sma_crossover, evaluate_sma_grid, sma_crossover_signals, simulate_portfolio, max_drawdown_pct,
+    evaluate_walk_forward_fold, FeeModel,
+)
+from app.services.cache import TTLCache
+from app.services.charges import calculator_for
+from app.services.executors import get_process_pool, process_pool_workers
+from app.services.indicators import rolling_mean
+from app.services.result_cache import result_cache, result_key
+
+_MAX_SWEEP_COMBINATIONS = 50_000
+_SWEEP_TASKS_PER_WORKER = 4
+_MAX_PORTFOLIO_CELLS = 20_000_000   # bars x symbols held in the accounting arrays
+_UNIVERSES = {"NSE": NIFTY_HEATMAP_STOCKS, "US": US_HEATMAP_STOCKS}
+_MAX_WALK_FORWARD_FOLDS = 200
+
+# Full-series SMAs keyed by the exact bar series they came from. Walk-forward folds
+# slice these instead of recomputing overlapping windows, and repeat runs reuse them.
+_sma_cache = TTLCache(maxsize=512, ttl=900)
+
+
+def _bar_dates(index: pd.Index) -> np.ndarray:
+    """``str(ts).split(" ")[0]`` for every bar, i.e. the local calendar date."""
+    if isinstance(index, pd.DatetimeIndex):
+        local = index.tz_localize(None) if index.tz is not None else index
+        return np.datetime_as_string(local.values.astype("datetime64[D]"), unit="D")
+    return np.array([str(x).split(" ")[0] for x in index])
+
+
+def _cached_sma(symbol: str, interval: str, index: pd.Index, close: np.ndarray, window: int) -> np.ndarray:
+    key = (symbol, interval, index[0], index[-1], len(index), window)
+    sma, _ = _sma_cache.get(key)
+    if sma is None:
+        sma = rolling_mean(close, window)
+        _sma_cache.set(key, sma)
+    return sma
+
+
+def _walk_forward_folds(n: int, in_sample: int, out_of_sample: int) -> list:
+    """(is_start, is_end, oos_end) for rolling folds that step forward by ``out_of_sample`` bars."""
+    return [
+        (start, start + in_sample, min(start + in_sample + out_of_sample, n))
+        for start in range(0, n - in_sample, out_of_sample)
+    ]
+
+
+def _charges_breakdown(fills: list, calculators: list, column: int | None = None) -> dict:
+    """Per-component charge totals for ``fills``, computed with the batch calculators.
+    ``calculators`` holds one calculator per symbol column (``column`` is the fill's
+    column position, or None for single-symbol fills).
+    """
+    groups = {}
+    for fill in fills:
+        calculator = calculators[fill[column] if column is not None else 0]
+        groups.setdefault(calculator, []).append(fill)
+    totals = {}
+    offset = 0 if column is None else 1
+    for calculator, group in groups.items():
+        sides = np.array([f[1 + offset] for f in group])
+        prices = np.array([f[2 + offset] for f in group], dtype=np.float64)
+        quantities = np.array([f[3 + offset] for f in group], dtype=np.float64)
+        for key, values in calculator.calculate_batch(sides, "DELIVERY", prices, quantities).items():
+            totals[key] = totals.get(key, 0.0) + float(values.sum())
+    return {key: round(value, 4) for key, value in totals.items()}
+
+
+async def _load_signals(symbol: str, period: str, interval: str, fast: int, slow: int):
+    """History for one symbol plus its crossover signals, computed as soon as it arrives."""
+    df = await MarketDataService.get_historical_data(symbol, period=period, interval=interval)
+    if len(df) <= slow:
+        raise ValueError("Not enough historical data to backtest.")
+    close = df["Close"].to_numpy(dtype=np.float64)
+    buy, sell, strength = await asyncio.to_thread(sma_crossover_signals, close, fast, slow)
+    return df.index, close, buy, sell, strength
+
 
 class BacktestService:
     @staticmethod
-    async def backtest_sma_strategy(symbol: str, initial_capital: float = 10000):
+    async def backtest_sma_strategy(symbol: str, initial_capital: float = 10000, include_charges: bool = True):
         try:
             df = await MarketDataService.get_historical_data(symbol, period="1y", interval="1d")
         except Exception as e:
             return {"error": f"Failed to fetch data for {symbol}: {str(e)}"}
 
-        df = MarketDataService.calculate_indicators(df)
-        
-        capital = initial_capital
-        position = 0
-        trades = []
-        equity_curve = []
+        # same bars + same parameters -> same result; skip the indicators and simulation
+        key = result_key("sma_crossover", {
+            "symbol": symbol, "fast": 20, "slow": 50,
+            "initial_capital": initial_capital, "include_charges": include_charges,
+        }, df)
+        cached = await asyncio.to_thread(result_cache.get, key)
+        if cached is not None:
+            return cached
+
+        df = MarketDataService.calculate_indicators(df, symbol, columns=["SMA_20", "SMA_50"])
         
         if len(df) < 50:
             return {"error": "Not enough historical data to backtest."}
 
-        for i in range(50, len(df)):
-            today = df.iloc[i]
-            prev = df.iloc[i-1]
-            price = today['Close']
-            date = str(today.name).split(" ")[0]
-
-            signal = None
-            
-            if prev['SMA_20'] <= prev['SMA_50'] and today['SMA_20'] > today['SMA_50']:
-                signal = 'BUY'
-            
-            elif prev['SMA_20'] >= prev['SMA_50'] and today['SMA_20'] < today['SMA_50']:
-                signal = 'SELL'
-
-            if signal == 'BUY' and capital >= price:
-                shares_to_buy = int(capital // price)
-                cost = shares_to_buy * price
-                capital -= cost
-                position += shares_to_buy
-                trades.append({
-                    "date": date, 
-                    "type": "BUY", 
-                    "price": round(price, 2), 
-                    "shares": shares_to_buy,
-                    "value": round(cost, 2)
-                })
-            
-            elif signal == 'SELL' and position > 0:
-                revenue = position * price
-                capital += revenue
-                trades.append({
-                    "date": date, 
-                    "type": "SELL", 
-                    "price": round(price, 2), 
-                    "shares": position,
-                    "value": round(revenue, 2)
-                })
-                position = 0
-            
-            total_value = capital + (position * price)
-            equity_curve.append({"time": date, "value": round(total_value, 2)})
-
-        final_stock_value = position * df.iloc[-1]['Close']
+        close = df['Close'].to_numpy(dtype=np.float64)
+        fills, equity, capital, position = simulate_sma_crossover(
+            close, df['SMA_20'].to_numpy(dtype=np.float64), df['SMA_50'].to_numpy(dtype=np.float64),
+            initial_capital, fee=FeeModel(calculator_for(symbol)) if include_charges else None,
+        )
+        dates = _bar_dates(df.index)
+
+        trades = [
+            {
+                "date": dates[i],
+                "type": side,
+                "price": round(price, 2),
+                "shares": shares,
+                "value": round(value, 2),
+                "charges": charges
+            }
+            for i, side, price, shares, value, charges in fills
+        ]
+        equity_curve = [
+            {"time": t, "value": v}
+            for t, v in zip(dates[50:].tolist(), np.round(equity, 2).tolist())
+        ]
+
+        final_stock_value = position * close[-1]
         total_portfolio_value = capital + final_stock_value
         
         total_return_pct = ((total_portfolio_value - initial_capital) / initial_capital) * 100
 
-        return {
+        result = {
             "symbol": symbol,
             "initial_capital": initial_capital,
             "final_value": round(total_portfolio_value, 2),
             "total_return_pct": round(total_return_pct, 2),
             "total_trades": len(trades),
+            "total_charges": round(sum(t["charges"] for t in trades), 2),
+            "charges_breakdown": _charges_breakdown(fills, [calculator_for(symbol)]),
             "trades": trades,
             "equity_curve": equity_curve
-        }
\ No newline at end of file
+        }
+        await asyncio.to_thread(result_cache.set, key, result)
+        return result
+
+    @staticmethod
+    async def sweep_sma_strategy(symbols: list, fast_windows: list, slow_windows: list,
+                                 capitals: list, period: str = "1y", interval: str = "1d",
+                                 top: int = 50, include_charges: bool = True) -> dict:
+        """Backtest every fast/slow window pair x capital x symbol in the process pool.
+
+        Histories are loaded concurrently and copied once into a shared-memory block
+        that the workers read from; each task covers one symbol and a slice of the grid.
+        Results are ranked by total return (best first).
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        pairs = sorted({(f, s) for f in fast_windows for s in slow_windows if 0 < f < s})
+        if not pairs:
+            raise ValueError("No valid (fast, slow) window pairs: every fast window must be shorter than the slow one.")
+        if any(c <= 0 for c in capitals):
+            raise ValueError("Capital sizes must be positive.")
+        combinations = len(pairs) * len(capitals) * len(symbols)
+        if combinations > _MAX_SWEEP_COMBINATIONS:
+            raise ValueError(f"Sweep has {combinations} combinations; the limit is {_MAX_SWEEP_COMBINATIONS}.")
+
+        shortest = min(s for _, s in pairs)
+        started = time.perf_counter()
+        frames = await asyncio.gather(
+            *[MarketDataService.get_historical_data(s, period=period, interval=interval) for s in symbols],
+            return_exceptions=True,
+        )
+        errors = {}
+        series = {}
+        for symbol, df in zip(symbols, frames):
+            if isinstance(df, Exception):
+                errors[symbol] = str(df)
+            elif len(df) <= shortest:
+                errors[symbol] = "Not enough historical data to backtest."
+            else:
+                series[symbol] = df["Close"].to_numpy(dtype=np.float64)
+
+        rows = []
+        if series:
+            total = sum(len(c) for c in series.values())
+            shm = shared_memory.SharedMemory(create=True, size=total * 8)
+            try:
+                prices = np.ndarray((total,), dtype=np.float64, buffer=shm.buf)
+                layout = {}
+                offset = 0
+                for symbol, close in series.items():
+                    prices[offset:offset + len(close)] = close
+                    layout[symbol] = (offset, len(close))
+                    offset += len(close)
+                del prices
+
+                pool = get_process_pool()
+                n_tasks = _SWEEP_TASKS_PER_WORKER * process_pool_workers()
+                chunk = max(1, math.ceil(len(pairs) * len(series) / n_tasks))
+                futures = [
+                    asyncio.wrap_future(pool.submit(
+                        evaluate_sma_grid, shm.name, offset, length, symbol, pairs[i:i + chunk], capitals,
+                        FeeModel(calculator_for(symbol)) if include_charges else None))
+                    for symbol, (offset, length) in layout.items()
+                    for i in range(0, len(pairs), chunk)
+                ]
+                for part in await asyncio.gather(*futures):
+                    rows.extend(part)
+            finally:
+                shm.close()
+                shm.unlink()
+
+        rows.sort(key=lambda r: (-r["total_return_pct"], r["max_drawdown_pct"]))
+        for rank, row in enumerate(rows, 1):
+            row["rank"] = rank
+
+        return {
+            "period": period,
+            "interval": interval,
+            "symbols": list(series),
+            "combinations": len(rows),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "errors": errors,
+            "results": rows[:top],
+        }
+
+
+    @staticmethod
+    async def backtest_portfolio(symbols: list | None = None, market: str = "NSE",
+                                 initial_capital: float = 100000, fast: int = 20, slow: int = 50,
+                                 max_positions: int = 10, period: str = "1y", interval: str = "1d",
+                                 include_charges: bool = True) -> dict:
+        """SMA crossover over a basket (default: the market's heatmap universe) with shared capital.
+
+        Every symbol is loaded and turned into signals concurrently; the signals are then
+        aligned on one time axis and run through a single portfolio accounting pass.
+        """
+        if not 0 < fast < slow:
+            raise ValueError("The fast window must be positive and shorter than the slow one.")
+        if max_positions < 1 or initial_capital <= 0:
+            raise ValueError("max_positions and initial_capital must be positive.")
+        if not symbols:
+            universe = _UNIVERSES.get(market.upper())
+            if universe is None:
+                raise ValueError(f"Unknown market: {market}")
+            symbols = [s["symbol"] for s in universe]
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+
+        results = await asyncio.gather(
+            *[_load_signals(s, period, interval, fast, slow) for s in symbols], return_exceptions=True,
+        )
+        errors = {s: str(r) for s, r in zip(symbols, results) if isinstance(r, Exception)}
+        loaded = {s: r for s, r in zip(symbols, results) if not isinstance(r, Exception)}
+        if not loaded:
+            raise ValueError("No data found for any symbol")
+
+        index = None
+        for idx, *_ in loaded.values():
+            index = idx if index is None else index.union(idx)
+        if len(index) * len(loaded) > _MAX_PORTFOLIO_CELLS:
+            raise ValueError("Basket is too large for this period/interval; use fewer symbols or a coarser interval.")
+        shape = (len(index), len(loaded))
+        close, strength = np.full(shape, np.nan), np.full(shape, np.nan)
+        buy, sell = np.zeros(shape, dtype=bool), np.zeros(shape, dtype=bool)
+        for k, (idx, c, b, s, st) in enumerate(loaded.values()):
+            rows = index.get_indexer(idx)
+            close[rows, k], buy[rows, k], sell[rows, k], strength[rows, k] = c, b, s, st
+
+        names = list(loaded)
+        calculators = [calculator_for(s) for s in names]
+        fees = [FeeModel(c) for c in calculators] if include_charges else None
+        fills, equity, cash, shares = await asyncio.to_thread(
+            simulate_portfolio, close, buy, sell, strength, initial_capital, max_positions, fees,
+        )
+        dates = _bar_dates(index)
+        last_close = np.nan_to_num(close[-1]) if len(index) else np.zeros(len(names))
+        final_value = float(equity[-1])
+        total_return_pct = (final_value - initial_capital) / initial_capital * 100
+
+        trades = [
+            {
+                "date": dates[t],
+                "symbol": names[k],
+                "type": side,
+                "price": round(float(price), 2),
+                "shares": qty,
+                "value": round(float(value), 2),
+                "charges": charges
+            }
+            for t, k, side, price, qty, value, charges in fills
+        ]
+        positions = [
+            {"symbol": names[k], "shares": int(shares[k]), "last_price": round(float(last_close[k]), 2)}
+            for k in np.flatnonzero(shares)
+        ]
+        equity_curve = [
+            {"time": t, "value": v}
+            for t, v in zip(dates[slow:].tolist(), np.round(equity[slow:], 2).tolist())
+        ]
+
+        return {
+            "symbols": names,
+            "initial_capital": initial_capital,
+            "final_value": round(final_value, 2),
+            "cash": round(cash, 2),
+            "total_return_pct": round(total_return_pct, 2),
+            "max_drawdown_pct": round(max_drawdown_pct(equity), 2),
+            "total_trades": len(trades),
+            "total_charges": round(sum(t["charges"] for t in trades), 2),
+            "charges_breakdown": _charges_breakdown(fills, calculators, column=1),
+            "open_positions": positions,
+            "errors": errors,
+            "trades": trades,
+            "equity_curve": equity_curve
+        }
+
+
+    @staticmethod
+    async def walk_forward(symbol: str, fast_windows: list, slow_windows: list,
+                           in_sample: int = 252, out_of_sample: int = 63,
+                           initial_capital: float = 10000, period: str = "5y", interval: str = "1d",
+                           include_charges: bool = True) -> dict:
+        """Walk-forward SMA crossover: on each rolling fold, pick the best window pair on
+        ``in_sample`` bars and trade it, untouched, on the next ``out_of_sample`` bars.
+
+        Every window's SMA is computed once over the whole history (and cached), then the
+        folds run in parallel in the process pool, reading closes and SMAs from shared memory.
+        """
+        pairs = sorted({(f, s) for f in fast_windows for s in slow_windows if 0 < f < s})
+        if not pairs:
+            raise ValueError("No valid (fast, slow) window pairs: every fast window must be shorter than the slow one.")
+        if in_sample < 2 or out_of_sample < 1 or initial_capital <= 0:
+            raise ValueError("in_sample, out_of_sample and initial_capital must be positive.")
+
+        df = await MarketDataService.get_historical_data(symbol, period=period, interval=interval)
+        key = result_key("sma_walk_forward", {
+            "symbol": symbol, "pairs": pairs, "in_sample": in_sample, "out_of_sample": out_of_sample,
+            "initial_capital": initial_capital, "include_charges": include_charges,
+        }, df)
+        cached = await asyncio.to_thread(result_cache.get, key)
+        if cached is not None:
+            return cached
+        folds = _walk_forward_folds(len(df), in_sample, out_of_sample)
+        if not folds:
+            raise ValueError(f"Need more than {in_sample} bars of history for a walk-forward test; got {len(df)}.")
+        if len(folds) > _MAX_WALK_FORWARD_FOLDS:
+            raise ValueError(f"Walk-forward has {len(folds)} folds; the limit is {_MAX_WALK_FORWARD_FOLDS}.")
+
+        close = df["Close"].to_numpy(dtype=np.float64)
+        windows = sorted({w for pair in pairs for w in pair})
+        sma_key = symbol.upper()
+        smas = [_cached_sma(sma_key, interval, df.index, close, w) for w in windows]
+
+        shape = (1 + len(windows), len(close))
+        shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * 8)
+        try:
+            data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            data[0] = close
+            for i, sma in enumerate(smas):
+                data[1 + i] = sma
+            del data
+            pool = get_process_pool()
+            results = await asyncio.gather(*[
+                asyncio.wrap_future(pool.submit(
+                    evaluate_walk_forward_fold, shm.name, shape, windows, pairs, bounds, initial_capital,
+                    FeeModel(calculator_for(symbol)) if include_charges else None))
+                for bounds in folds
+            ])
+        finally:
+            shm.close()
+            shm.unlink()
+
+        dates = _bar_dates(df.index)
+        fold_rows = []
+        growth = 1.0
+        for n, ((is_start, is_end, oos_end), result) in enumerate(zip(folds, results), 1):
+            if result["in_sample_return_pct"] is None:
+                continue
+            growth *= 1 + result["out_of_sample_return_pct"] / 100
+            fold_rows.append({
+                "fold": n,
+                "in_sample": {"start": dates[is_start], "end": dates[is_end - 1]},
+                "out_of_sample": {"start": dates[is_end], "end": dates[oos_end - 1]},
+                **result,
+            })
+
+        is_returns = [f["in_sample_return_pct"] for f in fold_rows]
+        oos_returns = [f["out_of_sample_return_pct"] for f in fold_rows]
+        mean_is = float(np.mean(is_returns)) if is_returns else 0.0
+        mean_oos = float(np.mean(oos_returns)) if oos_returns else 0.0
+        result = {
+            "symbol": symbol,
+            "in_sample_bars": in_sample,
+            "out_of_sample_bars": out_of_sample,
+            "total_folds": len(fold_rows),
+            "compounded_oos_return_pct": round((growth - 1) * 100, 2),
+            "mean_in_sample_return_pct": round(mean_is, 2),
+            "mean_out_of_sample_return_pct": round(mean_oos, 2),
+            "walk_forward_efficiency": round(mean_oos / mean_is, 3) if mean_is > 0 else None,
+            "profitable_oos_folds": sum(r > 0 for r in oos_returns),
+            "folds": fold_rows
+        }
+        await asyncio.to_thread(result_cache.set, key, result)
+        return result
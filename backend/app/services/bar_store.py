@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Local columnar OHLCV store
+#
+# One directory per interval/symbol, holding one memory-mapped .npy file per
+# column plus a meta.json that points at the current "generation" directory.
+# Writers build a complete new generation and then atomically swap meta.json,
+# so readers (other threads or other uvicorn workers) never see a half-written
+# frame.
+#
+#   <root>/1d/RELIANCE.NS/meta.json
+#   <root>/1d/RELIANCE.NS/<generation>/__index__.npy, Open.npy, Close.npy ...
+# ---------------------------------------------------------------------------
+
+BAR_STORE_DIR = os.environ.get(
+    "BAR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".bar_store"),
+)
+
+_INDEX_FILE = "__index__"
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]")
+
+INTRADAY_INTERVALS = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+_MAX_RESIDENT_FRAMES = int(os.environ.get("BAR_STORE_RESIDENT_FRAMES", "256"))
+
+
+def _encode_name(name: str) -> str:
+    """Make a symbol / column name safe to use as a file name (e.g. ``M&M.NS``, ``^NSEI``)."""
+    return _SAFE_NAME.sub(lambda m: "%%%02X" % ord(m.group(0)), name)
+
+
+def period_start(period: str, now: pd.Timestamp) -> pd.Timestamp | None:
+    """Earliest timestamp a yfinance-style ``period`` covers, relative to ``now``.
+    Returns None for ``max``. Day periods (``5d``, ``100d``) count trading sessions,
+    so the calendar bound returned for them is a conservative over-estimate.
+    """
+    p = period.lower()
+    if p == "max":
+        return None
+    if p == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz=now.tz)
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", p)
+    if not m:
+        raise ValueError(f"Unsupported period: {period}")
+    n, unit = int(m.group(1)), m.group(2)
+    if unit == "d":
+        # sessions -> calendar days, allowing for weekends and exchange holidays
+        return (now - pd.Timedelta(days=int(n * 7 / 5) + 5)).normalize()
+    if unit == "wk":
+        return (now - pd.Timedelta(weeks=n)).normalize()
+    if unit == "mo":
+        return (now - pd.DateOffset(months=n)).normalize()
+    return (now - pd.DateOffset(years=n)).normalize()
+
+
+def slice_period(df: pd.DataFrame, period: str, now: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Return the trailing part of ``df`` that a yfinance ``period`` request would return.
+    Always a positional slice, so the result is a view of ``df`` rather than a copy.
+    """
+    if df.empty or period.lower() == "max":
+        return df
+    if now is None:
+        now = pd.Timestamp.now(tz=df.index.tz)
+    m = re.fullmatch(r"(\d+)d", period.lower())
+    if m:
+        # "5d" / "100d" mean the last N sessions, for daily and intraday bars alike
+        sessions = df.index.normalize().unique()
+        n = int(m.group(1))
+        if len(sessions) <= n:
+            return df
+        return df.iloc[df.index.searchsorted(sessions[-n], side="left"):]
+    start = period_start(period, now)
+    pos = df.index.searchsorted(start, side="left")
+    return df.iloc[pos:]
+
+
+def period_sessions(period: str) -> int | None:
+    """N for a session-counted ``Nd`` period, else None."""
+    m = re.fullmatch(r"(\d+)d", period.lower())
+    return int(m.group(1)) if m else None
+
+
+def covers(meta: dict | None, period: str, now: pd.Timestamp) -> bool:
+    """Whether stored bars described by ``meta`` hold everything ``period`` asks for.
+    Day periods count sessions: the stored bars are contiguous up to the latest one,
+    so holding N sessions covers an ``Nd`` request whatever its calendar bound.
+    """
+    if not meta or not meta.get("rows"):
+        return False
+    if meta.get("covered_from") is None:
+        return True
+    sessions = period_sessions(period)
+    if sessions is not None and meta.get("sessions", 0) >= sessions:
+        return True
+    wanted_from = period_start(period, now)
+    return wanted_from is not None and meta["covered_from"] <= wanted_from.value
+
+
+def _decode_index(ts: np.ndarray, meta: dict) -> pd.DatetimeIndex:
+    """Stored UTC nanoseconds -> the DatetimeIndex the frame was written with."""
+    index = pd.DatetimeIndex(pd.to_datetime(np.asarray(ts), unit="ns", utc=True))
+    index = index.tz_convert(meta["tz"]) if meta.get("tz") else index.tz_localize(None)
+    index = index.as_unit(meta.get("unit", "ns"))
+    index.name = meta.get("index_name")
+    return index
+
+
+def _period_offset(ts: np.ndarray, meta: dict, period: str, chunk_bars: int) -> int:
+    """Position of the first bar ``slice_period`` would keep, found on the stored (memory-
+    mapped) UTC timestamps without decoding the whole index.
+    """
+    if period.lower() == "max" or len(ts) == 0:
+        return 0
+    m = re.fullmatch(r"(\d+)d", period.lower())
+    if m is None:
+        now = pd.Timestamp.now(tz=meta.get("tz"))
+        start = period_start(period, now)
+        return int(np.searchsorted(ts, start.value, side="left"))
+
+    # Last N sessions: walk back a chunk at a time, counting distinct days
+    n, counted, next_day, hi = int(m.group(1)), 0, None, len(ts)
+    while hi > 0:
+        lo = max(0, hi - chunk_bars)
+        days = _decode_index(ts[lo:hi], meta).normalize().as_unit("ns").asi8
+        new_days = np.unique(days)
+        if next_day is not None and new_days[-1] == next_day:
+            new_days = new_days[:-1]
+        if counted + len(new_days) >= n:
+            # a normalised day is its midnight on the same UTC-ns scale as the stored stamps
+            first = new_days[len(new_days) - (n - counted)]
+            return int(np.searchsorted(ts, first, side="left"))
+        counted += len(new_days)
+        next_day = days[0]
+        hi = lo
+    return 0
+
+
+class BarStore:
+    """On-disk, memory-mapped bar store keyed by (symbol, interval).
+
+    The most recently used frames are also kept decoded in memory, tagged with their
+    generation, so repeat reads only cost a meta.json stat-and-parse.
+    """
+
+    def __init__(self, root: str = BAR_STORE_DIR, max_resident: int = _MAX_RESIDENT_FRAMES):
+        self.root = root
+        self.max_resident = max_resident
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._frames = OrderedDict()  # (symbol, interval) -> (generation, df)
+        self._frames_lock = threading.Lock()
+
+    def lock(self, symbol: str, interval: str) -> threading.Lock:
+        """Per-key lock so only one thread refreshes a given symbol/interval at a time."""
+        key = (symbol.upper(), interval)
+        with self._locks_guard:
+            lk = self._locks.get(key)
+            if lk is None:
+                lk = self._locks[key] = threading.Lock()
+            return lk
+
+    def _dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, _encode_name(interval), _encode_name(symbol.upper()))
+
+    def read_meta(self, symbol: str, interval: str) -> dict | None:
+        try:
+            with open(os.path.join(self._dir(symbol, interval), "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def read(self, symbol: str, interval: str) -> tuple[pd.DataFrame | None, dict | None]:
+        """Load the stored frame and its metadata. Callers must treat the frame as read-only:
+        it is shared with every other reader of the same generation.
+        """
+        key = (symbol.upper(), interval)
+        for _ in range(2):
+            meta = self.read_meta(symbol, interval)
+            if meta is None:
+                return None, None
+            with self._frames_lock:
+                resident = self._frames.get(key)
+                if resident is not None and resident[0] == meta["generation"]:
+                    self._frames.move_to_end(key)
+                    return resident[1], meta
+            gen_dir = os.path.join(self._dir(symbol, interval), meta["generation"])
+            try:
+                ts = np.load(os.path.join(gen_dir, _INDEX_FILE + ".npy"), mmap_mode="r")
+                cols = {
+                    c: np.load(os.path.join(gen_dir, _encode_name(c) + ".npy"), mmap_mode="r")
+                    for c in meta["columns"]
+                }
+            except FileNotFoundError:
+                # A writer swapped generations between reading meta and opening files
+                continue
+            df = pd.DataFrame(cols, index=_decode_index(ts, meta), columns=meta["columns"])
+            with self._frames_lock:
+                self._frames[key] = (meta["generation"], df)
+                self._frames.move_to_end(key)
+                while len(self._frames) > self.max_resident:
+                    self._frames.popitem(last=False)
+            return df, meta
+        return None, None
+
+    def column_chunks(self, symbol: str, interval: str, column: str, period: str = "max",
+                      chunk_bars: int = 20_000):
+        """(index, values) chunks of one stored column over the bars ``slice_period`` would
+        return, read straight from the memory-mapped files: only one chunk of timestamps
+        and values is decoded at a time. Raises ValueError when there are no such bars.
+        """
+        for _ in range(2):
+            meta = self.read_meta(symbol, interval)
+            if meta is None or column not in meta["columns"]:
+                break
+            gen_dir = os.path.join(self._dir(symbol, interval), meta["generation"])
+            try:
+                # Mapped files stay readable even if a writer removes this generation later
+                ts = np.load(os.path.join(gen_dir, _INDEX_FILE + ".npy"), mmap_mode="r")
+                values = np.load(os.path.join(gen_dir, _encode_name(column) + ".npy"), mmap_mode="r")
+            except FileNotFoundError:
+                continue
+            start = _period_offset(ts, meta, period, chunk_bars)
+            if start >= len(ts):
+                break
+            return self._iter_chunks(ts, values, meta, start, chunk_bars)
+        raise ValueError(f"No data found for {symbol}")
+
+    @staticmethod
+    def _iter_chunks(ts, values, meta, start, chunk_bars):
+        for lo in range(start, len(ts), chunk_bars):
+            hi = min(lo + chunk_bars, len(ts))
+            yield _decode_index(ts[lo:hi], meta), np.array(values[lo:hi], dtype=np.float64)
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, covered_from: int | None) -> dict:
+        """Persist ``df`` as a new generation. ``covered_from`` is the earliest timestamp (ns)
+        the data is known to be complete from, or None when it holds the full ``max`` history.
+        """
+        base = self._dir(symbol, interval)
+        os.makedirs(base, exist_ok=True)
+        old = self.read_meta(symbol, interval)
+
+        generation = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+        gen_dir = os.path.join(base, generation)
+        os.makedirs(gen_dir)
+
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else None
+        if tz is None:
+            index = index.tz_localize("UTC")
+        np.save(os.path.join(gen_dir, _INDEX_FILE + ".npy"), index.as_unit("ns").asi8.astype(np.int64))
+
+        columns = []
+        for c in df.columns:
+            series = pd.to_numeric(df[c], errors="coerce")
+            if pd.api.types.is_integer_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.int64)
+            else:
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            np.save(os.path.join(gen_dir, _encode_name(str(c)) + ".npy"), values)
+            columns.append(str(c))
+
+        meta = {
+            "generation": generation,
+            "columns": columns,
+            "tz": tz,
+            "unit": index.unit,
+            "index_name": df.index.name,
+            "rows": len(df),
+            "sessions": int(df.index.normalize().nunique()),
+            "covered_from": covered_from,
+            "fetched_at": time.time(),
+        }
+        tmp = os.path.join(base, f"meta.json.{generation}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(base, "meta.json"))
+
+        if old and old.get("generation") != generation:
+            shutil.rmtree(os.path.join(base, old["generation"]), ignore_errors=True)
+        return meta
+
+    def touch(self, symbol: str, interval: str) -> None:
+        """Record a refresh that produced no new bars, so the next read stays local."""
+        base = self._dir(symbol, interval)
+        meta = self.read_meta(symbol, interval)
+        if meta is None:
+            return
+        meta["fetched_at"] = time.time()
+        tmp = os.path.join(base, f"meta.json.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(base, "meta.json"))
+
+
+bar_store = BarStore()
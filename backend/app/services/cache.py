@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and stale-while-revalidate.
+
+    An entry is *fresh* for ``ttl`` seconds, then *stale* for another ``stale_ttl``
+    seconds: stale entries are still returned (flagged as stale) so the caller can
+    serve them immediately and kick off a single background refresh via
+    ``claim_refresh``. Past that window the entry is treated as a miss.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._data = OrderedDict()  # key -> (value, stored_at, ttl)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "refreshes": 0}
+
+    def get(self, key):
+        """Return ``(value, is_stale)``; ``(None, False)`` on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, False
+            value, stored_at, ttl = entry
+            age = now - stored_at
+            if age < ttl:
+                self._data.move_to_end(key)
+                self._stats["hits"] += 1
+                return value, False
+            if age < ttl + self.stale_ttl:
+                self._data.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                return value, True
+            del self._data[key]
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None, False
+
+    def set(self, key, value, ttl: float | None = None):
+        with self._lock:
+            self._data[key] = (value, time.time(), self.ttl if ttl is None else ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def claim_refresh(self, key) -> bool:
+        """Return True for exactly one caller until ``release_refresh`` is called for ``key``."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self._stats["refreshes"] += 1
+            return True
+
+    def release_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "refreshing": len(self._refreshing),
+                "hit_rate": round((self._stats["hits"] + self._stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+            }
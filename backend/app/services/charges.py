@@ -1,3 +1,28 @@
+import numpy as np
+
+
+def _round(x: np.ndarray, ndigits: int) -> np.ndarray:
+    """Element-wise ``round(x, ndigits)``. NumPy's rounding can differ from Python's
+    correctly-rounded ``round`` on values sitting right at a half, so those few are
+    rounded by Python to keep batch results identical to ``calculate``.
+    """
+    out = np.round(x, ndigits)
+    scaled = np.abs(x) * 10.0 ** ndigits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        values, inverse = np.unique(x[near_half], return_inverse=True)
+        out[near_half] = np.array([round(v, ndigits) for v in values.tolist()])[inverse]
+    return out
+
+
+def _batch_inputs(side, product_type, price, quantity):
+    side, product_type, price, quantity = np.broadcast_arrays(
+        np.asarray(side), np.asarray(product_type),
+        np.asarray(price, dtype=np.float64), np.asarray(quantity, dtype=np.float64),
+    )
+    return side.ravel() == "BUY", product_type.ravel() == "DELIVERY", price.ravel(), quantity.ravel()
+
+
 class SEBIChargesCalculator:
     BROKERAGE_RATE = 0.0003
     MAX_BROKERAGE = 20.0
@@ -47,6 +72,50 @@ class SEBIChargesCalculator:
             "total": total,
         }
 
+    @classmethod
+    def _batch_components(cls, side, product_type, price, quantity) -> dict:
+        is_buy, is_delivery, price, quantity = _batch_inputs(side, product_type, price, quantity)
+        turnover = price * quantity
+
+        brokerage = np.minimum(turnover * cls.BROKERAGE_RATE, cls.MAX_BROKERAGE)
+        stt = np.where(
+            is_delivery,
+            np.where(is_buy, turnover * cls.STT_DELIVERY_BUY, turnover * cls.STT_DELIVERY_SELL),
+            np.where(is_buy, 0.0, turnover * cls.STT_INTRADAY_SELL),
+        )
+        transaction_charges = turnover * cls.NSE_TRANSACTION_CHARGE
+        gst = (brokerage + transaction_charges) * cls.GST_RATE
+        sebi_fee = turnover * cls.SEBI_TURNOVER_FEE
+        stamp_duty = np.where(is_buy, turnover * cls.STAMP_DUTY_BUY, 0.0)
+        return {
+            "brokerage": brokerage,
+            "stt": stt,
+            "transaction_charges": transaction_charges,
+            "gst": gst,
+            "sebi_fee": sebi_fee,
+            "stamp_duty": stamp_duty,
+        }
+
+    @staticmethod
+    def _batch_total(c: dict) -> np.ndarray:
+        return _round(
+            c["brokerage"] + c["stt"] + c["transaction_charges"] + c["gst"] + c["sebi_fee"] + c["stamp_duty"], 2
+        )
+
+    @classmethod
+    def calculate_batch(cls, side, product_type, price, quantity) -> dict:
+        """Vectorised ``calculate`` over arrays of fills (scalars broadcast). Returns the
+        same keys as ``calculate``, each an array with one value per fill.
+        """
+        c = cls._batch_components(side, product_type, price, quantity)
+        rounded = {key: _round(value, 4 if key == "sebi_fee" else 2) for key, value in c.items()}
+        return {**rounded, "total": cls._batch_total(c)}
+
+    @classmethod
+    def total_batch(cls, side, product_type, price, quantity) -> np.ndarray:
+        """Only the ``total`` column of ``calculate_batch``, without rounding the components."""
+        return cls._batch_total(cls._batch_components(side, product_type, price, quantity))
+
 
 class USChargesCalculator:
     """US market charges: SEC fee + FINRA TAF (zero commission model)."""
@@ -71,3 +140,39 @@ class USChargesCalculator:
             "finra_taf": round(finra_taf, 4),
             "total": round(total, 4),
         }
+
+    @classmethod
+    def _batch_components(cls, side, product_type, price, quantity) -> dict:
+        is_buy, _, price, quantity = _batch_inputs(side, product_type, price, quantity)
+        turnover = price * quantity
+        return {
+            "commission": np.zeros_like(turnover),
+            "sec_fee": np.where(is_buy, 0.0, turnover * cls.SEC_FEE_RATE),
+            "finra_taf": np.where(is_buy, 0.0, np.minimum(quantity * cls.FINRA_TAF_PER_SHARE, cls.FINRA_TAF_MAX)),
+        }
+
+    @staticmethod
+    def _batch_total(c: dict) -> np.ndarray:
+        return _round(_round(c["commission"] + c["sec_fee"] + c["finra_taf"], 4), 4)
+
+    @classmethod
+    def calculate_batch(cls, side, product_type, price, quantity) -> dict:
+        """Vectorised ``calculate`` over arrays of fills (scalars broadcast)."""
+        c = cls._batch_components(side, product_type, price, quantity)
+        return {
+            "commission": _round(c["commission"], 2),
+            "sec_fee": _round(c["sec_fee"], 4),
+            "finra_taf": _round(c["finra_taf"], 4),
+            "total": cls._batch_total(c),
+        }
+
+    @classmethod
+    def total_batch(cls, side, product_type, price, quantity) -> np.ndarray:
+        """Only the ``total`` column of ``calculate_batch``."""
+        return cls._batch_total(cls._batch_components(side, product_type, price, quantity))
+
+
+def calculator_for(symbol: str):
+    """The charges model paper trading applies to ``symbol`` (NSE/BSE or US)."""
+    upper = symbol.upper()
+    return SEBIChargesCalculator if upper.endswith(".NS") or upper.endswith(".BO") else USChargesCalculator
@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Worker caps per pool. These are process-wide: every request shares them, so a burst
+# of traffic queues up here instead of spawning more threads against the upstream APIs.
+_POOL_SIZES = {
+    "quotes": int(os.environ.get("QUOTES_POOL_WORKERS", "12")),
+    "fundamentals": int(os.environ.get("FUNDAMENTALS_POOL_WORKERS", "8")),
+    "history": int(os.environ.get("HISTORY_POOL_WORKERS", "6")),
+}
+
+# CPU-bound work (backtest sweeps) runs in worker processes, one per core by default.
+_PROCESS_POOL_WORKERS = int(os.environ.get("BACKTEST_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+
+
+class NamedPool:
+    """A long-lived ThreadPoolExecutor that tracks queue depth and task timings.
+
+    Only leaf work (one upstream call) should be submitted here. A task must never
+    block on another task in the same pool, or a full pool can deadlock itself.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0,
+                       "max_queue_depth": 0, "total_wait": 0.0, "total_run": 0.0}
+
+    def _wrap(self, fn, args, kwargs, submitted_at):
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._stats["total_wait"] += started - submitted_at
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._stats["completed" if ok else "failed"] += 1
+                    self._stats["total_run"] += time.perf_counter() - started
+        return task
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._queued += 1
+            self._stats["submitted"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+        future = self._executor.submit(self._wrap(fn, args, kwargs, time.perf_counter()))
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._stats["cancelled"] += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Await ``fn(*args, **kwargs)`` on this pool from the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._stats["completed"] + self._stats["failed"]
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queue_depth": self._queued,
+                **{k: v for k, v in self._stats.items() if not k.startswith("total_")},
+                "avg_wait_ms": round(self._stats["total_wait"] / started * 1000, 1) if started else 0,
+                "avg_run_ms": round(self._stats["total_run"] / started * 1000, 1) if started else 0,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name: str) -> NamedPool:
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = NamedPool(name, _POOL_SIZES[name])
+    return pool
+
+
+_process_pool = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound tasks. Workers are spawned rather than forked so
+    they don't inherit the server's threads and locks. A pool broken by a crashed worker
+    is replaced on the next call.
+    """
+    global _process_pool
+    with _pools_lock:
+        if _process_pool is None or getattr(_process_pool, "_broken", False):
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = ProcessPoolExecutor(max_workers=_PROCESS_POOL_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def process_pool_workers() -> int:
+    return _PROCESS_POOL_WORKERS
+
+
+def pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in list(_pools.items())}
+
+
+def shutdown_pools():
+    global _process_pool
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+_logger = logging.getLogger(__name__)
+
+
+class AsyncHTTPPool:
+    """Shared keep-alive HTTP client for the plain-HTTP market data providers.
+
+    The client lives on its own event loop in a daemon thread so it can be used both
+    from the worker threads that run the yfinance code paths (``run``) and from
+    coroutines on the app's loop (``run_async``). All requests share one connection
+    pool, a global concurrency cap and a per-host cap, so a burst of fallback
+    lookups reuses warm TCP/TLS connections instead of opening one per symbol.
+    """
+
+    def __init__(self, max_connections: int = 32, max_keepalive: int = 16,
+                 per_host: int = 8, timeout: float = 8.0):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.per_host = per_host
+        self.timeout = timeout
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._global_sem = None
+        self._host_sems = {}
+        self._start_lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "in_flight": 0}
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="http-pool", daemon=True)
+            thread.start()
+            self._thread = thread
+            self._loop = loop
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        # Only ever called on the pool's own loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                headers={"User-Agent": "Mozilla/5.0"},
+                follow_redirects=True,
+            )
+            self._global_sem = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    async def get(self, url: str, headers: dict | None = None) -> httpx.Response:
+        """GET ``url`` through the shared pool. Must run on the pool's loop (see ``run``)."""
+        client = self._ensure_client()
+        host = urlsplit(url).netloc
+        host_sem = self._host_sems.get(host)
+        if host_sem is None:
+            host_sem = self._host_sems[host] = asyncio.Semaphore(self.per_host)
+        async with self._global_sem, host_sem:
+            self._stats["requests"] += 1
+            self._stats["in_flight"] += 1
+            try:
+                resp = await client.get(url, headers=headers)
+                resp.raise_for_status()
+                return resp
+            except Exception:
+                self._stats["errors"] += 1
+                raise
+            finally:
+                self._stats["in_flight"] -= 1
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the pool's loop; returns a concurrent.futures.Future."""
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro, timeout: float | None = None):
+        """Run ``coro`` on the pool's loop and block the calling (worker) thread for the result."""
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro):
+        """Await ``coro`` on the pool's loop from any other event loop."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            try:
+                self.run(self._client.aclose(), timeout=5)
+            except Exception as exc:
+                _logger.debug("Error closing HTTP pool client: %s", exc)
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+        self._host_sems = {}
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "max_connections": self.max_connections,
+            "per_host": self.per_host,
+            "hosts": len(self._host_sems),
+        }
+
+
+http_pool = AsyncHTTPPool()
@@ -0,0 +1,293 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Incremental indicator engine
+#
+# Keeps the rolling-window and EWM state behind SMA_20, SMA_50, RSI, MACD and
+# Signal_Line per (symbol, interval, first bar), so a request that only adds
+# (or revises) the last few bars costs O(1) per bar instead of recomputing the
+# whole history. The accumulators replicate pandas' rolling-mean and
+# ewm(adjust=False) kernels operation for operation, including their
+# compensated summation and rounding guards, so the output is bit-identical to
+# Close.rolling(n).mean() / Close.ewm(span=n, adjust=False).mean().
+# ---------------------------------------------------------------------------
+
+_MAX_STREAMS = 512
+
+INDICATOR_COLUMNS = ["SMA_20", "SMA_50", "RSI", "MACD", "Signal_Line"]
+
+
+def _div(a: float, b: float) -> float:
+    """IEEE division like numpy's (x/0 -> +-inf, 0/0 -> nan) instead of raising."""
+    if b == 0:
+        if a == 0 or a != a:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _RollingMean:
+    """pandas ``roll_mean`` for a fixed window with min_periods == window."""
+
+    __slots__ = ("window", "nobs", "sum_x", "neg_ct", "comp_add", "comp_remove", "same_ct", "prev_value")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev_value = None
+
+    def state(self):
+        return (self.nobs, self.sum_x, self.neg_ct, self.comp_add, self.comp_remove, self.same_ct, self.prev_value)
+
+    def restore(self, state):
+        (self.nobs, self.sum_x, self.neg_ct, self.comp_add, self.comp_remove, self.same_ct, self.prev_value) = state
+
+    def _add(self, val: float):
+        if self.prev_value is None:
+            self.prev_value = val
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.same_ct += 1
+            else:
+                self.same_ct = 1
+            self.prev_value = val
+
+    def _remove(self, val: float):
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def update(self, val: float, leaving: float | None) -> float:
+        """Add the new bar's value (and drop ``leaving`` once the window is full)."""
+        if leaving is not None:
+            self._remove(leaving)
+        self._add(val)
+        if self.nobs >= self.window and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.same_ct >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+
+class _EwmMean:
+    """pandas ``ewm(span=..., adjust=False).mean()`` with the default min_periods/ignore_na."""
+
+    __slots__ = ("alpha", "old_wt_factor", "weighted", "old_wt", "nobs", "started")
+
+    def __init__(self, span: int):
+        com = (span - 1) / 2
+        self.alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - self.alpha
+        self.weighted = math.nan
+        self.old_wt = 1.
+        self.nobs = 0
+        self.started = False
+
+    def state(self):
+        return (self.weighted, self.old_wt, self.nobs, self.started)
+
+    def restore(self, state):
+        self.weighted, self.old_wt, self.nobs, self.started = state
+
+    def update(self, cur: float) -> float:
+        is_observation = cur == cur
+        if not self.started:
+            self.started = True
+            self.weighted = cur
+            self.nobs = int(is_observation)
+            self.old_wt = 1.
+        else:
+            self.nobs += is_observation
+            if self.weighted == self.weighted:
+                self.old_wt *= self.old_wt_factor
+                if is_observation:
+                    # pandas skips the update on an unchanged value to avoid rounding drift
+                    if self.weighted != cur:
+                        self.weighted = self.old_wt * self.weighted + self.alpha * cur
+                        self.weighted /= (self.old_wt + self.alpha)
+                    self.old_wt = 1.
+            elif is_observation:
+                self.weighted = cur
+        return self.weighted if self.nobs >= 1 else math.nan
+
+
+class _Buffer:
+    """Append-only float64 array with amortised O(1) growth."""
+
+    def __init__(self, width: int = 0):
+        self.n = 0
+        self.data = np.empty((256, width) if width else 256, dtype=np.float64)
+
+    def append(self, value):
+        if self.n == len(self.data):
+            grown = np.empty((2 * len(self.data),) + self.data.shape[1:], dtype=np.float64)
+            grown[:self.n] = self.data
+            self.data = grown
+        self.data[self.n] = value
+        self.n += 1
+
+    def __getitem__(self, i):
+        return float(self.data[i])
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.n]
+
+
+class IndicatorStream:
+    """Indicator state for one contiguous bar series, advanced one bar at a time."""
+
+    def __init__(self):
+        self.closes = _Buffer()
+        self.gains = _Buffer()
+        self.losses = _Buffer()
+        self.outputs = _Buffer(len(INDICATOR_COLUMNS))
+        self.timestamps = []
+        self.sma20 = _RollingMean(20)
+        self.sma50 = _RollingMean(50)
+        self.avg_gain = _RollingMean(14)
+        self.avg_loss = _RollingMean(14)
+        self.ema12 = _EwmMean(12)
+        self.ema26 = _EwmMean(26)
+        self.signal = _EwmMean(9)
+        self._before_last = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.closes.n
+
+    def _accumulators(self):
+        return (self.sma20, self.sma50, self.avg_gain, self.avg_loss, self.ema12, self.ema26, self.signal)
+
+    def _push(self, ts, close: float):
+        self._before_last = [acc.state() for acc in self._accumulators()]
+        i = len(self)
+        delta = close - self.closes[i - 1] if i else math.nan
+        gain = delta if delta > 0 else 0.0
+        loss = -(delta if delta < 0 else 0.0)
+        self.closes.append(close)
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.timestamps.append(ts)
+
+        sma20 = self.sma20.update(close, self.closes[i - 20] if i >= 20 else None)
+        sma50 = self.sma50.update(close, self.closes[i - 50] if i >= 50 else None)
+        g = self.avg_gain.update(gain, self.gains[i - 14] if i >= 14 else None)
+        l = self.avg_loss.update(loss, self.losses[i - 14] if i >= 14 else None)
+        rsi = 100 - _div(100, 1 + _div(g, l))
+        macd = self.ema12.update(close) - self.ema26.update(close)
+        signal = self.signal.update(macd)
+        self.outputs.append((sma20, sma50, rsi, macd, signal))
+
+    def _pop(self):
+        """Undo the last bar (a live bar that has since been revised)."""
+        for acc, state in zip(self._accumulators(), self._before_last):
+            acc.restore(state)
+        self._before_last = None
+        for buf in (self.closes, self.gains, self.losses, self.outputs):
+            buf.n -= 1
+        self.timestamps.pop()
+
+    def sync(self, index: pd.Index, closes: np.ndarray) -> bool:
+        """Bring the state in line with ``index``/``closes``. Returns False if the series
+        is not a continuation of what has been processed (the caller should start over).
+        """
+        n = len(self)
+        if n:
+            if len(closes) < n - 1:
+                return False
+            keep = n - 1
+            if not np.array_equal(self.closes.view()[:keep], closes[:keep], equal_nan=True):
+                return False
+            if keep and self.timestamps[keep - 1] != index[keep - 1]:
+                return False
+            last = self.closes[n - 1]
+            last_same = (len(closes) >= n and self.timestamps[-1] == index[n - 1]
+                         and (last == closes[n - 1] or (last != last and closes[n - 1] != closes[n - 1])))
+            if not last_same:
+                if self._before_last is None:
+                    return False
+                self._pop()
+        for i in range(len(self), len(closes)):
+            self._push(index[i], float(closes[i]))
+        return True
+
+    def columns(self, length: int) -> dict:
+        out = self.outputs.view()[:length]
+        return {col: out[:, k].copy() for k, col in enumerate(INDICATOR_COLUMNS)}
+
+
+class IndicatorStreams:
+    """LRU registry of IndicatorStream objects keyed by (symbol, interval, first bar)."""
+
+    def __init__(self, max_streams: int = _MAX_STREAMS):
+        self.max_streams = max_streams
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "rebuilds": 0, "bars_appended": 0}
+
+    def _get(self, key, fresh: bool = False) -> IndicatorStream:
+        with self._lock:
+            stream = None if fresh else self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = IndicatorStream()
+                self._stats["rebuilds"] += 1
+            else:
+                self._stats["hits"] += 1
+            self._streams.move_to_end(key)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+            return stream
+
+    def compute(self, symbol: str, interval: str, df: pd.DataFrame) -> dict:
+        """Indicator columns for ``df`` (as numpy arrays), reusing any state built so far."""
+        if df.empty:
+            return {col: np.empty(0, dtype=np.float64) for col in INDICATOR_COLUMNS}
+        closes = df["Close"].to_numpy(dtype=np.float64)
+        key = (symbol.upper(), interval, df.index[0])
+        stream = self._get(key)
+        with stream.lock:
+            before = len(stream)
+            if not stream.sync(df.index, closes):
+                stream = self._get(key, fresh=True)
+                with stream.lock:
+                    stream.sync(df.index, closes)
+                    before = 0
+                    cols = stream.columns(len(closes))
+            else:
+                cols = stream.columns(len(closes))
+            self._stats["bars_appended"] += max(len(closes) - before, 0)
+        return cols
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "streams": len(self._streams)}
+
+
+indicator_streams = IndicatorStreams()
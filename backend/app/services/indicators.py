@@ -0,0 +1,347 @@
+import re
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ---------------------------------------------------------------------------
+# Indicator registry
+#
+# Every indicator is a NumPy kernel over contiguous float64 arrays. Kernels work
+# along axis 0, so the same code handles one symbol (shape (T,)) or a
+# time x symbol panel (shape (T, N)). Callers ask for the columns they need and
+# only the kernels behind those columns run.
+# ---------------------------------------------------------------------------
+
+DEFAULT_INDICATORS = ["SMA_20", "SMA_50", "RSI", "MACD", "Signal_Line"]
+
+_EMA_BLOCK = 64
+
+
+def _as_float(a) -> np.ndarray:
+    return np.ascontiguousarray(a, dtype=np.float64)
+
+
+def _rolling(x: np.ndarray, n: int, reducer, **kwargs) -> np.ndarray:
+    """Apply ``reducer`` over trailing windows of ``n`` rows; NaN until the window is full
+    (or if it contains a NaN), like pandas ``rolling(n)`` with the default min_periods.
+    """
+    out = np.full(x.shape, np.nan)
+    if len(x) >= n:
+        out[n - 1:] = reducer(sliding_window_view(x, n, axis=0), axis=-1, **kwargs)
+    return out
+
+
+def rolling_mean(x, n):
+    return _rolling(_as_float(x), n, np.mean)
+
+
+def rolling_std(x, n):
+    return _rolling(_as_float(x), n, np.std, ddof=1)
+
+
+def rolling_max(x, n):
+    return _rolling(_as_float(x), n, np.max)
+
+
+def rolling_min(x, n):
+    return _rolling(_as_float(x), n, np.min)
+
+
+def _ema_loop(x: np.ndarray, alpha: float) -> np.ndarray:
+    """Sequential ewm(adjust=False) for series with gaps, with pandas' NaN handling."""
+    out = np.empty_like(x)
+    f = 1.0 - alpha
+    weighted, old_wt = x[0], 1.0
+    out[0] = weighted
+    for i in range(1, len(x)):
+        cur = x[i]
+        if weighted == weighted:
+            old_wt *= f
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        out[i] = weighted
+    return out
+
+
+def _ema_weights(alpha: float):
+    # y[t] = f*y[t-1] + a*x[t], solved a block at a time:
+    # y[b+j] = f^(j+1) * y[b-1] + a * sum_k<=j f^(j-k) * x[b+k]
+    f = 1.0 - alpha
+    j = np.arange(_EMA_BLOCK)
+    lag = j[:, None] - j[None, :]
+    weights = np.where(lag >= 0, alpha * f ** np.maximum(lag, 0), 0.0)
+    carry = f ** (j + 1)
+    return weights, carry
+
+
+def _ema_blocks(x: np.ndarray, prev, alpha: float) -> np.ndarray:
+    """Run the recurrence over gap-free rows of ``x`` (1-D or 2-D), seeded with ``prev``."""
+    weights, carry = _ema_weights(alpha)
+    if x.ndim > 1:
+        carry = carry[:, None]
+    out = np.empty_like(x)
+    for b in range(0, len(x), _EMA_BLOCK):
+        xb = x[b:b + _EMA_BLOCK]
+        m = len(xb)
+        yb = weights[:m, :m] @ xb + carry[:m] * prev
+        out[b:b + m] = yb
+        prev = yb[-1]
+    return out
+
+
+def _ema_1d(x: np.ndarray, alpha: float) -> np.ndarray:
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0:
+        return np.full(x.shape, np.nan)
+    start = valid[0]
+    if len(valid) != len(x) - start:
+        return _ema_loop(x, alpha)
+    out = np.full(x.shape, np.nan)
+    out[start] = x[start]
+    out[start + 1:] = _ema_blocks(x[start + 1:], x[start], alpha)
+    return out
+
+
+def _ema_2d(x: np.ndarray, alpha: float) -> np.ndarray:
+    """EMA down every column at once. Columns may start late (leading NaNs, e.g. a later
+    listing); columns with gaps after their first value go through the 1-D path.
+    """
+    out = np.full(x.shape, np.nan)
+    if len(x) == 0:
+        return out
+    isnan = np.isnan(x)
+    started = np.logical_or.accumulate(~isnan, axis=0)
+    has_data = started[-1]
+    clean = has_data & ~(isnan & started).any(axis=0)
+    cols = np.flatnonzero(clean)
+    if len(cols):
+        sub = x[:, cols]
+        first = np.argmax(~isnan[:, cols], axis=0)
+        seed = sub[first, np.arange(len(cols))]
+        # Back-fill each column's leading NaNs with its first value: the recurrence then
+        # holds that value until the real start, which is what a late-starting series needs.
+        filled = np.where(isnan[:, cols], seed, sub)
+        res = np.empty_like(filled)
+        res[0] = seed
+        res[1:] = _ema_blocks(filled[1:], seed, alpha)
+        res[~started[:, cols]] = np.nan
+        out[:, cols] = res
+    for k in np.flatnonzero(has_data & ~clean):
+        out[:, k] = _ema_1d(np.ascontiguousarray(x[:, k]), alpha)
+    return out
+
+
+def ema(x, span):
+    """Exponential moving average, ``ewm(span=span, adjust=False).mean()``."""
+    x = _as_float(x)
+    alpha = 2.0 / (span + 1.0)
+    if x.ndim == 1:
+        return _ema_1d(x, alpha)
+    return _ema_2d(x, alpha)
+
+
+def _shift(x: np.ndarray, n: int = 1) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    out[n:] = x[:-n]
+    return out
+
+
+def rsi(close, n=14):
+    close = _as_float(close)
+    delta = close - _shift(close)
+    with np.errstate(invalid="ignore"):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = rolling_mean(gain, n) / rolling_mean(loss, n)
+        return 100 - (100 / (1 + rs))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+
+def true_range(high, low, close):
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev = _shift(close)
+    # fmax skips the NaN previous close on the first bar, like DataFrame.max(axis=1)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+
+
+def atr(high, low, close, n=14):
+    return rolling_mean(true_range(high, low, close), n)
+
+
+def bollinger(close, n=20, k=2.0):
+    mid = rolling_mean(close, n)
+    width = k * rolling_std(close, n)
+    return mid + width, mid, mid - width
+
+
+def vwap(high, low, close, volume, session):
+    """Volume-weighted average price, reset at every change of ``session`` (e.g. trading date)."""
+    typical = (_as_float(high) + _as_float(low) + _as_float(close)) / 3
+    volume = np.nan_to_num(_as_float(volume))
+    pv = np.nan_to_num(typical) * volume
+    cum_pv, cum_v = np.cumsum(pv, axis=0), np.cumsum(volume, axis=0)
+    # running totals just before each row's session started
+    first = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    seg = np.repeat(first, np.diff(np.r_[first, len(session)]))
+    before_pv, before_v = np.zeros_like(cum_pv), np.zeros_like(cum_v)
+    before_pv[1:], before_v[1:] = cum_pv[:-1], cum_v[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (cum_pv - before_pv[seg]) / (cum_v - before_v[seg])
+
+
+def obv(close, volume):
+    close, volume = _as_float(close), np.nan_to_num(_as_float(volume))
+    direction = np.sign(np.nan_to_num(close - _shift(close)))
+    return np.cumsum(direction * volume, axis=0)
+
+
+def stochastic(high, low, close, n=14, d=3):
+    lowest, highest = rolling_min(low, n), rolling_max(high, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = 100 * (_as_float(close) - lowest) / (highest - lowest)
+    return k, rolling_mean(k, d)
+
+
+def roc(close, n=12):
+    close = _as_float(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 * (close / _shift(close, n) - 1)
+
+
+class Indicator:
+    """A kernel plus the OHLCV inputs it reads and the column(s) it produces."""
+
+    def __init__(self, outputs: tuple, inputs: tuple, fn):
+        self.outputs = outputs
+        self.inputs = inputs
+        self.fn = fn
+
+    def compute(self, data: dict) -> dict:
+        result = self.fn(*(data[name] for name in self.inputs))
+        if len(self.outputs) == 1:
+            result = (result,)
+        return dict(zip(self.outputs, result))
+
+
+INDICATORS = {}
+
+
+def register(outputs, inputs, fn):
+    outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+    indicator = Indicator(outputs, tuple(inputs), fn)
+    for name in outputs:
+        INDICATORS[name] = indicator
+    return indicator
+
+
+register("SMA_20", ["close"], lambda c: rolling_mean(c, 20))
+register("SMA_50", ["close"], lambda c: rolling_mean(c, 50))
+register("SMA_200", ["close"], lambda c: rolling_mean(c, 200))
+register("EMA_12", ["close"], lambda c: ema(c, 12))
+register("EMA_26", ["close"], lambda c: ema(c, 26))
+register("RSI", ["close"], rsi)
+register(["MACD", "Signal_Line", "MACD_Hist"], ["close"], macd)
+register("ATR", ["high", "low", "close"], atr)
+register(["BB_Upper", "BB_Middle", "BB_Lower"], ["close"], bollinger)
+register("VWAP", ["high", "low", "close", "volume", "session"], vwap)
+register("OBV", ["close", "volume"], obv)
+register(["Stoch_K", "Stoch_D"], ["high", "low", "close"], stochastic)
+register("ROC", ["close"], roc)
+
+# Parameterised families, e.g. SMA_100 or EMA_9, resolved on first use
+_FAMILIES = {
+    "SMA": lambda n: (["close"], lambda c: rolling_mean(c, n)),
+    "EMA": lambda n: (["close"], lambda c: ema(c, n)),
+    "RSI": lambda n: (["close"], lambda c: rsi(c, n)),
+    "ATR": lambda n: (["high", "low", "close"], lambda h, l, c: atr(h, l, c, n)),
+    "ROC": lambda n: (["close"], lambda c: roc(c, n)),
+}
+
+
+def resolve(name: str) -> Indicator:
+    indicator = INDICATORS.get(name)
+    if indicator is not None:
+        return indicator
+    m = re.fullmatch(r"([A-Z]+)_(\d+)", name)
+    if m and m.group(1) in _FAMILIES and int(m.group(2)) > 0:
+        inputs, fn = _FAMILIES[m.group(1)](int(m.group(2)))
+        return register(name, inputs, fn)
+    raise ValueError(f"Unknown indicator: {name}")
+
+
+def _inputs(df: pd.DataFrame) -> dict:
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        session = index.normalize().asi8
+    else:
+        session = np.zeros(len(df), dtype=np.int64)
+    data = {"session": session}
+    for name in ("Open", "High", "Low", "Close", "Volume"):
+        if name in df.columns:
+            data[name.lower()] = df[name].to_numpy(dtype=np.float64)
+    return data
+
+
+def compute_indicators(df: pd.DataFrame, columns=None) -> dict:
+    """Compute the requested indicator columns for an OHLCV frame.
+    Returns {column: float64 array}; each kernel runs at most once.
+    """
+    columns = DEFAULT_INDICATORS if columns is None else list(columns)
+    indicators = {name: resolve(name) for name in columns}
+    data = _inputs(df)
+    done = {}
+    for indicator in dict.fromkeys(indicators.values()):
+        done.update(indicator.compute(data))
+    return {name: done[name] for name in columns}
+
+
+def compute_panel(panel: dict, columns=None) -> dict:
+    """Panel mode: ``panel`` holds aligned (time x symbol) arrays under the lower-case
+    input names (close, high, low, volume, ...) plus an optional 1-D ``session`` per row.
+    Every requested indicator is computed for all symbols in one pass; returns
+    {column: (time x symbol) float64 array}.
+    """
+    columns = DEFAULT_INDICATORS if columns is None else list(columns)
+    indicators = {name: resolve(name) for name in columns}
+    data = {k: (v if k == "session" else _as_float(v)) for k, v in panel.items()}
+    if "session" not in data:
+        data["session"] = np.arange(len(data["close"]))
+    done = {}
+    for indicator in dict.fromkeys(indicators.values()):
+        done.update(indicator.compute(data))
+    return {name: done[name] for name in columns}
+
+
+def last_valid(x: np.ndarray) -> np.ndarray:
+    """Latest non-NaN value of every column of a (time x symbol) array (NaN if none)."""
+    x = _as_float(x)
+    valid = ~np.isnan(x)
+    rows = len(x) - 1 - np.argmax(valid[::-1], axis=0)
+    out = x[rows, np.arange(x.shape[1])] if len(x) else np.full(x.shape[1:], np.nan)
+    return np.where(valid.any(axis=0), out, np.nan)
+
+
+def cross_sectional_rank(x: np.ndarray) -> np.ndarray:
+    """Percentile rank (0-1] of each symbol against the others, along the last axis.
+    NaNs stay NaN and are left out of the ranking.
+    """
+    x = _as_float(x)
+    valid = ~np.isnan(x)
+    order = np.argsort(np.where(valid, x, np.inf), axis=-1, kind="stable")
+    ranks = np.empty_like(x)
+    np.put_along_axis(ranks, order, np.arange(1, x.shape[-1] + 1, dtype=np.float64) * np.ones_like(x), axis=-1)
+    counts = valid.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valid, ranks / counts, np.nan)
+
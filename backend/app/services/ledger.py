@@ -0,0 +1,287 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import exists, func, literal, select, true, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ---------------------------------------------------------------------------
+# Paper-trading ledger writes
+#
+# A fill touches three rows: the account (cash and charges), the position and
+# a new trade. Each fill is written as ONE statement of data-modifying CTEs, so
+# an order costs a single round trip plus the commit. The guards (enough cash
+# for a buy, enough shares for a sell) are part of the UPDATEs themselves: the
+# row lock they take serialises concurrent orders, and a racing order re-checks
+# the guard against the committed row instead of a stale read.
+#
+# Every write bumps the account's ``version``, and returns the account and
+# position as they now stand, so the in-process cache (account_cache.py) can be
+# written through without reading them back.
+#
+# The NSE and US services share these helpers and differ only in their models.
+# ---------------------------------------------------------------------------
+
+
+class LedgerModels(NamedTuple):
+    account: type
+    portfolio: type
+    trade: type
+
+
+class Fill(NamedTuple):
+    balance: float
+    trade_id: int
+    timestamp: datetime
+    total_charges_paid: float
+    version: int
+    average_price: float | None  # the position after the fill; None once closed
+    total_quantity: float | None
+
+
+def _account_row(account):
+    """The account row every order books against (the first one created)."""
+    return account.id == select(func.min(account.id)).scalar_subquery()
+
+
+def _trade_insert(trade, source, symbol, side, product_type, price, quantity, strategy_name, charges, now):
+    return (
+        pg_insert(trade)
+        .from_select(
+            ["symbol", "side", "product_type", "price", "quantity", "timestamp", "strategy_name", "charges"],
+            select(
+                literal(symbol), literal(side), literal(product_type), literal(price), literal(quantity),
+                literal(now), literal(strategy_name), literal(charges),
+            ).select_from(source),
+        )
+        .returning(trade.id, trade.timestamp)
+        .cte("new_trade")
+    )
+
+
+async def book_buy(db: AsyncSession, models: LedgerModels, symbol: str, product_type: str, price: float,
+                   quantity: float, strategy_name: str, charges: float, debit: float, required: float) -> Fill | None:
+    """Debit the account, upsert the position (averaging the price in) and insert the trade.
+
+    Nothing is written unless the balance covers ``required``; returns None in that case
+    (or when there is no account yet).
+    """
+    account, portfolio, trade = models
+    now = datetime.utcnow()
+
+    acct = (
+        update(account)
+        .where(_account_row(account), account.balance >= required)
+        .values(
+            balance=account.balance - debit,
+            total_charges_paid=account.total_charges_paid + charges,
+            version=account.version + 1,
+            last_updated=now,
+        )
+        .returning(account.balance, account.total_charges_paid, account.version)
+        .cte("acct")
+    )
+
+    position = pg_insert(portfolio).from_select(
+        ["symbol", "average_price", "total_quantity", "last_updated"],
+        select(literal(symbol), literal(price), literal(quantity), literal(now)).select_from(acct),
+    )
+    position = position.on_conflict_do_update(
+        index_elements=[portfolio.symbol],
+        set_={
+            "average_price": (
+                portfolio.average_price * portfolio.total_quantity
+                + position.excluded.average_price * position.excluded.total_quantity
+            ) / (portfolio.total_quantity + position.excluded.total_quantity),
+            "total_quantity": portfolio.total_quantity + position.excluded.total_quantity,
+            "last_updated": position.excluded.last_updated,
+        },
+    ).returning(portfolio.average_price, portfolio.total_quantity).cte("position")
+
+    new_trade = _trade_insert(trade, acct, symbol, "BUY", product_type, price, quantity, strategy_name, charges, now)
+
+    stmt = select(
+        acct.c.balance, new_trade.c.id, new_trade.c.timestamp, acct.c.total_charges_paid, acct.c.version,
+        position.c.average_price, position.c.total_quantity,
+    ).select_from(acct.join(new_trade, true()).join(position, true()))
+    row = (await db.execute(stmt)).first()
+    return Fill(*row) if row is not None else None
+
+
+async def book_sell(db: AsyncSession, models: LedgerModels, symbol: str, product_type: str, price: float,
+                    quantity: float, strategy_name: str, charges: float, credit: float) -> Fill | None:
+    """Reduce the position (deleting it when it reaches zero), credit the account and insert
+    the trade. Returns None, after writing nothing visible, if fewer than ``quantity`` shares
+    are held or there is no account; the caller must roll back.
+    """
+    account, portfolio, trade = models
+    now = datetime.utcnow()
+    # Take the account row lock before any position lock, in the same order as a buy, so
+    # a buy and a sell of one symbol cannot deadlock.
+    locked = select(account.id).where(_account_row(account)).with_for_update().cte("locked")
+    holds = (portfolio.symbol == symbol) & (portfolio.total_quantity >= quantity) & exists(select(locked.c.id))
+
+    reduced = (
+        update(portfolio)
+        .where(holds, portfolio.total_quantity - quantity > 0)
+        .values(total_quantity=portfolio.total_quantity - quantity, last_updated=now)
+        .returning(portfolio.id, portfolio.average_price, portfolio.total_quantity)
+        .cte("reduced")
+    )
+    closed = (
+        delete(portfolio)
+        .where(holds, portfolio.total_quantity - quantity <= 0)
+        .returning(portfolio.id)
+        .cte("closed")
+    )
+    acct = (
+        update(account)
+        .where(_account_row(account), exists(select(reduced.c.id)) | exists(select(closed.c.id)))
+        .values(
+            balance=account.balance + credit,
+            total_charges_paid=account.total_charges_paid + charges,
+            version=account.version + 1,
+            last_updated=now,
+        )
+        .returning(account.balance, account.total_charges_paid, account.version)
+        .cte("acct")
+    )
+    new_trade = _trade_insert(trade, acct, symbol, "SELL", product_type, price, quantity, strategy_name, charges, now)
+
+    stmt = select(
+        acct.c.balance, new_trade.c.id, new_trade.c.timestamp, acct.c.total_charges_paid, acct.c.version,
+        reduced.c.average_price, reduced.c.total_quantity,
+    ).select_from(acct.join(new_trade, true()).outerjoin(reduced, true()))
+    row = (await db.execute(stmt)).first()
+    return Fill(*row) if row is not None else None
+
+
+async def lock_book(db: AsyncSession, models: LedgerModels, symbols: list):
+    """Lock the account row and the positions in ``symbols`` for the rest of the transaction
+    (SELECT ... FOR UPDATE). Returns (account or None, {symbol: position}).
+    """
+    account, portfolio, _ = models
+    acct = (await db.execute(
+        select(account).where(_account_row(account)).with_for_update()
+    )).scalars().first()
+    positions = (await db.execute(
+        select(portfolio).where(portfolio.symbol.in_(symbols)).with_for_update()
+    )).scalars().all()
+    return acct, {p.symbol: p for p in positions}
+
+
+def plan_batch(orders: list, charges: list, balance: float, holdings: dict, margin_fn, currency: str):
+    """Apply ``orders`` in sequence to an in-memory balance and positions, with the same rules
+    and messages as a single order. ``holdings`` maps symbol -> [average_price, quantity] and is
+    updated in place. Returns (balance, charges paid, [(order index, error or None)]).
+    """
+    paid = 0.0
+    outcomes = []
+    for i, (order, total_charges) in enumerate(zip(orders, charges)):
+        symbol = order.symbol.upper()
+        order_value = order.price * order.quantity
+        held = holdings.get(symbol)
+        if order.side == "BUY":
+            required_margin = margin_fn(order_value, order.product_type)
+            required_total = required_margin + total_charges
+            if balance < required_total:
+                outcomes.append((i, (
+                    f"Insufficient balance. Required: {currency}{required_total:.2f} "
+                    f"(Order: {currency}{required_margin:.2f} + Charges: {currency}{total_charges:.2f}). "
+                    f"Available: {currency}{balance:.2f}"
+                )))
+                continue
+            balance -= (order_value + total_charges)
+            if held:
+                total_cost = (held[0] * held[1]) + (order.price * order.quantity)
+                held[1] += order.quantity
+                held[0] = total_cost / held[1]
+            else:
+                holdings[symbol] = [order.price, order.quantity]
+        else:
+            if not held or held[1] < order.quantity:
+                outcomes.append((i, (
+                    f"Insufficient holdings for {symbol}. "
+                    f"Trying to sell {order.quantity}, but only hold {held[1] if held else 0}"
+                )))
+                continue
+            balance += (order_value - total_charges)
+            held[1] -= order.quantity
+            if held[1] <= 0:
+                holdings[symbol] = None
+        paid += total_charges
+        outcomes.append((i, None))
+    return balance, paid, outcomes
+
+
+async def write_batch(db: AsyncSession, models: LedgerModels, account_id: int, balance: float, paid: float,
+                      trades: list, holdings: dict, existing: set):
+    """Persist a planned batch: bulk-insert the trades, upsert the final positions, delete
+    the closed ones and set the account. Returns the new trades' (id, timestamp) in order
+    and the account's (balance, total_charges_paid, version).
+    """
+    account, portfolio, trade = models
+    now = datetime.utcnow()
+    rows = []
+    if trades:
+        result = await db.execute(
+            pg_insert(trade).returning(trade.id, trade.timestamp, sort_by_parameter_order=True),
+            [{**t, "timestamp": now} for t in trades],
+        )
+        rows = result.all()
+
+    open_positions = [
+        {"symbol": s, "average_price": h[0], "total_quantity": h[1], "last_updated": now}
+        for s, h in holdings.items() if h is not None
+    ]
+    if open_positions:
+        upsert = pg_insert(portfolio).values(open_positions)
+        await db.execute(upsert.on_conflict_do_update(
+            index_elements=[portfolio.symbol],
+            set_={
+                "average_price": upsert.excluded.average_price,
+                "total_quantity": upsert.excluded.total_quantity,
+                "last_updated": upsert.excluded.last_updated,
+            },
+        ))
+    closed = [s for s, h in holdings.items() if h is None and s in existing]
+    if closed:
+        await db.execute(delete(portfolio).where(portfolio.symbol.in_(closed)))
+
+    acct = (await db.execute(
+        update(account).where(account.id == account_id)
+        .values(balance=balance, total_charges_paid=account.total_charges_paid + paid,
+                version=account.version + 1, last_updated=now)
+        .returning(account.balance, account.total_charges_paid, account.version)
+    )).first()
+    return rows, acct
+
+
+async def reset_book(db: AsyncSession, models: LedgerModels, initial_balance: float, archive=None) -> int:
+    """Restore the account to ``initial_balance`` and clear every position and trade with
+    set-based statements. With an ``archive`` model, the trades are moved into it in the same
+    statement that deletes them. Returns the number of trades archived (0 without one).
+
+    The account row is locked first, as every other write here does, so a reset waits for
+    in-flight orders instead of deadlocking with them.
+    """
+    account, portfolio, trade = models
+    now = datetime.utcnow()
+    await db.execute(
+        update(account).where(_account_row(account))
+        .values(balance=initial_balance, total_charges_paid=0.0, version=account.version + 1, last_updated=now)
+    )
+    await db.execute(delete(portfolio))
+    if archive is None:
+        await db.execute(delete(trade))
+        return 0
+
+    columns = ["symbol", "side", "product_type", "price", "quantity", "timestamp", "strategy_name", "charges"]
+    moved = delete(trade).returning(trade.id, *(getattr(trade, c) for c in columns)).cte("moved")
+    result = await db.execute(
+        pg_insert(archive).from_select(
+            ["trade_id", *columns, "archived_at"],
+            select(moved.c.id, *(moved.c[c] for c in columns), literal(now)),
+        )
+    )
+    return result.rowcount
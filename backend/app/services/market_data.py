@@ -1,15 +1,28 @@
 import asyncio
 import time
 import math
+import os
+import httpx
 import yfinance as yf
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import urllib.request
-import urllib.error
+import numpy as np
+from concurrent.futures import wait
 import csv
 import json
 import io
 import logging
+from app.services.cache import TTLCache
+from app.services.singleflight import SingleFlight
+from app.services.http_pool import http_pool
+from app.services.executors import get_pool, pool_stats
+from app.services.provider_router import ProviderRouter
+from app.services.indicator_stream import indicator_streams, INDICATOR_COLUMNS
+from app.services.indicators import (
+    compute_indicators, compute_panel, cross_sectional_rank, last_valid, resolve, DEFAULT_INDICATORS,
+)
+from app.services.bar_store import (
+    bar_store, covers, period_sessions, period_start, slice_period, INTRADAY_INTERVALS,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -397,17 +410,29 @@ US_STOCKS = [
     {"symbol": "ARM", "name": "Arm Holdings plc"},
 ]
 
-_quote_cache = {}
 _CACHE_TTL = 120
+_CACHE_STALE_TTL = 600   # serve expired quotes this much longer while a refresh runs
+_CACHE_MAX_SYMBOLS = 2000
+
+_quote_cache = TTLCache(maxsize=_CACHE_MAX_SYMBOLS, ttl=_CACHE_TTL, stale_ttl=_CACHE_STALE_TTL)
 
 def _get_cached_quote(symbol):
-    entry = _quote_cache.get(symbol)
-    if entry and (time.time() - entry["ts"]) < _CACHE_TTL:
-        return entry["data"]
-    return None
+    data, stale = _quote_cache.get(symbol)
+    if data is not None and stale and _quote_cache.claim_refresh(symbol):
+        get_pool("quotes").submit(_revalidate_quote, symbol)
+    return data
 
 def _set_cached_quote(symbol, data):
-    _quote_cache[symbol] = {"data": data, "ts": time.time()}
+    _quote_cache.set(symbol, data)
+
+def _revalidate_quote(symbol):
+    """Background refresh for a stale cache entry (stale-while-revalidate)."""
+    try:
+        _fetch_quote_sync(symbol, use_cache=False)
+    except Exception as exc:
+        _logger.debug("Background quote refresh failed for %s: %s", symbol, exc)
+    finally:
+        _quote_cache.release_refresh(symbol)
 
 
 def _clean_float(v, default=0.0):
@@ -441,72 +466,131 @@ def _clean_quote(q: dict) -> dict:
 # Fallback data providers (used when yfinance is rate-limited / down)
 # ---------------------------------------------------------------------------
 
-def _fetch_quote_stooq(symbol: str) -> dict | None:
-    """Fetch a quote from Stooq CSV endpoint (free, no API key).
-    Works for US tickers (e.g. AAPL) and NSE tickers (e.g. RELIANCE.NS).
-    Returns a quote dict on success, None on failure.
+class _NoQuote(ValueError):
+    """The provider answered, but has no quote for the symbol (unknown or delisted).
+    Not held against the provider's health, unlike a request that failed.
     """
+
+
+def _to_stooq_symbol(symbol: str) -> str:
+    # Stooq uses .IN for Indian NSE/BSE stocks, not .NS / .BO
+    stooq_sym = symbol.lower().replace("-", ".")
+    if stooq_sym.endswith(".ns") or stooq_sym.endswith(".bo"):
+        stooq_sym = stooq_sym.rsplit(".", 1)[0] + ".in"
+    return stooq_sym
+
+
+def _parse_stooq_row(symbol: str, row: dict) -> dict | None:
+    """Turn one Stooq CSV row into a quote dict; None for "N/D" / zero rows."""
     try:
-        # Stooq uses .IN for Indian NSE/BSE stocks, not .NS / .BO
-        stooq_sym = symbol.lower().replace("-", ".")
-        if stooq_sym.endswith(".ns") or stooq_sym.endswith(".bo"):
-            stooq_sym = stooq_sym.rsplit(".", 1)[0] + ".in"
-        url = f"https://stooq.com/q/l/?s={stooq_sym}&f=sd2t2ohlcv&h&e=csv"
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=8) as resp:
-            content = resp.read().decode("utf-8")
-        reader = csv.DictReader(io.StringIO(content))
-        rows = list(reader)
-        if not rows:
-            return None
-        row = rows[-1]  # most recent row
         close = float(row.get("Close", 0) or 0)
         opn   = float(row.get("Open",  0) or 0)
         high  = float(row.get("High",  0) or 0)
         low   = float(row.get("Low",   0) or 0)
         vol   = int(float(row.get("Volume", 0) or 0))
-        if close == 0:
+    except (TypeError, ValueError):
+        return None
+    if close == 0:
+        return None
+    # Stooq gives only one day; use open as prev_close proxy when prev unavailable
+    prev = opn if opn > 0 else close
+    change = round(close - prev, 2)
+    change_pct = round((change / prev * 100), 2) if prev else 0
+    return _clean_quote({
+        "symbol": symbol.upper(),
+        "price": round(close, 2),
+        "change": change,
+        "change_pct": change_pct,
+        "prev_close": round(prev, 2),
+        "open": round(opn, 2),
+        "high": round(high, 2),
+        "low": round(low, 2),
+        "volume": vol,
+        "source": "stooq",
+    })
+
+
+async def _fetch_quote_stooq(symbol: str) -> dict | None:
+    """Fetch a quote from Stooq CSV endpoint (free, no API key).
+    Works for US tickers (e.g. AAPL) and NSE tickers (e.g. RELIANCE.NS).
+    Returns a quote dict on success, None on failure, and raises _NoQuote when Stooq
+    answers "N/D" for the symbol. Runs on the shared HTTP pool loop.
+    """
+    try:
+        url = f"https://stooq.com/q/l/?s={_to_stooq_symbol(symbol)}&f=sd2t2ohlcv&h&e=csv"
+        resp = await http_pool.get(url)
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+        if not rows:
             return None
-        # Stooq gives only one day; use open as prev_close proxy when prev unavailable
-        prev = opn if opn > 0 else close
-        change = round(close - prev, 2)
-        change_pct = round((change / prev * 100), 2) if prev else 0
-        return _clean_quote({
-            "symbol": symbol.upper(),
-            "price": round(close, 2),
-            "change": change,
-            "change_pct": change_pct,
-            "prev_close": round(prev, 2),
-            "open": round(opn, 2),
-            "high": round(high, 2),
-            "low": round(low, 2),
-            "volume": vol,
-            "source": "stooq",
-        })
+        quote = _parse_stooq_row(symbol, rows[-1])  # most recent row
+        if quote is None and "Close" in rows[-1]:
+            raise _NoQuote(f"Stooq has no quote for {symbol}")
+        return quote
+    except _NoQuote:
+        raise
     except Exception as exc:
         _logger.debug("Stooq fallback failed for %s: %s", symbol, exc)
         return None
 
 
-def _fetch_quote_yahoo_json(symbol: str) -> dict | None:
+_STOOQ_BATCH_SIZE = 40  # symbols per request; keeps the URL well under server limits
+
+
+async def _fetch_quotes_stooq_batch(symbols: list) -> dict:
+    """Fetch many quotes from Stooq's light quote endpoint, several symbols per request.
+    Returns {symbol: quote} for the symbols Stooq could price.
+    """
+    by_stooq = {}
+    for sym in symbols:
+        by_stooq.setdefault(_to_stooq_symbol(sym), []).append(sym)
+    stooq_syms = list(by_stooq)
+    chunks = [stooq_syms[i:i + _STOOQ_BATCH_SIZE] for i in range(0, len(stooq_syms), _STOOQ_BATCH_SIZE)]
+
+    async def _fetch_chunk(chunk):
+        t0 = time.perf_counter()
+        try:
+            url = f"https://stooq.com/q/l/?s={'+'.join(chunk)}&f=sd2t2ohlcv&h&e=csv"
+            resp = await http_pool.get(url)
+            rows = list(csv.DictReader(io.StringIO(resp.text)))
+        except Exception as exc:
+            _logger.debug("Stooq batch request failed for %d symbols: %s", len(chunk), exc)
+            rows = []
+        if any(_parse_stooq_row(r.get("Symbol", ""), r) for r in rows):
+            ok = True
+        else:
+            # A well-formed answer of only "N/D" rows means unknown symbols, not a failing Stooq
+            ok = None if rows and all("Close" in r for r in rows) else False
+        _provider_router.record("stooq", ok, time.perf_counter() - t0)
+        return rows
+
+    results = {}
+    for rows in await asyncio.gather(*(_fetch_chunk(c) for c in chunks)):
+        for row in rows:
+            for sym in by_stooq.get((row.get("Symbol") or "").lower(), []):
+                quote = _parse_stooq_row(sym, row)
+                if quote:
+                    results[sym] = quote
+    return results
+
+
+async def _fetch_quote_yahoo_json(symbol: str) -> dict | None:
     """Fetch a quote via Yahoo Finance v8 chart API directly (plain HTTP, no yfinance lib).
     Sometimes succeeds when the yfinance library is blocked due to cookie / session issues.
-    Returns a quote dict on success, None on failure.
+    Returns a quote dict on success, None on failure, and raises _NoQuote when Yahoo does
+    not know the symbol or has no closes for it. Runs on the shared HTTP pool loop.
     """
     try:
         url = (
             f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
             "?interval=1d&range=5d&includePrePost=false"
         )
-        req = urllib.request.Request(
-            url,
-            headers={
-                "User-Agent": "Mozilla/5.0",
-                "Accept": "application/json",
-            },
-        )
-        with urllib.request.urlopen(req, timeout=8) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
+        try:
+            resp = await http_pool.get(url, headers={"Accept": "application/json"})
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code == 404:
+                raise _NoQuote(f"Yahoo does not know {symbol}")
+            raise
+        data = resp.json()
 
         result_data = data["chart"]["result"][0]
         meta = result_data["meta"]
@@ -519,7 +603,7 @@ def _fetch_quote_yahoo_json(symbol: str) -> dict | None:
         vols   = [v for v in indicators.get("volume",[]) if v is not None]
 
         if not closes:
-            return None
+            raise _NoQuote(f"Yahoo has no closes for {symbol}")
 
         close = round(float(closes[-1]), 2)
         prev  = round(float(closes[-2]), 2) if len(closes) > 1 else round(float(meta.get("chartPreviousClose", close)), 2)
@@ -541,79 +625,225 @@ def _fetch_quote_yahoo_json(symbol: str) -> dict | None:
             "volume": vol,
             "source": "yahoo_json",
         })
+    except _NoQuote:
+        raise
     except Exception as exc:
         _logger.debug("Yahoo JSON fallback failed for %s: %s", symbol, exc)
         return None
 
 
-def _fetch_quote_fallback(symbol: str) -> dict | None:
-    """Try free fallback sources in order. Returns None if all fail."""
-    for fn in (_fetch_quote_stooq, _fetch_quote_yahoo_json):
-        result = fn(symbol)
-        if result and result.get("price", 0) > 0:
-            _logger.info("Fallback (%s) succeeded for %s", fn.__name__, symbol)
-            return result
-    return None
+async def _fetch_quote_yahoo_json_timed(symbol: str) -> dict | None:
+    t0 = time.perf_counter()
+    try:
+        quote = await _fetch_quote_yahoo_json(symbol)
+        ok = bool(quote and quote.get("price", 0) > 0)
+    except _NoQuote:
+        quote, ok = None, None
+    _provider_router.record("yahoo_json", ok, time.perf_counter() - t0)
+    return quote
+
+
+async def _fetch_quotes_fallback_async(symbols: list) -> dict:
+    """Batched fallback chain: Stooq multi-symbol requests and per-symbol Yahoo JSON,
+    in whichever order the provider router currently prefers, each one only for the
+    symbols still unpriced.
+    """
+    results = {}
+    for name in _provider_router.ordered(_FALLBACK_PROVIDERS):
+        missing = [s for s in symbols if s not in results]
+        if not missing:
+            break
+        if name == "stooq":
+            results.update(await _fetch_quotes_stooq_batch(missing))
+        else:
+            quotes = await asyncio.gather(*(_fetch_quote_yahoo_json_timed(s) for s in missing))
+            results.update({s: q for s, q in zip(missing, quotes) if q and q.get("price", 0) > 0})
+    _logger.info("Batch fallback priced %d/%d symbols", len(results), len(symbols))
+    return results
+
+
+_FALLBACK_TIMEOUT = 30
+
+
+def _fetch_quotes_fallback(symbols: list) -> dict:
+    """Blocking wrapper for worker threads: many symbols concurrently over the shared pool.
+    Returns {symbol: quote} for the symbols that some fallback could price.
+    """
+    if not symbols:
+        return {}
+    try:
+        return http_pool.run(_fetch_quotes_fallback_async(list(symbols)), timeout=_FALLBACK_TIMEOUT)
+    except Exception as exc:
+        _logger.warning("Batch fallback failed for %d symbols: %s", len(symbols), exc)
+        return {}
 
 
 # ---------------------------------------------------------------------------
 
 
-def _fetch_history_sync(symbol, period, interval):
+_HISTORY_REFRESH_TTL = 300   # daily / weekly bars
+_INTRADAY_REFRESH_TTL = 60   # minute / hourly bars
+
+
+def _history_refresh_ttl(interval):
+    return _INTRADAY_REFRESH_TTL if interval in INTRADAY_INTERVALS else _HISTORY_REFRESH_TTL
+
+
+def _has_new_corporate_action(stored, fresh):
+    """True if ``fresh`` carries a dividend or split the stored bars don't know about.
+    yfinance back-adjusts prices for those, so the stored history is stale as a whole.
+    """
+    for col in ("Dividends", "Stock Splits"):
+        if col not in fresh.columns:
+            continue
+        new = fresh[col].fillna(0)
+        old = stored[col].reindex(new.index).fillna(0) if col in stored.columns else 0
+        if (new != old).any():
+            return True
+    return False
+
+
+# Window fetched whenever the store does not cover a request yet. It spans everything the
+# app asks for at that interval (10y CAGR, 5y training, 1y backtests, 5d..5y stock detail),
+# so one download per symbol/interval serves every shorter period by slicing. Intraday
+# windows follow Yahoo's lookback limits.
+_BASE_PERIODS = {
+    "1d": "10y", "5d": "max", "1wk": "max", "1mo": "max", "3mo": "max",
+    "1m": "7d", "2m": "60d", "5m": "60d", "15m": "60d", "30m": "60d", "90m": "60d",
+    "60m": "730d", "1h": "730d",
+}
+
+
+def _fetch_period(period, interval, now):
+    """The period to actually download: the interval's base window, unless the request is longer."""
+    base = _BASE_PERIODS.get(interval)
+    if base is None or period.lower() == "max":
+        return period
+    if base == "max":
+        return base
+    return period if period_start(period, now) < period_start(base, now) else base
+
+
+def _download_history(symbol, interval, period=None, start=None):
     ticker = yf.Ticker(symbol)
-    df = ticker.history(period=period, interval=interval)
+    if start is not None:
+        return ticker.history(start=start, interval=interval)
+    return ticker.history(period=period, interval=interval)
+
+
+def _refresh_stored_history(symbol, interval, stored, meta):
+    """Fetch only the bars after the last stored timestamp and append them.
+    The last stored bar is re-fetched too, since it may have been a partial (live) bar.
+    """
+    last_ts = stored.index[-1]
+    start = last_ts if interval in INTRADAY_INTERVALS else last_ts.strftime("%Y-%m-%d")
+    try:
+        fresh = _download_history(symbol, interval, start=start)
+    except Exception as exc:
+        _logger.warning("Incremental history fetch failed for %s %s: %s", symbol, interval, exc)
+        fresh = None
+
+    if fresh is None:
+        # e.g. intraday bars older than what Yahoo serves -- fall back to a full reload
+        covered_from = meta.get("covered_from")
+        period = "max" if covered_from is None else None
+        start = None if covered_from is None else pd.Timestamp(covered_from, tz="UTC").strftime("%Y-%m-%d")
+        fresh = _download_history(symbol, interval, period=period, start=start)
+        if fresh.empty:
+            return stored
+        bar_store.write(symbol, interval, fresh, covered_from)
+        return fresh
+
+    if fresh.empty:
+        bar_store.touch(symbol, interval)
+        return stored
+
+    if _has_new_corporate_action(stored, fresh):
+        covered_from = meta.get("covered_from")
+        if covered_from is None:
+            full = _download_history(symbol, interval, period="max")
+        else:
+            full = _download_history(
+                symbol, interval, start=pd.Timestamp(covered_from, tz="UTC").strftime("%Y-%m-%d")
+            )
+        if not full.empty:
+            bar_store.write(symbol, interval, full, covered_from)
+            return full
+
+    merged = pd.concat([stored[stored.index < fresh.index[0]], fresh])
+    bar_store.write(symbol, interval, merged, meta.get("covered_from"))
+    return merged
+
+
+def _fetch_history_sync(symbol, period, interval):
+    """Serve history from the local bar store, going to yfinance only for bars it lacks.
+    The returned frame is a positional slice of the stored one; do not modify it in place.
+    """
+    now = pd.Timestamp.now(tz="UTC")
+
+    with bar_store.lock(symbol, interval):
+        stored, meta = bar_store.read(symbol, interval)
+        covered = stored is not None and not stored.empty and covers(meta, period, now)
+        try:
+            if not covered:
+                fetch_period = _fetch_period(period, interval, now)
+                df = _download_history(symbol, interval, period=fetch_period)
+                if df.empty:
+                    raise ValueError(f"No data found for {symbol}")
+                fetch_from = period_start(fetch_period, now)
+                if fetch_from is None:
+                    covered_from = None
+                elif period_sessions(fetch_period) is not None and (
+                    df.index.normalize().nunique() >= period_sessions(fetch_period)
+                ):
+                    # session-counted periods: the calendar bound over-estimates, so only trust
+                    # what actually came back; covers() matches repeats by session count. With
+                    # fewer sessions than asked for there is nothing older to fetch.
+                    covered_from = int(pd.DatetimeIndex(df.index[:1]).as_unit("ns").asi8[0])
+                else:
+                    covered_from = fetch_from.value
+                bar_store.write(symbol, interval, df, covered_from)
+                stored = df
+            elif time.time() - meta.get("fetched_at", 0) >= _history_refresh_ttl(interval):
+                stored = _refresh_stored_history(symbol, interval, stored, meta)
+        except ValueError:
+            if not covered:
+                raise
+        except Exception as exc:
+            if stored is None or stored.empty:
+                raise
+            _logger.warning("History refresh failed for %s %s (%s), serving stored bars", symbol, interval, exc)
+
+    df = slice_period(stored, period)
     if df.empty:
         raise ValueError(f"No data found for {symbol}")
     return df
 
 
-def _fetch_quote_sync(symbol):
-    cached = _get_cached_quote(symbol)
-    if cached:
-        return cached
+def _ensure_history_sync(symbol, period, interval):
+    """Make sure the bar store holds fresh bars for ``period``. When it already does only
+    meta.json is read; otherwise the regular fetch path fills or refreshes it.
+    """
+    meta = bar_store.read_meta(symbol, interval)
+    if covers(meta, period, pd.Timestamp.now(tz="UTC")) and (
+        time.time() - meta.get("fetched_at", 0) < _history_refresh_ttl(interval)
+    ):
+        return
+    _fetch_history_sync(symbol, period, interval)
 
-    ticker = yf.Ticker(symbol)
+
+def _history_or_empty(symbol, period, interval="1d"):
+    """Like ``ticker.history``: an empty frame, not an error, when there are no bars."""
     try:
-        info = ticker.fast_info
-        price = float(info.last_price) if hasattr(info, 'last_price') else 0
-        prev = float(info.previous_close) if hasattr(info, 'previous_close') else price
-        opn = float(info.open) if hasattr(info, 'open') else price
-        high = float(info.day_high) if hasattr(info, 'day_high') else price
-        low = float(info.day_low) if hasattr(info, 'day_low') else price
-        volume = int(info.last_volume) if hasattr(info, 'last_volume') else 0
-        # Guard against yfinance returning 0 for all fields (silent rate-limit)
-        if price == 0:
-            raise ValueError("yfinance returned zero price (likely rate-limited)")
-    except Exception as yf_err:
-        _logger.debug("yfinance fast_info failed for %s (%s), trying history...", symbol, yf_err)
-        try:
-            hist = ticker.history(period="5d")
-            if hist.empty:
-                raise ValueError("empty history")
-            latest = hist.iloc[-1]
-            prev_row = hist.iloc[-2] if len(hist) > 1 else latest
-            price = round(float(latest['Close']), 2)
-            prev = round(float(prev_row['Close']), 2)
-            opn = round(float(latest['Open']), 2)
-            high = round(float(latest['High']), 2)
-            low = round(float(latest['Low']), 2)
-            volume = int(latest['Volume'])
-            if price == 0:
-                raise ValueError("history also returned zero price")
-        except Exception as hist_err:
-            _logger.warning("yfinance fully failed for %s (%s), trying fallback providers...", symbol, hist_err)
-            fb = _fetch_quote_fallback(symbol)
-            if fb:
-                _set_cached_quote(symbol, fb)
-                return fb
-            # All sources failed — return zeros so the heatmap still renders
-            _logger.error("All data sources failed for %s, returning zeros", symbol)
-            return {"symbol": symbol.upper(), "price": 0, "change": 0, "change_pct": 0,
-                    "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0}
+        return _fetch_history_sync(symbol, period, interval)
+    except ValueError:
+        return pd.DataFrame()
 
+
+def _build_quote(symbol, price, prev, opn, high, low, volume):
     change = round(_clean_float(price - prev), 2)
     change_pct = round((_clean_float(change / prev) * 100), 2) if prev else 0
-    result = _clean_quote({
+    return _clean_quote({
         "symbol": symbol.upper(),
         "price": round(price, 2),
         "change": change,
@@ -624,8 +854,93 @@ def _fetch_quote_sync(symbol):
         "low": round(low, 2),
         "volume": volume
     })
-    _set_cached_quote(symbol, result)
-    return result
+
+
+def _quote_from_fast_info(symbol):
+    info = yf.Ticker(symbol).fast_info
+    if getattr(info, "last_price", 0) is None:
+        # no bars and no metadata price: yfinance does not know the symbol
+        raise _NoQuote(f"yfinance has no price for {symbol}")
+    price = float(info.last_price) if hasattr(info, 'last_price') else 0
+    prev = float(info.previous_close) if hasattr(info, 'previous_close') else price
+    opn = float(info.open) if hasattr(info, 'open') else price
+    high = float(info.day_high) if hasattr(info, 'day_high') else price
+    low = float(info.day_low) if hasattr(info, 'day_low') else price
+    volume = int(info.last_volume) if hasattr(info, 'last_volume') else 0
+    # Guard against yfinance returning 0 for all fields (silent rate-limit)
+    if price == 0:
+        raise ValueError("yfinance returned zero price (likely rate-limited)")
+    return _build_quote(symbol, price, prev, opn, high, low, volume)
+
+
+def _quote_from_yf_history(symbol):
+    hist = yf.Ticker(symbol).history(period="5d")
+    if hist.empty:
+        raise _NoQuote("empty history")
+    latest = hist.iloc[-1]
+    prev_row = hist.iloc[-2] if len(hist) > 1 else latest
+    price = round(float(latest['Close']), 2)
+    if price == 0:
+        raise ValueError("history also returned zero price")
+    return _build_quote(
+        symbol, price, round(float(prev_row['Close']), 2), round(float(latest['Open']), 2),
+        round(float(latest['High']), 2), round(float(latest['Low']), 2), int(latest['Volume']),
+    )
+
+
+def _quote_from_stooq(symbol):
+    return http_pool.run(_fetch_quote_stooq(symbol), timeout=_FALLBACK_TIMEOUT)
+
+
+def _quote_from_yahoo_json(symbol):
+    return http_pool.run(_fetch_quote_yahoo_json(symbol), timeout=_FALLBACK_TIMEOUT)
+
+
+_QUOTE_PROVIDERS = {
+    "yf_fast_info": _quote_from_fast_info,
+    "yf_history": _quote_from_yf_history,
+    "stooq": _quote_from_stooq,
+    "yahoo_json": _quote_from_yahoo_json,
+}
+_YF_PROVIDERS = ["yf_fast_info", "yf_history"]
+_FALLBACK_PROVIDERS = ["stooq", "yahoo_json"]
+
+# Tracks rolling success/latency per provider; failing ones are skipped until a probe succeeds
+_provider_router = ProviderRouter(list(_QUOTE_PROVIDERS))
+
+
+def _fetch_quote_sync(symbol, use_cache=True, use_fallback=True):
+    """Quote from the first healthy provider in priority order. With ``use_fallback=False`` only the
+    yfinance providers are tried and None is returned when they fail, so batch callers
+    can run the fallbacks together.
+    """
+    if use_cache:
+        cached = _get_cached_quote(symbol)
+        if cached:
+            return cached
+
+    for name in _provider_router.ordered(None if use_fallback else _YF_PROVIDERS):
+        t0 = time.perf_counter()
+        try:
+            quote = _QUOTE_PROVIDERS[name](symbol)
+            ok = bool(quote) and quote.get("price", 0) > 0
+        except _NoQuote as exc:
+            _logger.debug("Quote provider %s has no quote for %s: %s", name, symbol, exc)
+            quote, ok = None, None
+        except Exception as exc:
+            _logger.debug("Quote provider %s failed for %s: %s", name, symbol, exc)
+            quote, ok = None, False
+        _provider_router.record(name, ok, time.perf_counter() - t0)
+        if ok:
+            _set_cached_quote(symbol, quote)
+            return quote
+
+    if not use_fallback:
+        return None
+    # All sources failed — return zeros so the heatmap still renders
+    _logger.error("All data sources failed for %s, returning zeros", symbol)
+    return {"symbol": symbol.upper(), "price": 0, "change": 0, "change_pct": 0,
+            "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0}
 
 
 def _parse_batch_df(df, symbols_list):
@@ -693,11 +1008,13 @@ def _parse_batch_df(df, symbols_list):
     return results
 
 
+_BATCH_QUOTE_TIMEOUT = 20
+
+
 def _fetch_batch_quotes_sync(symbols):
-    """Fetch quotes for many symbols concurrently using ThreadPoolExecutor.
+    """Fetch quotes for many symbols concurrently on the shared quotes pool.
     Uses fast_info (individual) which is much more reliable than yf.download batch.
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
     import logging
     logger = logging.getLogger(__name__)
 
@@ -715,37 +1032,42 @@ def _fetch_batch_quotes_sync(symbols):
 
     logger.info(f"Fetching {len(uncached)} uncached symbols concurrently...")
 
-    MAX_WORKERS = min(10, len(uncached))  # Cap at 10 to avoid rate limits
     fetched = {}
 
     def _safe_fetch(sym):
         try:
-            return sym, _fetch_quote_sync(sym)
+            return sym, _fetch_quote_sync(sym, use_fallback=False)
         except Exception as exc:
-            _logger.warning("_safe_fetch failed for %s: %s, trying fallback", sym, exc)
-            fb = _fetch_quote_fallback(sym)
-            if fb:
-                _set_cached_quote(sym, fb)
-                return sym, fb
-            return sym, {"symbol": sym.upper(), "price": 0, "change": 0, "change_pct": 0,
-                         "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0}
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(_safe_fetch, sym): sym for sym in uncached}
-        for future in as_completed(futures):
-            try:
-                sym, quote = future.result(timeout=15)
-                fetched[sym] = quote
-            except Exception:
-                sym = futures[future]
-                fetched[sym] = {"symbol": sym.upper(), "price": 0, "change": 0, "change_pct": 0,
-                                "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0}
+            _logger.warning("_safe_fetch failed for %s: %s, deferring to fallback", sym, exc)
+            return sym, None
+
+    # The pool's worker cap is shared by every request, which keeps us under the rate limits
+    pool = get_pool("quotes")
+    futures = {pool.submit(_safe_fetch, sym): sym for sym in uncached}
+    done, not_done = wait(futures, timeout=_BATCH_QUOTE_TIMEOUT)
+    for future in not_done:
+        # Still queued behind other requests: hand it to the fallbacks instead of waiting
+        future.cancel()
+    for future in done:
+        try:
+            sym, quote = future.result()
+            fetched[sym] = quote
+        except Exception:
+            fetched[futures[future]] = None
+
+    # Everything yfinance couldn't price goes through the fallbacks in one concurrent burst
+    failed = [sym for sym in uncached if not fetched.get(sym)]
+    if failed:
+        _logger.warning("yfinance failed for %d/%d symbols, trying fallback providers...", len(failed), len(uncached))
+        for sym, fb in _fetch_quotes_fallback(failed).items():
+            _set_cached_quote(sym, fb)
+            fetched[sym] = fb
 
     for sym in uncached:
-        results.append(fetched.get(sym, {"symbol": sym.upper(), "price": 0, "change": 0, "change_pct": 0,
-                                          "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0}))
+        results.append(fetched.get(sym) or {"symbol": sym.upper(), "price": 0, "change": 0, "change_pct": 0,
+                                            "prev_close": 0, "open": 0, "high": 0, "low": 0, "volume": 0})
 
-    logger.info(f"Fetched {len(uncached)} symbols, {sum(1 for s in uncached if fetched.get(s, {}).get('price', 0) > 0)} with data")
+    logger.info(f"Fetched {len(uncached)} symbols, {sum(1 for s in uncached if (fetched.get(s) or {}).get('price', 0) > 0)} with data")
     return results
 
 
@@ -906,12 +1228,11 @@ def _fetch_peer_data(symbol, industry, sector, is_indian):
             except:
                 return None
 
-        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
-            fut_to_stock = {executor.submit(_get_peer_fund, s): s for s in candidates}
-            for fut in as_completed(fut_to_stock):
-                res = fut.result()
-                if res:
-                    peers.append(res)
+        pool = get_pool("fundamentals")
+        for fut in [pool.submit(_get_peer_fund, s) for s in candidates]:
+            res = fut.result()
+            if res:
+                peers.append(res)
 
     return peers
 
@@ -938,240 +1259,240 @@ def _fetch_financials_concurrent(symbol):
     
     def get_hist_cagr():
         # Fetch max period needed for CAGR
-        return ticker.history(period="10y")
+        return _fetch_history_sync(symbol, "10y", "1d")
 
     def get_divs():
         return ticker.dividends
 
-    with ThreadPoolExecutor(max_workers=7) as executor:
-        f_info = executor.submit(get_info)
-        f_fin = executor.submit(get_fin)
-        f_qfin = executor.submit(get_q_fin)
-        f_bs = executor.submit(get_bs)
-        f_cf = executor.submit(get_cf)
-        f_hist = executor.submit(get_hist_cagr)
-        f_divs = executor.submit(get_divs)
+    fundamentals = get_pool("fundamentals")
+    f_info = fundamentals.submit(get_info)
+    f_fin = fundamentals.submit(get_fin)
+    f_qfin = fundamentals.submit(get_q_fin)
+    f_bs = fundamentals.submit(get_bs)
+    f_cf = fundamentals.submit(get_cf)
+    f_hist = get_pool("history").submit(get_hist_cagr)
+    f_divs = fundamentals.submit(get_divs)
 
-        # Wait for info first as it's needed for basic data
-        try:
-            info = f_info.result(timeout=10)
-        except:
-            info = {}
-
-        # Basic Data
-        is_indian = symbol.upper().endswith(".NS") or symbol.upper().endswith(".BO")
-        current_price = info.get("currentPrice", info.get("regularMarketPrice", 0)) or 0
-        face_value = info.get("faceValue", None)
-        
-        # ROCE Calculation
-        roce_val = None
-        try:
-            ebit = info.get("ebitda", 0) or 0
-            interest = info.get("interestExpense", 0) or 0
-            if interest and interest < 0:
-                ebit = ebit + interest
-            total_assets = info.get("totalAssets", 0) or 0
-            current_liab = info.get("totalCurrentLiabilities", 0) or 0
-            capital_employed = total_assets - current_liab
-            if capital_employed > 0 and ebit > 0:
-                roce_val = round((ebit / capital_employed) * 100, 2)
-        except:
-            pass
-
-        result = {
-            "name": info.get("longName", symbol),
-            "symbol": symbol.upper(),
-            "sector": info.get("sector", "N/A"),
-            "industry": info.get("industry", "N/A"),
-            "market_cap": info.get("marketCap", 0),
-            "current_price": round(current_price, 2),
-            "face_value": face_value,
-            "pe_ratio": info.get("trailingPE", None),
-            "forward_pe": info.get("forwardPE", None),
-            "pb_ratio": info.get("priceToBook", None),
-            "eps": info.get("trailingEps", None),
-            "book_value": info.get("bookValue", None),
-            "dividend_yield": round(info.get("dividendYield", 0) * 100, 2) if info.get("dividendYield") else 0,
-            "roe": round(info.get("returnOnEquity", 0) * 100, 2) if info.get("returnOnEquity") else 0,
-            "roce": roce_val,
-            "debt_to_equity": info.get("debtToEquity", None),
-            "profit_margins": round(info.get("profitMargins", 0) * 100, 2) if info.get("profitMargins") else 0,
-            "revenue": info.get("totalRevenue", 0),
-            "net_income": info.get("netIncomeToCommon", 0),
-            "operating_margins": round(info.get("operatingMargins", 0) * 100, 2) if info.get("operatingMargins") else 0,
-            "free_cashflow": info.get("freeCashflow", 0),
-            "total_debt": info.get("totalDebt", 0),
-            "total_cash": info.get("totalCash", 0),
-            "week_52_high": info.get("fiftyTwoWeekHigh", 0),
-            "week_52_low": info.get("fiftyTwoWeekLow", 0),
-            "avg_volume": info.get("averageVolume", 0),
-            "promoter_holding": round(info.get("heldPercentInsiders", 0) * 100, 2) if info.get("heldPercentInsiders") else 0,
-            "institutional_holding": round(info.get("heldPercentInstitutions", 0) * 100, 2) if info.get("heldPercentInstitutions") else 0,
-            "dii_holding": None, "fii_holding": None,
-        }
+    # Wait for info first as it's needed for basic data
+    try:
+        info = f_info.result(timeout=10)
+    except:
+        info = {}
 
-        # Generative Pros/Cons (CPU bound, fast)
-        pros, cons = _generate_pros_cons(info, result)
-        result["pros"] = pros
-        result["cons"] = cons
+    # Basic Data
+    is_indian = symbol.upper().endswith(".NS") or symbol.upper().endswith(".BO")
+    current_price = info.get("currentPrice", info.get("regularMarketPrice", 0)) or 0
+    face_value = info.get("faceValue", None)
+    
+    # ROCE Calculation
+    roce_val = None
+    try:
+        ebit = info.get("ebitda", 0) or 0
+        interest = info.get("interestExpense", 0) or 0
+        if interest and interest < 0:
+            ebit = ebit + interest
+        total_assets = info.get("totalAssets", 0) or 0
+        current_liab = info.get("totalCurrentLiabilities", 0) or 0
+        capital_employed = total_assets - current_liab
+        if capital_employed > 0 and ebit > 0:
+            roce_val = round((ebit / capital_employed) * 100, 2)
+    except:
+        pass
 
-        # Process Quarterly Results
-        try:
-            qf = f_qfin.result(timeout=5)
-            if qf is not None and not qf.empty:
-                quarters = []
-                for col in qf.columns[:12]:
-                    revenue = _safe_int_from_df(qf, "Total Revenue", col)
-                    op_income = _safe_int_from_df(qf, "Operating Income", col)
-                    net_income = _safe_int_from_df(qf, "Net Income", col)
-                    gross = _safe_int_from_df(qf, "Gross Profit", col)
-                    ebitda = _safe_int_from_df(qf, "EBITDA", col)
-                    interest = _safe_int_from_df(qf, "Interest Expense", col)
-                    tax = _safe_int_from_df(qf, "Tax Provision", col)
-                    expenses = (revenue - op_income) if revenue and op_income else None
-                    opm = round((op_income / revenue) * 100) if revenue and op_income and revenue > 0 else None
-                    shares = info.get("sharesOutstanding", 0)
-                    eps_q = round(net_income / shares, 2) if net_income and shares and shares > 0 else None
-
-                    quarters.append({
-                        "quarter": col.strftime("%b %Y"),
-                        "revenue": revenue, "expenses": expenses, "operating_profit": op_income,
-                        "opm_pct": opm, "other_income": _safe_int_from_df(qf, "Other Income", col),
-                        "interest": interest, "depreciation": _safe_int_from_df(qf, "Reconciled Depreciation", col),
-                        "profit_before_tax": _safe_int_from_df(qf, "Pretax Income", col),
-                        "tax_pct": round((tax / (tax + net_income)) * 100) if tax and net_income and (tax + net_income) > 0 else None,
-                        "net_income": net_income, "ebitda": ebitda, "gross_profit": gross, "eps": eps_q,
-                    })
-                result["quarterly_results"] = quarters
-            else:
-                result["quarterly_results"] = []
-        except:
+    result = {
+        "name": info.get("longName", symbol),
+        "symbol": symbol.upper(),
+        "sector": info.get("sector", "N/A"),
+        "industry": info.get("industry", "N/A"),
+        "market_cap": info.get("marketCap", 0),
+        "current_price": round(current_price, 2),
+        "face_value": face_value,
+        "pe_ratio": info.get("trailingPE", None),
+        "forward_pe": info.get("forwardPE", None),
+        "pb_ratio": info.get("priceToBook", None),
+        "eps": info.get("trailingEps", None),
+        "book_value": info.get("bookValue", None),
+        "dividend_yield": round(info.get("dividendYield", 0) * 100, 2) if info.get("dividendYield") else 0,
+        "roe": round(info.get("returnOnEquity", 0) * 100, 2) if info.get("returnOnEquity") else 0,
+        "roce": roce_val,
+        "debt_to_equity": info.get("debtToEquity", None),
+        "profit_margins": round(info.get("profitMargins", 0) * 100, 2) if info.get("profitMargins") else 0,
+        "revenue": info.get("totalRevenue", 0),
+        "net_income": info.get("netIncomeToCommon", 0),
+        "operating_margins": round(info.get("operatingMargins", 0) * 100, 2) if info.get("operatingMargins") else 0,
+        "free_cashflow": info.get("freeCashflow", 0),
+        "total_debt": info.get("totalDebt", 0),
+        "total_cash": info.get("totalCash", 0),
+        "week_52_high": info.get("fiftyTwoWeekHigh", 0),
+        "week_52_low": info.get("fiftyTwoWeekLow", 0),
+        "avg_volume": info.get("averageVolume", 0),
+        "promoter_holding": round(info.get("heldPercentInsiders", 0) * 100, 2) if info.get("heldPercentInsiders") else 0,
+        "institutional_holding": round(info.get("heldPercentInstitutions", 0) * 100, 2) if info.get("heldPercentInstitutions") else 0,
+        "dii_holding": None, "fii_holding": None,
+    }
+
+    # Generative Pros/Cons (CPU bound, fast)
+    pros, cons = _generate_pros_cons(info, result)
+    result["pros"] = pros
+    result["cons"] = cons
+
+    # Process Quarterly Results
+    try:
+        qf = f_qfin.result(timeout=5)
+        if qf is not None and not qf.empty:
+            quarters = []
+            for col in qf.columns[:12]:
+                revenue = _safe_int_from_df(qf, "Total Revenue", col)
+                op_income = _safe_int_from_df(qf, "Operating Income", col)
+                net_income = _safe_int_from_df(qf, "Net Income", col)
+                gross = _safe_int_from_df(qf, "Gross Profit", col)
+                ebitda = _safe_int_from_df(qf, "EBITDA", col)
+                interest = _safe_int_from_df(qf, "Interest Expense", col)
+                tax = _safe_int_from_df(qf, "Tax Provision", col)
+                expenses = (revenue - op_income) if revenue and op_income else None
+                opm = round((op_income / revenue) * 100) if revenue and op_income and revenue > 0 else None
+                shares = info.get("sharesOutstanding", 0)
+                eps_q = round(net_income / shares, 2) if net_income and shares and shares > 0 else None
+
+                quarters.append({
+                    "quarter": col.strftime("%b %Y"),
+                    "revenue": revenue, "expenses": expenses, "operating_profit": op_income,
+                    "opm_pct": opm, "other_income": _safe_int_from_df(qf, "Other Income", col),
+                    "interest": interest, "depreciation": _safe_int_from_df(qf, "Reconciled Depreciation", col),
+                    "profit_before_tax": _safe_int_from_df(qf, "Pretax Income", col),
+                    "tax_pct": round((tax / (tax + net_income)) * 100) if tax and net_income and (tax + net_income) > 0 else None,
+                    "net_income": net_income, "ebitda": ebitda, "gross_profit": gross, "eps": eps_q,
+                })
+            result["quarterly_results"] = quarters
+        else:
             result["quarterly_results"] = []
+    except:
+        result["quarterly_results"] = []
 
-        # Process Dividend Payouts (needs Dividends + Annual Financials)
-        try:
-            divs = f_divs.result(timeout=5)
-            af = f_fin.result(timeout=5)
-            annual = []
-            if af is not None and not af.empty:
-                for col in af.columns[:12]:
-                    revenue = _safe_int_from_df(af, "Total Revenue", col)
-                    op_income = _safe_int_from_df(af, "Operating Income", col)
-                    net_income = _safe_int_from_df(af, "Net Income", col)
-                    expenses = (revenue - op_income) if revenue and op_income else None
-                    opm = round((op_income / revenue) * 100) if revenue and op_income and revenue > 0 else None
-                    shares = info.get("sharesOutstanding", 0)
-                    eps_a = round(net_income / shares, 2) if net_income and shares and shares > 0 else None
-                    
-                    div_payout = None
-                    try:
-                        if divs is not None and not divs.empty:
-                            year_divs = divs[divs.index.year == col.year]
-                            if not year_divs.empty and eps_a and eps_a > 0:
-                                div_payout = round((year_divs.sum() / eps_a) * 100)
-                    except: pass
-
-                    annual.append({
-                        "period": col.strftime("%b %Y"),
-                        "revenue": revenue, "expenses": expenses, "operating_profit": op_income,
-                        "opm_pct": opm, "other_income": _safe_int_from_df(af, "Other Income", col),
-                        "interest": _safe_int_from_df(af, "Interest Expense", col),
-                        "depreciation": _safe_int_from_df(af, "Reconciled Depreciation", col),
-                        "profit_before_tax": _safe_int_from_df(af, "Pretax Income", col),
-                        "tax_pct": _safe_int_from_df(af, "Tax Provision", col), # raw value or calc?
-                        "net_income": net_income, "eps": eps_a, "dividend_payout_pct": div_payout,
-                    })
-                result["annual_results"] = annual
-            else:
-                result["annual_results"] = []
-        except:
+    # Process Dividend Payouts (needs Dividends + Annual Financials)
+    try:
+        divs = f_divs.result(timeout=5)
+        af = f_fin.result(timeout=5)
+        annual = []
+        if af is not None and not af.empty:
+            for col in af.columns[:12]:
+                revenue = _safe_int_from_df(af, "Total Revenue", col)
+                op_income = _safe_int_from_df(af, "Operating Income", col)
+                net_income = _safe_int_from_df(af, "Net Income", col)
+                expenses = (revenue - op_income) if revenue and op_income else None
+                opm = round((op_income / revenue) * 100) if revenue and op_income and revenue > 0 else None
+                shares = info.get("sharesOutstanding", 0)
+                eps_a = round(net_income / shares, 2) if net_income and shares and shares > 0 else None
+                
+                div_payout = None
+                try:
+                    if divs is not None and not divs.empty:
+                        year_divs = divs[divs.index.year == col.year]
+                        if not year_divs.empty and eps_a and eps_a > 0:
+                            div_payout = round((year_divs.sum() / eps_a) * 100)
+                except: pass
+
+                annual.append({
+                    "period": col.strftime("%b %Y"),
+                    "revenue": revenue, "expenses": expenses, "operating_profit": op_income,
+                    "opm_pct": opm, "other_income": _safe_int_from_df(af, "Other Income", col),
+                    "interest": _safe_int_from_df(af, "Interest Expense", col),
+                    "depreciation": _safe_int_from_df(af, "Reconciled Depreciation", col),
+                    "profit_before_tax": _safe_int_from_df(af, "Pretax Income", col),
+                    "tax_pct": _safe_int_from_df(af, "Tax Provision", col), # raw value or calc?
+                    "net_income": net_income, "eps": eps_a, "dividend_payout_pct": div_payout,
+                })
+            result["annual_results"] = annual
+        else:
             result["annual_results"] = []
+    except:
+        result["annual_results"] = []
 
-        # Process CAGR (Compounded Growth)
-        try:
-            growth = {}
-            # Re-use 'af' from above
-            if af is not None and not af.empty:
-                rev_series = af.loc["Total Revenue"] if "Total Revenue" in af.index else None
-                ni_series = af.loc["Net Income"] if "Net Income" in af.index else None
-                for label, years in [("3Y", 3), ("5Y", 5), ("10Y", 10)]:
-                    if rev_series is not None and len(rev_series) >= years:
-                        latest_rev = float(rev_series.iloc[0])
-                        old_rev = float(rev_series.iloc[min(years-1, len(rev_series)-1)])
-                        if old_rev > 0 and latest_rev > 0:
-                            growth[f"sales_growth_{label}"] = round(((latest_rev / old_rev) ** (1/years) - 1) * 100, 1)
-                    if ni_series is not None and len(ni_series) >= years:
-                        latest_ni = float(ni_series.iloc[0])
-                        old_ni = float(ni_series.iloc[min(years-1, len(ni_series)-1)])
-                        if old_ni > 0 and latest_ni > 0:
-                            growth[f"profit_growth_{label}"] = round(((latest_ni / old_ni) ** (1/years) - 1) * 100, 1)
-            
-            # Stock Price CAGR
-            hist = f_hist.result(timeout=10)
-            if hist is not None and not hist.empty and len(hist) > 10:
-                end_price = float(hist["Close"].iloc[-1])
-                for label, years in [("1Y", 1), ("3Y", 3), ("5Y", 5), ("10Y", 10)]:
-                     # approximate trading days
-                    days = years * 252
-                    if len(hist) > days:
-                        start_price = float(hist["Close"].iloc[-days])
-                        if start_price > 0:
-                             growth[f"stock_cagr_{label}"] = round(((end_price / start_price) ** (1/years) - 1) * 100, 1)
-
-            if result.get("roe") and result.get("roe") > 0:
-                growth["roe_last_year"] = result["roe"]
-            
-            result["compounded_growth"] = growth
-        except:
-            result["compounded_growth"] = {}
+    # Process CAGR (Compounded Growth)
+    try:
+        growth = {}
+        # Re-use 'af' from above
+        if af is not None and not af.empty:
+            rev_series = af.loc["Total Revenue"] if "Total Revenue" in af.index else None
+            ni_series = af.loc["Net Income"] if "Net Income" in af.index else None
+            for label, years in [("3Y", 3), ("5Y", 5), ("10Y", 10)]:
+                if rev_series is not None and len(rev_series) >= years:
+                    latest_rev = float(rev_series.iloc[0])
+                    old_rev = float(rev_series.iloc[min(years-1, len(rev_series)-1)])
+                    if old_rev > 0 and latest_rev > 0:
+                        growth[f"sales_growth_{label}"] = round(((latest_rev / old_rev) ** (1/years) - 1) * 100, 1)
+                if ni_series is not None and len(ni_series) >= years:
+                    latest_ni = float(ni_series.iloc[0])
+                    old_ni = float(ni_series.iloc[min(years-1, len(ni_series)-1)])
+                    if old_ni > 0 and latest_ni > 0:
+                        growth[f"profit_growth_{label}"] = round(((latest_ni / old_ni) ** (1/years) - 1) * 100, 1)
+        
+        # Stock Price CAGR
+        hist = f_hist.result(timeout=10)
+        if hist is not None and not hist.empty and len(hist) > 10:
+            end_price = float(hist["Close"].iloc[-1])
+            for label, years in [("1Y", 1), ("3Y", 3), ("5Y", 5), ("10Y", 10)]:
+                 # approximate trading days
+                days = years * 252
+                if len(hist) > days:
+                    start_price = float(hist["Close"].iloc[-days])
+                    if start_price > 0:
+                         growth[f"stock_cagr_{label}"] = round(((end_price / start_price) ** (1/years) - 1) * 100, 1)
+
+        if result.get("roe") and result.get("roe") > 0:
+            growth["roe_last_year"] = result["roe"]
+        
+        result["compounded_growth"] = growth
+    except:
+        result["compounded_growth"] = {}
 
-        # Process Balance Sheet
-        try:
-            bs = f_bs.result(timeout=5)
-            if bs is not None and not bs.empty:
-                latest = bs.iloc[:, 0]
-                result["balance_sheet"] = {
-                    "quarter": bs.columns[0].strftime("%b %Y"),
-                    "total_assets": _safe_int(latest, "Total Assets"),
-                    "total_liabilities": _safe_int(latest, "Total Liabilities Net Minority Interest"),
-                    "total_equity": _safe_int(latest, "Stockholders Equity"),
-                    "total_debt": _safe_int(latest, "Total Debt"),
-                    "cash_equivalents": _safe_int(latest, "Cash And Cash Equivalents"),
-                }
-            else:
-                result["balance_sheet"] = {}
-        except:
+    # Process Balance Sheet
+    try:
+        bs = f_bs.result(timeout=5)
+        if bs is not None and not bs.empty:
+            latest = bs.iloc[:, 0]
+            result["balance_sheet"] = {
+                "quarter": bs.columns[0].strftime("%b %Y"),
+                "total_assets": _safe_int(latest, "Total Assets"),
+                "total_liabilities": _safe_int(latest, "Total Liabilities Net Minority Interest"),
+                "total_equity": _safe_int(latest, "Stockholders Equity"),
+                "total_debt": _safe_int(latest, "Total Debt"),
+                "cash_equivalents": _safe_int(latest, "Cash And Cash Equivalents"),
+            }
+        else:
             result["balance_sheet"] = {}
+    except:
+        result["balance_sheet"] = {}
 
-        # Process Cash Flow
-        try:
-            cf = f_cf.result(timeout=5)
-            if cf is not None and not cf.empty:
-                latest = cf.iloc[:, 0]
-                result["cashflow"] = {
-                    "quarter": cf.columns[0].strftime("%b %Y"),
-                    "operating_cashflow": _safe_int(latest, "Operating Cash Flow"),
-                    "investing_cashflow": _safe_int(latest, "Investing Cash Flow"),
-                    "financing_cashflow": _safe_int(latest, "Financing Cash Flow"),
-                    "free_cashflow": _safe_int(latest, "Free Cash Flow"),
-                }
-            else:
-                result["cashflow"] = {}
-        except:
+    # Process Cash Flow
+    try:
+        cf = f_cf.result(timeout=5)
+        if cf is not None and not cf.empty:
+            latest = cf.iloc[:, 0]
+            result["cashflow"] = {
+                "quarter": cf.columns[0].strftime("%b %Y"),
+                "operating_cashflow": _safe_int(latest, "Operating Cash Flow"),
+                "investing_cashflow": _safe_int(latest, "Investing Cash Flow"),
+                "financing_cashflow": _safe_int(latest, "Financing Cash Flow"),
+                "free_cashflow": _safe_int(latest, "Free Cash Flow"),
+            }
+        else:
             result["cashflow"] = {}
-        
-        # Process Peers (Concurrent)
-        try:
-            industry = info.get("industry", "")
-            sector = info.get("sector", "")
-            if industry or sector:
-                result["peers"] = _fetch_peer_data(symbol, industry, sector, is_indian)
-            else:
-                result["peers"] = []
-        except:
-             result["peers"] = []
+    except:
+        result["cashflow"] = {}
+    
+    # Process Peers (Concurrent)
+    try:
+        industry = info.get("industry", "")
+        sector = info.get("sector", "")
+        if industry or sector:
+            result["peers"] = _fetch_peer_data(symbol, industry, sector, is_indian)
+        else:
+            result["peers"] = []
+    except:
+         result["peers"] = []
 
-        return result
+    return result
 
 def _fetch_financials_sync(symbol):
     # Wrapper to maintain compatibility but use new concurrent instruction
@@ -1190,38 +1511,88 @@ def _safe_int_from_df(df, field, col):
     return None
 
 
-def _fetch_stock_detail_sync(symbol):
-    """Comprehensive stock detail: returns, trade info, price info, securities, holdings, actions."""
+_STOCK_DETAIL_DEADLINE = float(os.environ.get("STOCK_DETAIL_DEADLINE", "6"))
+_RETURN_PERIODS = {"1W": "5d", "1M": "1mo", "YTD": "ytd", "1Y": "1y", "3Y": "3y", "5Y": "5y"}
+
+# Section results that finished after their request's deadline, for the next request to pick up.
+# Sections that make their deadline are not stored: this only carries a late section over to
+# the client's re-poll of ``pending``, so two minutes is plenty.
+_detail_sections = TTLCache(maxsize=1000, ttl=120)
+# Benchmark period returns are the same for every stock on the exchange
+_benchmark_returns_cache = TTLCache(maxsize=8, ttl=300)
+
+
+def _period_returns(symbol):
+    """Percent return over each of _RETURN_PERIODS, all sliced from one stored daily frame."""
+    hist = _history_or_empty(symbol, "5y")
+    returns = {}
+    for label, period in _RETURN_PERIODS.items():
+        window = slice_period(hist, period) if not hist.empty else hist
+        if not window.empty and len(window) > 1:
+            returns[label] = round(((window['Close'].iloc[-1] / window['Close'].iloc[0]) - 1) * 100, 2)
+        else:
+            returns[label] = None
+    return returns
+
+
+def _benchmark_returns(benchmark_symbol):
+    cached, _ = _benchmark_returns_cache.get(benchmark_symbol)
+    if cached is not None:
+        return cached
+    returns = _period_returns(benchmark_symbol)
+    _benchmark_returns_cache.set(benchmark_symbol, returns)
+    return returns
+
+
+def _detail_volatility(symbol):
+    hist_30d = _history_or_empty(symbol, "1mo")
+    if not hist_30d.empty and len(hist_30d) > 2:
+        daily_returns = hist_30d['Close'].pct_change().dropna()
+        daily_vol = round(daily_returns.std() * 100, 2)
+        return {"daily_volatility": daily_vol, "annual_volatility": round(daily_vol * (252 ** 0.5), 2)}
+    return {"daily_volatility": None, "annual_volatility": None}
+
+
+def _detail_actions(symbol, currency_symbol):
     ticker = yf.Ticker(symbol)
-    info = ticker.info
+    actions_list = []
+    dividends = ticker.dividends
+    if dividends is not None and not dividends.empty:
+        for date, amount in dividends.tail(10).items():
+            actions_list.append({
+                "type": "Dividend",
+                "date": date.strftime("%d-%b-%Y"),
+                "details": f"{currency_symbol}{amount:.2f} per share"
+            })
 
-    is_indian = symbol.upper().endswith(".NS") or symbol.upper().endswith(".BO")
-    benchmark_symbol = "^NSEI" if is_indian else "^GSPC"
-    benchmark_name = "NIFTY 50" if is_indian else "S&P 500"
-    currency = "INR" if is_indian else "USD"
-    currency_symbol = "₹" if is_indian else "$"
+    splits = ticker.splits
+    if splits is not None and not splits.empty:
+        for date, ratio in splits.tail(5).items():
+            actions_list.append({
+                "type": "Split/Bonus",
+                "date": date.strftime("%d-%b-%Y"),
+                "details": f"{int(ratio)}:1" if ratio > 1 else f"1:{int(1/ratio)}"
+            })
+    actions_list.sort(key=lambda x: x["date"], reverse=True)
+    return actions_list
 
-    returns_data = {}
-    periods = {"1W": "5d", "1M": "1mo", "YTD": "ytd", "1Y": "1y", "3Y": "3y", "5Y": "5y"}
-    try:
-        for label, period in periods.items():
-            try:
-                stock_hist = ticker.history(period=period)
-                bench_hist = yf.Ticker(benchmark_symbol).history(period=period)
-                if not stock_hist.empty and len(stock_hist) > 1:
-                    stock_return = round(((stock_hist['Close'].iloc[-1] / stock_hist['Close'].iloc[0]) - 1) * 100, 2)
-                else:
-                    stock_return = None
-                if not bench_hist.empty and len(bench_hist) > 1:
-                    bench_return = round(((bench_hist['Close'].iloc[-1] / bench_hist['Close'].iloc[0]) - 1) * 100, 2)
-                else:
-                    bench_return = None
-                returns_data[label] = {"stock": stock_return, "benchmark": bench_return}
-            except:
-                returns_data[label] = {"stock": None, "benchmark": None}
-    except:
-        pass
 
+def _detail_calendar(symbol):
+    calendar_events = []
+    cal = yf.Ticker(symbol).calendar
+    if cal is not None:
+        if isinstance(cal, dict):
+            for key, val in cal.items():
+                if val is not None:
+                    date_str = val.strftime("%d-%b-%Y") if hasattr(val, 'strftime') else str(val)
+                    calendar_events.append({"event": key, "date": date_str})
+        elif hasattr(cal, 'items'):
+            for key, val in cal.items():
+                calendar_events.append({"event": key, "date": str(val)})
+    return calendar_events
+
+
+def _detail_info_sections(symbol, info, currency):
     volume = info.get("volume", 0) or 0
     avg_volume = info.get("averageVolume", 0) or 0
     avg_volume_10d = info.get("averageVolume10days", 0) or 0
@@ -1249,25 +1620,12 @@ def _fetch_stock_detail_sync(symbol):
     day_avg_200 = info.get("twoHundredDayAverage", 0) or 0
     beta = info.get("beta", None)
 
-    daily_vol = None
-    annual_vol = None
-    try:
-        hist_30d = ticker.history(period="1mo")
-        if not hist_30d.empty and len(hist_30d) > 2:
-            daily_returns = hist_30d['Close'].pct_change().dropna()
-            daily_vol = round(daily_returns.std() * 100, 2)
-            annual_vol = round(daily_vol * (252 ** 0.5), 2)
-    except:
-        pass
-
     price_info = {
         "week_52_high": high_52w,
         "week_52_low": low_52w,
         "sma_50": round(day_avg_50, 2),
         "sma_200": round(day_avg_200, 2),
         "beta": round(beta, 2) if beta else None,
-        "daily_volatility": daily_vol,
-        "annual_volatility": annual_vol,
     }
 
     securities_info = {
@@ -1294,44 +1652,69 @@ def _fetch_stock_detail_sync(symbol):
         "institutions": institutions_pct,
         "public": public_pct,
     }
+    return trade_info, price_info, securities_info, shareholding
 
-    actions_list = []
-    try:
-        dividends = ticker.dividends
-        if dividends is not None and not dividends.empty:
-            for date, amount in dividends.tail(10).items():
-                actions_list.append({
-                    "type": "Dividend",
-                    "date": date.strftime("%d-%b-%Y"),
-                    "details": f"{currency_symbol}{amount:.2f} per share"
-                })
 
-        splits = ticker.splits
-        if splits is not None and not splits.empty:
-            for date, ratio in splits.tail(5).items():
-                actions_list.append({
-                    "type": "Split/Bonus",
-                    "date": date.strftime("%d-%b-%Y"),
-                    "details": f"{int(ratio)}:1" if ratio > 1 else f"1:{int(1/ratio)}"
-                })
-        actions_list.sort(key=lambda x: x["date"], reverse=True)
-    except:
-        pass
+def _fetch_stock_detail_sync(symbol, deadline=None):
+    """Comprehensive stock detail: returns, trade info, price info, securities, holdings, actions.
 
-    calendar_events = []
-    try:
-        cal = ticker.calendar
-        if cal is not None:
-            if isinstance(cal, dict):
-                for key, val in cal.items():
-                    if val is not None:
-                        date_str = val.strftime("%d-%b-%Y") if hasattr(val, 'strftime') else str(val)
-                        calendar_events.append({"event": key, "date": date_str})
-            elif hasattr(cal, 'items'):
-                for key, val in cal.items():
-                    calendar_events.append({"event": key, "date": str(val)})
-    except:
-        pass
+    Each section is fetched concurrently on the shared pools. Sections still running when
+    ``deadline`` seconds have passed are listed under ``pending``; they keep running and
+    their results are served to the next request for the same symbol.
+    """
+    is_indian = symbol.upper().endswith(".NS") or symbol.upper().endswith(".BO")
+    benchmark_symbol = "^NSEI" if is_indian else "^GSPC"
+    benchmark_name = "NIFTY 50" if is_indian else "S&P 500"
+    currency = "INR" if is_indian else "USD"
+    currency_symbol = "₹" if is_indian else "$"
+
+    fundamentals, history = get_pool("fundamentals"), get_pool("history")
+    jobs = {
+        "info": (fundamentals, lambda: yf.Ticker(symbol).info),
+        "returns": (history, lambda: _period_returns(symbol)),
+        "benchmark": (history, lambda: _benchmark_returns(benchmark_symbol)),
+        "volatility": (history, lambda: _detail_volatility(symbol)),
+        "actions": (fundamentals, lambda: _detail_actions(symbol, currency_symbol)),
+        "calendar": (fundamentals, lambda: _detail_calendar(symbol)),
+    }
+
+    def _remember(name, future):
+        if not future.cancelled() and future.exception() is None:
+            _detail_sections.set((symbol.upper(), name), future.result())
+
+    sections, futures = {}, {}
+    for name, (pool, fn) in jobs.items():
+        cached, _ = _detail_sections.get((symbol.upper(), name))
+        if cached is not None:
+            sections[name] = cached
+            continue
+        futures[pool.submit(fn)] = name
+
+    done, late = wait(futures, timeout=_STOCK_DETAIL_DEADLINE if deadline is None else deadline)
+    for future in late:
+        future.add_done_callback(lambda f, n=futures[future]: _remember(n, f))
+    errors = {}
+    for future in done:
+        if future.exception() is None:
+            sections[futures[future]] = future.result()
+        else:
+            errors[futures[future]] = future.exception()
+    pending = [name for name in jobs if name not in sections and name not in errors]
+
+    if "info" in errors:
+        raise errors["info"]
+
+    returns_data = {}
+    if "returns" in sections or "benchmark" in sections:
+        stock_returns = sections.get("returns") or {}
+        bench_returns = sections.get("benchmark") or {}
+        for label in _RETURN_PERIODS:
+            returns_data[label] = {"stock": stock_returns.get(label), "benchmark": bench_returns.get(label)}
+
+    trade_info = price_info = securities_info = shareholding = None
+    if "info" in sections:
+        trade_info, price_info, securities_info, shareholding = _detail_info_sections(symbol, sections["info"], currency)
+        price_info.update(sections.get("volatility") or {"daily_volatility": None, "annual_volatility": None})
 
     return {
         "symbol": symbol.upper(),
@@ -1343,8 +1726,9 @@ def _fetch_stock_detail_sync(symbol):
         "price_info": price_info,
         "securities_info": securities_info,
         "shareholding": shareholding,
-        "corporate_actions": actions_list,
-        "calendar": calendar_events,
+        "corporate_actions": sections.get("actions", []),
+        "calendar": sections.get("calendar", []),
+        "pending": pending,
     }
 
 
@@ -1358,11 +1742,99 @@ def _safe_int(series, key):
     return None
 
 
+_PANEL_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+def _fetch_panel_sync(symbols, period, interval):
+    """Aligned (time x symbol) OHLCV arrays for ``symbols`` from the stored history.
+    Symbols without data are dropped; bars missing for one symbol are NaN.
+    """
+    pool = get_pool("history")
+    futures = {sym: pool.submit(_fetch_history_sync, sym, period, interval) for sym in dict.fromkeys(symbols)}
+    frames = {}
+    for sym, future in futures.items():
+        try:
+            frames[sym] = future.result()
+        except Exception as exc:
+            _logger.debug("Panel: no history for %s: %s", sym, exc)
+    if not frames:
+        raise ValueError("No data found for any symbol")
+
+    index = None
+    for df in frames.values():
+        index = df.index if index is None else index.union(df.index)
+    panel = {f.lower(): np.full((len(index), len(frames)), np.nan) for f in _PANEL_FIELDS}
+    for k, df in enumerate(frames.values()):
+        rows = index.get_indexer(df.index)
+        for f in _PANEL_FIELDS:
+            if f in df.columns:
+                panel[f.lower()][rows, k] = df[f].to_numpy(dtype=np.float64)
+    return index, list(frames), panel
+
+
+def _screen_sync(stocks, columns, period, interval):
+    for col in columns:
+        resolve(col)  # reject unknown indicators before loading the universe
+    index, symbols, panel = _fetch_panel_sync([s["symbol"] for s in stocks], period, interval)
+    session = index.normalize().asi8 if isinstance(index, pd.DatetimeIndex) else None
+    values = compute_panel({**panel, "session": session} if session is not None else panel, columns)
+
+    def _num(v):
+        v = float(v)
+        return round(v, 4) if math.isfinite(v) else None
+
+    close = panel["close"]
+    last_close = last_valid(close)
+    first_close = close[np.argmax(~np.isnan(close), axis=0), np.arange(close.shape[1])]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        period_return = (last_close / first_close - 1) * 100
+    latest = {col: last_valid(arr) for col, arr in values.items()}
+    ranks = {col: cross_sectional_rank(v) for col, v in latest.items()}
+    return_rank = cross_sectional_rank(period_return)
+
+    meta = {s["symbol"]: s for s in stocks}
+    rows = []
+    for k, sym in enumerate(symbols):
+        row = {
+            "symbol": sym,
+            "name": meta[sym].get("name", sym),
+            "sector": meta[sym].get("sector"),
+            "price": _num(last_close[k]),
+            "period_return": _num(period_return[k]),
+            "period_return_rank": _num(return_rank[k]),
+        }
+        for col in columns:
+            row[col] = _num(latest[col][k])
+            row[f"{col}_rank"] = _num(ranks[col][k])
+        rows.append(row)
+    return rows
+
+
+# Concurrent identical upstream fetches share one in-flight call
+_inflight = SingleFlight()
+
 
 class MarketDataService:
     @staticmethod
     async def get_historical_data(symbol: str, period: str = "1y", interval: str = "1d") -> pd.DataFrame:
-        return await asyncio.to_thread(_fetch_history_sync, symbol, period, interval)
+        df = await _inflight.do(
+            ("history", symbol.upper(), period, interval),
+            get_pool("history").run, _fetch_history_sync, symbol, period, interval,
+        )
+        # callers add indicator columns in place; give each one its own frame
+        return df.copy(deep=False)
+
+    @staticmethod
+    async def stream_history(symbol: str, period: str = "60d", interval: str = "5m", column: str = "Close",
+                             chunk_bars: int = 20_000):
+        """Iterator of (index, values) chunks of one column, read from the memory-mapped bar
+        store, so walking a long history never holds more than one chunk of it.
+        """
+        await _inflight.do(
+            ("history_store", symbol.upper(), period, interval),
+            get_pool("history").run, _ensure_history_sync, symbol, period, interval,
+        )
+        return await asyncio.to_thread(bar_store.column_chunks, symbol, interval, column, period, chunk_bars)
 
     @staticmethod
     def get_market_status(df: pd.DataFrame) -> dict:
@@ -1376,11 +1848,50 @@ class MarketDataService:
 
     @staticmethod
     async def get_realtime_quote(symbol: str) -> dict:
-        return await asyncio.to_thread(_fetch_quote_sync, symbol)
+        return await _inflight.do(("quote", symbol.upper()), get_pool("quotes").run, _fetch_quote_sync, symbol)
 
     @staticmethod
     async def get_multi_quotes(symbols: list) -> list:
-        return await asyncio.to_thread(_fetch_batch_quotes_sync, symbols)
+        return await _inflight.do(("quotes", tuple(symbols)), asyncio.to_thread, _fetch_batch_quotes_sync, symbols)
+
+    @staticmethod
+    async def get_panel(symbols: list, period: str = "1y", interval: str = "1d"):
+        """(index, symbols, {field: time x symbol array}) for cross-sectional work."""
+        return await _inflight.do(
+            ("panel", tuple(symbols), period, interval), asyncio.to_thread, _fetch_panel_sync, symbols, period, interval,
+        )
+
+    @staticmethod
+    async def screen(stocks: list, columns: list, period: str = "1y", interval: str = "1d") -> list:
+        """Latest value and cross-sectional rank of each indicator for every stock in the universe,
+        computed over the whole (time x symbol) panel at once.
+        """
+        return await asyncio.to_thread(_screen_sync, stocks, columns, period, interval)
+
+    @staticmethod
+    def rank_screen(rows: list, sort: str) -> list:
+        """Order screener rows by ``sort``: numeric columns highest first, text columns
+        (symbol, name, ...) alphabetically, missing values last.
+        """
+        present = [r for r in rows if r[sort] is not None]
+        missing = [r for r in rows if r[sort] is None]
+        numeric = all(isinstance(r[sort], (int, float)) for r in present)
+        if numeric:
+            present.sort(key=lambda r: r[sort], reverse=True)
+        else:
+            present.sort(key=lambda r: str(r[sort]).lower())
+        return present + missing
+
+    @staticmethod
+    def get_diagnostics() -> dict:
+        return {
+            "quote_cache": _quote_cache.stats(),
+            "single_flight": _inflight.stats(),
+            "http_pool": http_pool.stats(),
+            "quote_providers": _provider_router.stats(),
+            "executors": pool_stats(),
+            "indicator_streams": indicator_streams.stats(),
+        }
 
     @staticmethod
     def search_symbols(query: str) -> list:
@@ -1412,32 +1923,30 @@ class MarketDataService:
 
     @staticmethod
     async def get_company_info(symbol: str) -> dict:
-        return await asyncio.to_thread(_fetch_company_sync, symbol)
+        return await get_pool("fundamentals").run(_fetch_company_sync, symbol)
 
     @staticmethod
     async def get_financials(symbol: str) -> dict:
-        return await asyncio.to_thread(_fetch_financials_sync, symbol)
+        return await _inflight.do(("financials", symbol.upper()), asyncio.to_thread, _fetch_financials_sync, symbol)
 
     @staticmethod
     async def get_stock_detail(symbol: str) -> dict:
-        return await asyncio.to_thread(_fetch_stock_detail_sync, symbol)
+        return await _inflight.do(("stock_detail", symbol.upper()), asyncio.to_thread, _fetch_stock_detail_sync, symbol)
 
     @staticmethod
-    def calculate_indicators(df: pd.DataFrame) -> pd.DataFrame:
-        df['SMA_20'] = df['Close'].rolling(window=20).mean()
-        df['SMA_50'] = df['Close'].rolling(window=50).mean()
-
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
-
-        exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-
+    def calculate_indicators(df: pd.DataFrame, symbol: str | None = None, interval: str = "1d",
+                             columns: list | None = None) -> pd.DataFrame:
+        """Add indicator columns (see app.services.indicators; default SMA_20, SMA_50, RSI,
+        MACD, Signal_Line) and drop the warm-up rows where any of them is undefined.
+        """
+        columns = DEFAULT_INDICATORS if columns is None else list(columns)
+        if symbol is not None and set(columns) <= set(INDICATOR_COLUMNS):
+            # Incremental path: only bars not seen before for this symbol/interval are computed
+            values = indicator_streams.compute(symbol, interval, df)
+        else:
+            values = compute_indicators(df, columns)
+        for col in columns:
+            df[col] = values[col]
         return df.dropna()
 
 
@@ -0,0 +1,38 @@
+from datetime import datetime, time as dtime, timedelta
+
+import pytz
+
+# Regular cash sessions, Mon-Fri (exchange holidays are not modelled)
+_SESSIONS = {
+    "NSE": (pytz.timezone("Asia/Kolkata"), dtime(9, 15), dtime(15, 30)),
+    "NYSE": (pytz.timezone("US/Eastern"), dtime(9, 30), dtime(16, 0)),
+}
+
+_CLOSED_TTL = 3600  # prices do not move while the session is closed
+
+
+def is_market_open(market: str, now: datetime | None = None) -> bool:
+    tz, open_t, close_t = _SESSIONS[market]
+    local = (now or datetime.now(pytz.utc)).astimezone(tz)
+    return local.weekday() < 5 and open_t <= local.time() <= close_t
+
+
+def seconds_until_open(market: str, now: datetime | None = None) -> float:
+    """Seconds until the next session opens; 0 while the market is open."""
+    tz, open_t, _ = _SESSIONS[market]
+    now = now or datetime.now(pytz.utc)
+    if is_market_open(market, now):
+        return 0.0
+    local = now.astimezone(tz)
+    day = local.date()
+    if local.time() >= open_t:
+        day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    next_open = tz.localize(datetime.combine(day, open_t))
+    return (next_open - local).total_seconds()
+
+
+def cache_ttl(market: str, open_ttl: float, closed_ttl: float = _CLOSED_TTL) -> float:
+    """TTL for market-wide snapshots: ``open_ttl`` during the session, longer otherwise."""
+    return open_ttl if is_market_open(market) else closed_ttl
@@ -43,7 +43,7 @@ class MLService:
     @staticmethod
     async def train_model(symbol: str):
         df = await MarketDataService.get_historical_data(symbol, period="5y", interval="1d")
-        df = MarketDataService.calculate_indicators(df)
+        df = MarketDataService.calculate_indicators(df, symbol)
         df = MLService._engineer_features(df)
 
         features = ['Lag_1', 'Lag_2', 'ATR', 'Volume', 'SMA_20', 'SMA_50', 'RSI', 'MACD', 'Signal_Line']
@@ -80,7 +80,7 @@ class MLService:
     @staticmethod
     async def predict_next_move(symbol: str):
         df = await MarketDataService.get_historical_data(symbol, period="100d", interval="1d")
-        df = MarketDataService.calculate_indicators(df)
+        df = MarketDataService.calculate_indicators(df, symbol)
         df_engineered = MLService._engineer_features(df)
         
         features = ['Lag_1', 'Lag_2', 'ATR', 'Volume', 'SMA_20', 'SMA_50', 'RSI', 'MACD', 'Signal_Line']
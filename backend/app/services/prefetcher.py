@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+
+from app.services.market_hours import is_market_open, seconds_until_open
+
+_logger = logging.getLogger(__name__)
+
+
+class _Job:
+    def __init__(self, name, market, fn, open_interval, closed_interval):
+        self.name = name
+        self.market = market
+        self.fn = fn
+        self.open_interval = open_interval
+        self.closed_interval = closed_interval
+        self.next_run = 0.0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+
+
+class Prefetcher:
+    """Background refresher for market-wide snapshots (heatmaps, index boards).
+
+    Each job is an async callable that rebuilds one cached payload. While its market
+    is open a job runs every ``open_interval`` seconds; once the session closes it runs
+    once more to pick up closing prices and then only every ``closed_interval``
+    seconds, with the next run pulled forward to the opening bell.
+    """
+
+    def __init__(self, tick: float = 5.0):
+        self.tick = tick
+        self._jobs = {}
+        self._task = None
+
+    def register(self, name: str, market: str, fn, open_interval: float = 60,
+                 closed_interval: float = 1800):
+        self._jobs[name] = _Job(name, market, fn, open_interval, closed_interval)
+
+    def _schedule(self, job: _Job, now: float):
+        if is_market_open(job.market):
+            job.next_run = now + job.open_interval
+        else:
+            job.next_run = now + min(job.closed_interval, max(seconds_until_open(job.market), self.tick))
+
+    async def _run_job(self, job: _Job):
+        started = time.time()
+        try:
+            await job.fn()
+            job.last_error = None
+        except Exception as exc:
+            job.failures += 1
+            job.last_error = str(exc)
+            _logger.warning("Prefetch job %s failed: %s", job.name, exc)
+        job.runs += 1
+        job.last_run = started
+        job.last_duration = round(time.time() - started, 3)
+        self._schedule(job, time.time())
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            due = [job for job in self._jobs.values() if job.next_run <= now]
+            if due:
+                await asyncio.gather(*(self._run_job(job) for job in due))
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        if self._task is None and self._jobs:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "jobs": {
+                job.name: {
+                    "market": job.market,
+                    "market_open": is_market_open(job.market),
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_run_age": round(now - job.last_run, 1) if job.last_run else None,
+                    "last_duration": job.last_duration,
+                    "next_run_in": round(max(job.next_run - now, 0), 1),
+                    "last_error": job.last_error,
+                }
+                for job in self._jobs.values()
+            },
+        }
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Rolling success rate / latency for one data provider, plus its circuit state.
+
+    The circuit opens once the failure rate over the last ``window`` calls reaches
+    ``failure_threshold`` (after at least ``min_samples`` calls). While open the
+    provider is skipped; after ``cooldown`` seconds a single half-open probe is let
+    through, and its outcome closes the circuit again or re-opens it.
+
+    An outcome of None means the provider answered but had nothing for the request
+    (an unknown symbol, say). It says nothing about the provider's health, so only
+    its latency is kept.
+    """
+
+    def __init__(self, name: str, priority: int, window: int = 50, min_samples: int = 10,
+                 failure_threshold: float = 0.6, cooldown: float = 60.0):
+        self.name = name
+        self.priority = priority
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outcomes = deque(maxlen=window)
+        self.latency_ewma = None
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.last_failure = 0.0
+        self.probe_started = None
+
+    @property
+    def success_rate(self) -> float:
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def record(self, ok: bool | None, latency: float, now: float):
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if ok is None:
+            if self.state == HALF_OPEN:
+                self.probe_started = None  # inconclusive; let the next request probe again
+            return
+        self.outcomes.append(1 if ok else 0)
+        if not ok:
+            self.last_failure = now
+        if self.state == HALF_OPEN:
+            self.probe_started = None
+            if ok:
+                self.state = CLOSED
+                self.outcomes.clear()
+                self.outcomes.append(1)
+            else:
+                self.state = OPEN
+                self.opened_at = now
+        elif (self.state == CLOSED and len(self.outcomes) >= self.min_samples
+              and 1 - self.success_rate >= self.failure_threshold):
+            self.state = OPEN
+            self.opened_at = now
+
+    def cost(self) -> float | None:
+        """Expected time to a usable answer: latency inflated by the failure rate.
+        None until the provider has been sampled.
+        """
+        if self.latency_ewma is None:
+            return None
+        return self.latency_ewma / max(self.success_rate, 0.05)
+
+    def is_slow(self, threshold: float) -> bool:
+        cost = self.cost()
+        return cost is not None and cost > threshold
+
+
+class ProviderRouter:
+    """Tries providers in priority (registration) order and keeps failing ones out of the path.
+
+    A lower-priority provider only moves ahead of a higher one when the higher one's
+    circuit is open, or when its expected time to an answer exceeds ``slow_threshold``
+    seconds. Unsampled providers keep their priority.
+    """
+
+    def __init__(self, providers: list[str], slow_threshold: float = 3.0, **health_kwargs):
+        self._health = {
+            name: ProviderHealth(name, priority=i, **health_kwargs) for i, name in enumerate(providers)
+        }
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+
+    def ordered(self, candidates: list[str] | None = None) -> list[str]:
+        """Providers to try, in order. A provider due for its half-open probe goes first
+        (so the probe is actually attempted); open circuits are left out. The rest follow
+        in priority order, with slow providers moved behind the others. When that leaves
+        nothing to try, the provider whose last failure is oldest is tried anyway.
+        """
+        now = time.time()
+        probes, healthy = [], []
+        names = candidates if candidates is not None else list(self._health)
+        with self._lock:
+            for name in names:
+                h = self._health[name]
+                if h.state == OPEN and now - h.opened_at >= h.cooldown:
+                    h.state = HALF_OPEN
+                    h.probe_started = None
+                if h.state == HALF_OPEN:
+                    # one probe at a time; a probe that never reported back is retried after a cooldown
+                    if h.probe_started is None or now - h.probe_started >= h.cooldown:
+                        h.probe_started = now
+                        probes.append(h)
+                elif h.state == CLOSED:
+                    healthy.append(h)
+            if not probes and not healthy and names:
+                return [min(names, key=lambda name: self._health[name].last_failure)]
+        healthy.sort(key=lambda h: (h.is_slow(self.slow_threshold), h.priority))
+        return [h.name for h in probes + healthy]
+
+    def record(self, name: str, ok: bool | None, latency: float):
+        with self._lock:
+            self._health[name].record(ok, latency, time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "state": h.state,
+                    "success_rate": round(h.success_rate, 3),
+                    "latency_ms": round(h.latency_ewma * 1000, 1) if h.latency_ewma is not None else None,
+                    "samples": len(h.outcomes),
+                }
+                for name, h in self._health.items()
+            }
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Content-addressed backtest results
+#
+# A result is stored under the sha256 of everything that determines it: the
+# input bars, the strategy name, its parameters and a version tag. The same
+# inputs always map to the same key, so entries never need invalidating; new
+# bars simply produce a new key. Recent results are kept decoded in memory, and
+# all of them are written to disk as one JSON file per key:
+#
+#   <root>/ab/ab12...ef.json
+#
+# The disk side is bounded too: past ``max_disk_entries`` the least recently
+# used files (by mtime, bumped on every disk hit) are removed.
+# ---------------------------------------------------------------------------
+
+RESULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".result_cache"),
+)
+
+_MAX_MEMORY_RESULTS = int(os.environ.get("RESULT_CACHE_MEMORY_ENTRIES", "512"))
+_MAX_DISK_RESULTS = int(os.environ.get("RESULT_CACHE_DISK_ENTRIES", "20000"))
+
+# Bump when a strategy's output format or semantics change, so old entries stop matching.
+_RESULT_VERSION = "1"
+
+
+def result_key(strategy: str, params: dict, df: pd.DataFrame, columns=("Close",)) -> str:
+    """sha256 over the bar timestamps, the given columns' values, the strategy name and
+    its (JSON-serialisable) parameters.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([_RESULT_VERSION, strategy, params], sort_keys=True, default=str).encode())
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        h.update(str(index.tz).encode())
+        h.update(np.ascontiguousarray(index.as_unit("ns").asi8).tobytes())
+    else:
+        h.update(str(list(index)).encode())
+    for col in columns:
+        h.update(col.encode())
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Two-level (memory LRU + disk) cache of JSON results keyed by ``result_key``.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, root: str = RESULT_CACHE_DIR, max_memory: int = _MAX_MEMORY_RESULTS,
+                 max_disk_entries: int = _MAX_DISK_RESULTS):
+        self.root = root
+        self.max_memory = max_memory
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_entries = None  # counted lazily on the first write
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "disk_evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def _remember(self, key: str, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._remember(key, value)
+            self._stats["disk_hits"] += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._remember(key, value)
+            self._stats["writes"] += 1
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(value, f, default=_json_default)
+        os.replace(tmp, path)
+        if not existed:
+            self._count_write()
+
+    def _count_write(self):
+        with self._lock:
+            if self._disk_entries is None:
+                self._disk_entries = len(self._disk_files())
+            else:
+                self._disk_entries += 1
+            over = self._disk_entries - self.max_disk_entries
+        if over > 0:
+            self._evict_disk(over + self.max_disk_entries // 10)
+
+    def _disk_files(self) -> list:
+        files = []
+        for shard in os.scandir(self.root) if os.path.isdir(self.root) else []:
+            if shard.is_dir():
+                files.extend(e for e in os.scandir(shard.path) if e.name.endswith(".json"))
+        return files
+
+    def _evict_disk(self, n: int):
+        """Drop the ``n`` least recently used files."""
+        files = []
+        for entry in self._disk_files():
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+        files.sort()
+        removed = 0
+        for _, path in files[:n]:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_entries = len(files) - removed
+            self._stats["disk_evictions"] += removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            return {
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_entries,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def _json_default(value):
+    """numpy scalars/strings that slip into results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+result_cache = ResultCache()
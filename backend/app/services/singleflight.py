@@ -0,0 +1,36 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls into a single in-flight execution.
+
+    The first caller for a key starts the work; every caller that arrives while it
+    is still running awaits the same task instead of issuing its own upstream call.
+    The key is forgotten as soon as the task finishes, so this never caches results.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key, fn, *args, **kwargs):
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self._stats["coalesced"] += 1
+        # shield: one caller disconnecting must not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._inflight)}
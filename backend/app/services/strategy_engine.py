@@ -8,7 +8,7 @@ class StrategyEngine:
     @staticmethod
     async def run_sma_crossover(db: AsyncSession, symbol: str, quantity: float = 1.0):
         df = await MarketDataService.get_historical_data(symbol, period="1y", interval="1d")
-        df = MarketDataService.calculate_indicators(df)
+        df = MarketDataService.calculate_indicators(df, symbol, columns=["SMA_20", "SMA_50"])
 
         if len(df) < 50:
             raise ValueError("Not enough data to run SMA strategy.")
@@ -0,0 +1,170 @@
+import asyncio
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from app.services.backtest_core import FeeModel, affordable_shares
+from app.services.indicator_stream import _RollingMean
+
+# ---------------------------------------------------------------------------
+# Event-driven backtests
+#
+# Bars are pushed through a strategy one at a time and only the rolling state
+# the strategy needs is kept (for an SMA crossover: the last ``slow`` closes and
+# two running means). The bars themselves are read from the memory-mapped bar
+# store one chunk at a time, so memory does not grow with the length of the
+# test. Trades and equity points are emitted as events while the bars are
+# consumed.
+# ---------------------------------------------------------------------------
+
+DAILY_INTERVALS = {"1d", "5d", "1wk", "1mo", "3mo"}
+
+
+class SMACrossoverStrategy:
+    """SMA crossover on a bar stream: BUY when the fast mean crosses above the slow one,
+    SELL when it crosses below. Signals start on bar ``slow``, the first with a previous
+    slow mean to cross from, as in the parameter sweep. ``/backtest`` drops its warm-up
+    rows and then skips another 50 bars, so it starts trading later and its results can
+    differ on the same bars.
+    """
+
+    def __init__(self, fast: int = 20, slow: int = 50):
+        if not 0 < fast < slow:
+            raise ValueError("The fast window must be positive and shorter than the slow one.")
+        self.fast, self.slow = fast, slow
+        self._closes = deque(maxlen=slow)
+        self._fast_mean = _RollingMean(fast)
+        self._slow_mean = _RollingMean(slow)
+        self._prev = None
+
+    def on_bar(self, close: float) -> str | None:
+        window = self._closes
+        fast = self._fast_mean.update(close, window[-self.fast] if len(window) >= self.fast else None)
+        slow = self._slow_mean.update(close, window[0] if len(window) == self.slow else None)
+        window.append(close)
+
+        signal = None
+        if self._prev is not None:
+            prev_fast, prev_slow = self._prev
+            if prev_fast <= prev_slow and fast > slow:
+                signal = "BUY"
+            elif prev_fast >= prev_slow and fast < slow:
+                signal = "SELL"
+        self._prev = (fast, slow)
+        return signal
+
+
+class StreamingBacktest:
+    """All-in / all-out account driven by a strategy's signals, one bar at a time.
+
+    ``on_bars`` consumes a chunk of bars and returns the events it produced: a
+    ``trade`` event per fill and an ``equity`` point every ``equity_every`` bars.
+    """
+
+    def __init__(self, strategy, initial_capital: float = 10000, fee: FeeModel | None = None,
+                 equity_every: int = 1, daily: bool = True):
+        self.strategy = strategy
+        self.initial_capital = initial_capital
+        self.fee = fee
+        self.equity_every = max(1, equity_every)
+        self.daily = daily
+        self.capital = initial_capital
+        self.position = 0
+        self.bars = 0
+        self.trades = 0
+        self.charges = 0.0
+        self.last_price = None
+        self.last_time = None
+        self.peak = initial_capital
+        self.max_drawdown = 0.0
+
+    def _time(self, ts) -> str:
+        if self.daily:
+            return str(ts).split(" ")[0]
+        return ts.isoformat() if isinstance(ts, pd.Timestamp) else str(ts)
+
+    def _fill(self, ts, signal: str, price: float) -> dict | None:
+        if signal == "BUY" and self.capital >= price:
+            if self.fee is not None:
+                shares, charge = affordable_shares(self.capital, price, self.fee)
+                if not shares:
+                    return None
+            else:
+                shares, charge = int(self.capital // price), 0.0
+            value = shares * price
+            self.capital -= value + charge
+            self.position += shares
+        elif signal == "SELL" and self.position > 0:
+            shares = self.position
+            value = shares * price
+            charge = self.fee("SELL", price, shares) if self.fee is not None else 0.0
+            self.capital += value - charge
+            self.position = 0
+        else:
+            return None
+        self.trades += 1
+        self.charges += charge
+        return {
+            "type": "trade",
+            "time": self._time(ts),
+            "side": signal,
+            "price": round(price, 2),
+            "shares": shares,
+            "value": round(value, 2),
+            "charges": charge,
+        }
+
+    def on_bars(self, index, closes: np.ndarray) -> list:
+        events = []
+        for ts, price in zip(index, closes.tolist()):
+            if price != price:
+                continue
+            signal = self.strategy.on_bar(price)
+            if signal is not None:
+                trade = self._fill(ts, signal, price)
+                if trade is not None:
+                    events.append(trade)
+            equity = self.capital + self.position * price
+            if equity > self.peak:
+                self.peak = equity
+            elif self.peak > 0:
+                self.max_drawdown = max(self.max_drawdown, 1 - equity / self.peak)
+            self.bars += 1
+            self.last_price, self.last_time = price, ts
+            if self.bars % self.equity_every == 0:
+                events.append({"type": "equity", "time": self._time(ts), "value": round(equity, 2)})
+        return events
+
+    def summary(self) -> dict:
+        final_value = self.capital + self.position * (self.last_price or 0.0)
+        return {
+            "type": "summary",
+            "initial_capital": self.initial_capital,
+            "final_value": round(final_value, 2),
+            "total_return_pct": round((final_value - self.initial_capital) / self.initial_capital * 100, 2),
+            "max_drawdown_pct": round(self.max_drawdown * 100, 2),
+            "total_trades": self.trades,
+            "total_charges": round(self.charges, 2),
+            "open_position": self.position,
+            "bars": self.bars,
+            "last_bar": self._time(self.last_time) if self.last_time is not None else None,
+        }
+
+
+def _next_events(engine: StreamingBacktest, chunks):
+    chunk = next(chunks, None)
+    return None if chunk is None else engine.on_bars(*chunk)
+
+
+async def stream_backtest(engine: StreamingBacktest, chunks):
+    """Drive ``engine`` over an iterator of (index, closes) chunks (``MarketDataService.
+    stream_history``), yielding NDJSON lines as they are produced and a final summary
+    line. Each chunk is read and simulated off the event loop.
+    """
+    chunks = iter(chunks)
+    while (events := await asyncio.to_thread(_next_events, engine, chunks)) is not None:
+        if events:
+            yield "".join(json.dumps(e) + "\n" for e in events)
+    yield json.dumps(engine.summary()) + "\n"
@@ -0,0 +1,69 @@
+import base64
+from datetime import datetime, timezone
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# ---------------------------------------------------------------------------
+# Trade history pages
+#
+# Newest first, ordered by (timestamp, id) and paged by keyset: a page ends with
+# an opaque cursor for its last row, and the next page starts strictly after it.
+# Each page is one range scan on the composite (…, timestamp, id) indexes, no
+# matter how deep into the history it is.
+# ---------------------------------------------------------------------------
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp: datetime, trade_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{trade_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, trade_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(trade_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Trade timestamps are stored as naive UTC."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def page_trades(db: AsyncSession, trade, limit: int = 20, cursor: str | None = None,
+                      symbol: str | None = None, strategy: str | None = None, side: str | None = None,
+                      start: datetime | None = None, end: datetime | None = None):
+    """One page of ``trade`` rows, newest first, matching the filters (``start`` and ``end``
+    are inclusive). Returns (trades, next cursor or None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # Every write path sets the timestamp; a NULL one could not be placed in the keyset order.
+    query = select(trade).where(trade.timestamp.is_not(None))
+    if symbol:
+        query = query.where(trade.symbol == symbol.upper())
+    if strategy:
+        query = query.where(trade.strategy_name == strategy)
+    if side:
+        query = query.where(trade.side == side.upper())
+    if start is not None:
+        query = query.where(trade.timestamp >= _naive_utc(start))
+    if end is not None:
+        query = query.where(trade.timestamp <= _naive_utc(end))
+    if cursor:
+        query = query.where(tuple_(trade.timestamp, trade.id) < tuple_(*decode_cursor(cursor)))
+
+    # One extra row tells whether there is a next page.
+    query = query.order_by(trade.timestamp.desc(), trade.id.desc()).limit(limit + 1)
+    trades = (await db.execute(query)).scalars().all()
+    if len(trades) <= limit:
+        return trades, None
+    trades = trades[:limit]
+    last = trades[-1]
+    return trades, encode_cursor(last.timestamp, last.id)
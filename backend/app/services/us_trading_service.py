@@ -1,12 +1,21 @@
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
-from app.models.us_trading import USTrade, USPortfolio, USPaperAccount
+from app.models.us_trading import USTrade, USTradeArchive, USPortfolio, USPaperAccount
 from app.schemas.trading import TradeCreate
 from app.services.charges import USChargesCalculator
+from app.services.account_cache import AccountCache
+from app.services.trade_history import page_trades
+from app.services.ledger import LedgerModels, book_buy, book_sell, lock_book, plan_batch, reset_book, write_batch
 
 INITIAL_BALANCE_USD = 1190.48
 
+_LEDGER = LedgerModels(account=USPaperAccount, portfolio=USPortfolio, trade=USTrade)
+account_cache = AccountCache(_LEDGER)
+
+def _required_margin(order_value: float, product_type: str) -> float:
+    return order_value  # no intraday leverage on US paper trades
+
 class USTradingService:
     @staticmethod
     async def get_or_create_account(db: AsyncSession) -> USPaperAccount:
@@ -21,14 +30,13 @@ class USTradingService:
             db.add(account)
             await db.commit()
             await db.refresh(account)
+            account_cache.invalidate()
         return account
 
     @staticmethod
     async def execute_trade(db: AsyncSession, trade_data: TradeCreate):
         symbol_upper = trade_data.symbol.upper()
         
-        account = await USTradingService.get_or_create_account(db)
-        
         charges = USChargesCalculator.calculate(
             side=trade_data.side,
             product_type=trade_data.product_type,
@@ -38,83 +46,130 @@ class USTradingService:
         total_charges = charges["total"]
         
         order_value = trade_data.price * trade_data.quantity
+        fill_args = (symbol_upper, trade_data.product_type, trade_data.price, trade_data.quantity,
+                     trade_data.strategy_name, total_charges)
         
+        # One statement books the account, position and trade; the reads below only run
+        # when it was refused, to find out why (or to create the account on first use).
         if trade_data.side == "BUY":
             required_total = order_value + total_charges
             
-            if account.balance < required_total:
+            fill = await book_buy(db, _LEDGER, *fill_args, debit=order_value + total_charges, required=required_total)
+            if fill is None:
+                await db.rollback()
+                account = await USTradingService.get_or_create_account(db)
                 available = account.balance
+                if available >= required_total:
+                    fill = await book_buy(db, _LEDGER, *fill_args, debit=order_value + total_charges, required=required_total)
+            if fill is None:
+                await db.rollback()
                 raise ValueError(
                     f"Insufficient balance. Required: ${required_total:.2f} "
                     f"(Order: ${order_value:.2f} + Charges: ${total_charges:.2f}). "
                     f"Available: ${available:.2f}"
                 )
-            
-            account.balance -= (order_value + total_charges)
         
         elif trade_data.side == "SELL":
-            result = await db.execute(select(USPortfolio).filter(USPortfolio.symbol == symbol_upper))
-            portfolio_item = result.scalars().first()
-            
-            if not portfolio_item or portfolio_item.total_quantity < trade_data.quantity:
-                holding = portfolio_item.total_quantity if portfolio_item else 0
+            fill = await book_sell(db, _LEDGER, *fill_args, credit=order_value - total_charges)
+            if fill is None:
+                await db.rollback()
+                holding = await db.scalar(select(USPortfolio.total_quantity).filter(USPortfolio.symbol == symbol_upper))
+                if holding is not None and holding >= trade_data.quantity:
+                    await USTradingService.get_or_create_account(db)
+                    fill = await book_sell(db, _LEDGER, *fill_args, credit=order_value - total_charges)
+            if fill is None:
+                await db.rollback()
                 raise ValueError(
                     f"Insufficient holdings for {symbol_upper}. "
-                    f"Trying to sell {trade_data.quantity}, but only hold {holding}"
+                    f"Trying to sell {trade_data.quantity}, but only hold {holding or 0}"
                 )
-            
-            account.balance += (order_value - total_charges)
-        
-        account.total_charges_paid += total_charges
 
+        await db.commit()
+        account_cache.write_through(fill.version, fill.balance, fill.total_charges_paid, {
+            symbol_upper: (fill.average_price, fill.total_quantity) if fill.total_quantity is not None else None
+        })
         new_trade = USTrade(
+            id=fill.trade_id,
             symbol=symbol_upper,
             side=trade_data.side,
             product_type=trade_data.product_type,
             price=trade_data.price,
             quantity=trade_data.quantity,
+            timestamp=fill.timestamp,
             strategy_name=trade_data.strategy_name,
             charges=total_charges
         )
-        db.add(new_trade)
+        return {
+            "trade": new_trade,
+            "charges": charges,
+            "balance": fill.balance
+        }
 
-        if trade_data.side == "BUY":
-            result = await db.execute(select(USPortfolio).filter(USPortfolio.symbol == symbol_upper))
-            portfolio_item = result.scalars().first()
-            
-            if portfolio_item:
-                total_cost = (portfolio_item.average_price * portfolio_item.total_quantity) + (trade_data.price * trade_data.quantity)
-                portfolio_item.total_quantity += trade_data.quantity
-                portfolio_item.average_price = total_cost / portfolio_item.total_quantity
-            else:
-                portfolio_item = USPortfolio(
-                    symbol=symbol_upper,
-                    average_price=trade_data.price,
-                    total_quantity=trade_data.quantity
-                )
-                db.add(portfolio_item)
-                
-        elif trade_data.side == "SELL":
-            result = await db.execute(select(USPortfolio).filter(USPortfolio.symbol == symbol_upper))
-            portfolio_item = result.scalars().first()
-            
-            portfolio_item.total_quantity -= trade_data.quantity
-            if portfolio_item.total_quantity <= 0:
-                await db.delete(portfolio_item)
+    @staticmethod
+    async def execute_batch(db: AsyncSession, orders: list[TradeCreate]):
+        """Validate ``orders`` in sequence against the account and holdings in memory, then
+        book every accepted one in a single transaction. A rejected order is reported and
+        skipped; it does not stop the rest of the batch.
+        """
+        symbols = sorted({o.symbol.upper() for o in orders})
+        account, positions = await lock_book(db, _LEDGER, symbols)
+        if account is None:
+            await db.rollback()
+            await USTradingService.get_or_create_account(db)
+            account, positions = await lock_book(db, _LEDGER, symbols)
 
+        charges = USChargesCalculator.calculate_batch(
+            side=[o.side for o in orders],
+            product_type=[o.product_type for o in orders],
+            price=[o.price for o in orders],
+            quantity=[o.quantity for o in orders],
+        )
+        totals = charges["total"].tolist()
+        holdings = {s: [p.average_price, p.total_quantity] for s, p in positions.items()}
+        balance, paid, outcomes = plan_batch(orders, totals, account.balance, holdings, _required_margin, "$")
+
+        accepted = [i for i, error in outcomes if error is None]
+        trades = [
+            {
+                "symbol": orders[i].symbol.upper(),
+                "side": orders[i].side,
+                "product_type": orders[i].product_type,
+                "price": orders[i].price,
+                "quantity": orders[i].quantity,
+                "strategy_name": orders[i].strategy_name,
+                "charges": totals[i],
+            }
+            for i in accepted
+        ]
+        touched = {t["symbol"] for t in trades}
+        changed = {s: holdings.get(s) for s in touched}
+        rows, acct = await write_batch(db, _LEDGER, account.id, balance, paid, trades, changed, set(positions))
         await db.commit()
-        await db.refresh(new_trade)
+        account_cache.write_through(acct.version, acct.balance, acct.total_charges_paid, changed)
+
+        trade_ids = dict(zip(accepted, (row.id for row in rows)))
+        results = []
+        for i, error in outcomes:
+            order = orders[i]
+            result = {"index": i, "symbol": order.symbol.upper(), "side": order.side}
+            if error is None:
+                result.update(status="executed", id=trade_ids[i],
+                              charges={k: float(v[i]) for k, v in charges.items()})
+            else:
+                result.update(status="rejected", error=error)
+            results.append(result)
         return {
-            "trade": new_trade,
-            "charges": charges,
-            "balance": account.balance
+            "executed": len(accepted),
+            "rejected": len(orders) - len(accepted),
+            "results": results,
+            "balance": balance,
         }
 
     @staticmethod
     async def exit_position(db: AsyncSession, symbol: str, price: float, quantity: float = None):
         symbol_upper = symbol.upper()
-        result = await db.execute(select(USPortfolio).filter(USPortfolio.symbol == symbol_upper))
-        portfolio_item = result.scalars().first()
+        snapshot = await USTradingService._snapshot(db)
+        portfolio_item = snapshot.positions.get(symbol_upper)
         
         if not portfolio_item or portfolio_item.total_quantity <= 0:
             raise ValueError(f"No position found for {symbol_upper}")
@@ -133,19 +188,27 @@ class USTradingService:
         )
         return await USTradingService.execute_trade(db, trade_data)
 
+    @staticmethod
+    async def _snapshot(db: AsyncSession):
+        snapshot = await account_cache.get(db)
+        if snapshot is None:
+            await USTradingService.get_or_create_account(db)
+            snapshot = await account_cache.get(db)
+        return snapshot
+
     @staticmethod
     async def get_portfolio(db: AsyncSession):
-        result = await db.execute(select(USPortfolio))
-        return result.scalars().all()
+        snapshot = await USTradingService._snapshot(db)
+        return list(snapshot.positions.values())
 
     @staticmethod
-    async def get_recent_trades(db: AsyncSession, limit: int = 20):
-        result = await db.execute(select(USTrade).order_by(desc(USTrade.timestamp)).limit(limit))
-        return result.scalars().all()
+    async def get_trade_history(db: AsyncSession, limit: int = 20, cursor: str = None, symbol: str = None,
+                                strategy: str = None, side: str = None, start: datetime = None, end: datetime = None):
+        return await page_trades(db, USTrade, limit, cursor, symbol, strategy, side, start, end)
 
     @staticmethod
     async def get_account_info(db: AsyncSession):
-        account = await USTradingService.get_or_create_account(db)
+        account = await USTradingService._snapshot(db)
         return {
             "balance": round(account.balance, 2),
             "initial_balance": account.initial_balance,
@@ -154,20 +217,15 @@ class USTradingService:
         }
 
     @staticmethod
-    async def reset_account(db: AsyncSession):
-        result = await db.execute(select(USPaperAccount))
-        account = result.scalars().first()
-        if account:
-            account.balance = INITIAL_BALANCE_USD
-            account.total_charges_paid = 0.0
-        
-        trades = await db.execute(select(USTrade))
-        for trade in trades.scalars().all():
-            await db.delete(trade)
-        
-        positions = await db.execute(select(USPortfolio))
-        for pos in positions.scalars().all():
-            await db.delete(pos)
-        
+    def get_diagnostics() -> dict:
+        return {"account_cache": account_cache.stats()}
+
+    @staticmethod
+    async def reset_account(db: AsyncSession, archive: bool = False):
+        archived = await reset_book(db, _LEDGER, INITIAL_BALANCE_USD, USTradeArchive if archive else None)
         await db.commit()
-        return {"message": "US Account reset to $1,190.48 (₹1,00,000)", "balance": INITIAL_BALANCE_USD}
+        account_cache.invalidate()
+        result = {"message": "US Account reset to $1,190.48 (₹1,00,000)", "balance": INITIAL_BALANCE_USD}
+        if archive:
+            result["archived_trades"] = archived
+        return result
@@ -0,0 +1,42 @@
+"""Add trade history indexes
+
+Revision ID: 5c9e2a7d41f0
+Revises: 3427166d8b2c
+Create Date: 2026-10-17 22:41:08.412365
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '5c9e2a7d41f0'
+down_revision: Union[str, Sequence[str], None] = '3427166d8b2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (timestamp, id) keyset pagination of the history, alone or after a symbol / strategy filter
+INDEXES = [
+    ('timestamp_id', ['timestamp', 'id']),
+    ('symbol_timestamp_id', ['symbol', 'timestamp', 'id']),
+    ('strategy_name_timestamp_id', ['strategy_name', 'timestamp', 'id']),
+]
+
+
+def _trade_tables() -> list:
+    # us_trades is created by the app at startup, so it may not exist yet
+    inspector = sa.inspect(op.get_bind())
+    return [table for table in ('trades', 'us_trades') if inspector.has_table(table)]
+
+
+def upgrade() -> None:
+    for table in _trade_tables():
+        for name, columns in INDEXES:
+            op.create_index(f'ix_{table}_{name}', table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for table in _trade_tables():
+        for name, _ in INDEXES:
+            op.drop_index(f'ix_{table}_{name}', table_name=table, if_exists=True)